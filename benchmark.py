@@ -0,0 +1,248 @@
+'''
+    Benchmark suite
+
+    Times the layers of the engine of black_jack.py: building and shuffling
+    a shoe, Hand.add() and value(), Hand.decide() with each kind of strategy,
+    Dealer.play() and full rounds of 1 and 5 players of the strategy
+    folders Steve and Bill_*. Every benchmark starts from a fixed seed, is
+    run once or more to warm up, then timed repeat times; the time per
+    operation of every repeat and its min, median, mean and standard
+    deviation are reported and can be written to a JSON file.
+
+    With --baseline the medians are compared with a JSON file written
+    before by --out, and a benchmark slower than the baseline by more
+    than the threshold is flagged as a regression (exit status 1).
+
+    usage:
+        python benchmark.py --out baseline.json
+        python benchmark.py --baseline baseline.json --threshold 0.10
+'''
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from black_jack import LOG_NONE, LOG_VERBOSE, CountingPlayer, Deck, Game, Hand, LogWriter, Player, Shoe
+
+players_tpl = ("Steve", "Bill_14", "Bill_15", "Bill_16", "Bill_17")
+NUM_HANDS = 200     # two card hands of one shoe, decided in turn
+
+
+def bench_deck(seed):
+    ''' Deck of 8 decks built and shuffled, one operation per shoe '''
+    random.seed(seed)
+    def run(number):
+        start = time.perf_counter_ns()
+        for i in range(number):
+            Deck(8).shuffle()
+        return time.perf_counter_ns() - start
+    return run
+
+
+def bench_shoe(seed):
+    ''' Shoe of 8 decks refilled and shuffled in place, one operation per shoe '''
+    shoe = Shoe(8, random.Random(seed))
+    def run(number):
+        start = time.perf_counter_ns()
+        for i in range(number):
+            shoe.shuffle()
+        return time.perf_counter_ns() - start
+    return run
+
+
+def bench_hand(seed):
+    ''' Hand reset, three cards added and value(), one operation per hand '''
+    player = Player(None, players_tpl[0])
+    hand = Hand(player, player.get_hands())
+    shoe = Shoe(8, random.Random(seed))
+    shoe.shuffle()
+    cards_lst = [(shoe.draw(), shoe.draw(), shoe.draw()) for i in range(100)]
+    def run(number):
+        start = time.perf_counter_ns()
+        for i in range(number):
+            first, second, third = cards_lst[i % 100]
+            hand.reset()
+            hand.add(first)
+            hand.add(second)
+            hand.add(third)
+            hand.value()
+        return time.perf_counter_ns() - start
+    return run
+
+
+def decide_bench(kind):
+    ''' return benchmark of Hand.decide() on two card hands, one operation per decision.
+    kind is 'compiled' (decision index), 'compiled_verbose' (tables of a logged round),
+    'frames' (DataFrames of the Excel files) or 'counting' (CountingPlayer, strategy of the true count) '''
+    def bench_decide(seed):
+        log_level = LOG_VERBOSE if kind == 'compiled_verbose' else LOG_NONE
+        game = Game(log_level, LogWriter(None), rng=random.Random(seed))
+        player = CountingPlayer(game, players_tpl[0]) if kind == 'counting' else Player(game, players_tpl[0])
+        game.add_player(player)
+        player.load_strategy()
+        dealer = game.get_dealer()
+        dealer.dist_default([])
+        shoe = Shoe(8, random.Random(seed))
+        shoe.shuffle()
+        hands_lst = list()
+        for i in range(NUM_HANDS):
+            hand = Hand(player, player.get_hands())
+            hand.add(shoe.draw())
+            hand.add(shoe.draw())
+            hands_lst.append(hand)
+        strategy = player.get_strategy() if kind == 'frames' else player.get_compiled_strategy()
+        def run(number):
+            start = time.perf_counter_ns()
+            for i in range(number):
+                hand = hands_lst[i % NUM_HANDS]
+                if kind == 'counting':
+                    hand.decide(player, dealer, player.get_compiled_strategy())
+                else:
+                    hand.decide(player, dealer, strategy)
+            return time.perf_counter_ns() - start
+        return run
+    return bench_decide
+
+
+def bench_dealer(seed):
+    ''' Dealer dealt two cards and Dealer.play(), one operation per dealer hand.
+    the shoe is shuffled every 30 hands out of the time '''
+    game = Game(LOG_NONE, rng=random.Random(seed))
+    dealer = game.get_dealer()
+    def run(number):
+        elapsed = 0
+        done = 0
+        while done < number:
+            dealer.shuffle_deck()
+            chunk = min(30, number - done)
+            start = time.perf_counter_ns()
+            for i in range(chunk):
+                dealer.reset_hand()
+                dealer.dist_default([])
+                dealer.play()
+            elapsed += time.perf_counter_ns() - start
+            done += chunk
+        return elapsed
+    return run
+
+
+def rounds_bench(num_players):
+    ''' return benchmark of Game.play() with the first num_players strategy folders,
+    one operation per round, shuffles included '''
+    def bench_rounds(seed):
+        game = Game(LOG_NONE, rng=random.Random(seed))
+        for name in players_tpl[:num_players]:
+            game.add_player(Player(game, name))
+        for player in game.get_players():
+            player.load_strategy()
+        def run(number):
+            start = time.perf_counter_ns()
+            game.play(number)
+            return time.perf_counter_ns() - start
+        return run
+    return bench_rounds
+
+
+# benchmark name -> (setup returning run(number) -> elapsed ns, operations per repeat)
+benchmarks_dic = {
+    'deck_build_shuffle': (bench_deck, 50),
+    'shoe_shuffle': (bench_shoe, 500),
+    'hand_add_value': (bench_hand, 50000),
+    'decide_compiled': (decide_bench('compiled'), 100000),
+    'decide_compiled_verbose': (decide_bench('compiled_verbose'), 20000),
+    'decide_frames': (decide_bench('frames'), 500),
+    'decide_counting': (decide_bench('counting'), 50000),
+    'dealer_play': (bench_dealer, 20000),
+    'rounds_1_player': (rounds_bench(1), 5000),
+    'rounds_5_players': (rounds_bench(5), 2000),
+}
+
+
+def run_benchmark(setup, number, seed=0, repeat=5, warmup=1):
+    ''' run setup(seed) and time number operations repeat times after warmup runs.
+    return dict of 'number', 'repeat', 'ns_per_op' (every repeat), 'min_ns', 'median_ns',
+    'mean_ns', 'stdev_ns' and 'ops_per_sec' (of the median) '''
+    run = setup(seed)
+    for i in range(warmup):
+        run(number)
+    ns_per_op = [run(number) / number for i in range(repeat)]
+    median = statistics.median(ns_per_op)
+    return {'number': number, 'repeat': repeat, 'ns_per_op': ns_per_op, 'min_ns': min(ns_per_op), \
+            'median_ns': median, 'mean_ns': statistics.fmean(ns_per_op), \
+            'stdev_ns': statistics.stdev(ns_per_op) if repeat > 1 else 0.0, \
+            'ops_per_sec': 1e9 / median if median else 0.0}
+
+
+def run_suite(names=None, seed=0, repeat=5, warmup=1, scale=1.0):
+    ''' run the benchmarks of names (default every one) and return the results,
+    dict of 'meta' and 'benchmarks', benchmark name -> run_benchmark() result.
+    operations per repeat are scaled by scale, the output of the game is discarded '''
+    if names is None:
+        names = list(benchmarks_dic)
+    results_dic = {'meta': {'python': sys.version.split()[0], 'implementation': platform.python_implementation(), \
+                            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), \
+                            'seed': seed, 'repeat': repeat, 'warmup': warmup, 'scale': scale}, \
+                   'benchmarks': dict()}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name in names:
+            setup, number = benchmarks_dic[name]
+            results_dic['benchmarks'][name] = run_benchmark(setup, max(1, int(number * scale)), seed, repeat, warmup)
+    return results_dic
+
+
+def compare(results_dic, baseline_dic, threshold=0.10):
+    ''' compare the medians of the benchmarks in both results.
+    return list of (name, baseline median ns, median ns, ratio, is_regression),
+    a regression is slower than the baseline by more than threshold (0.10 is 10%) '''
+    comparison_lst = list()
+    for name, result_dic in results_dic['benchmarks'].items():
+        if name not in baseline_dic['benchmarks']:
+            continue
+        baseline = baseline_dic['benchmarks'][name]['median_ns']
+        ratio = result_dic['median_ns'] / baseline if baseline else float('inf')
+        comparison_lst.append((name, baseline, result_dic['median_ns'], ratio, ratio > 1 + threshold))
+    return comparison_lst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the layers of the black jack engine")
+    parser.add_argument('--only', nargs='+', choices=list(benchmarks_dic), default=None, help="benchmarks to run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplies the operations per repeat")
+    parser.add_argument('--out', default=None, help="JSON file the results are written to")
+    parser.add_argument('--baseline', default=None, help="JSON file of results to compare with")
+    parser.add_argument('--threshold', type=float, default=0.10, help="slowdown of the median flagged as regression")
+    args = parser.parse_args()
+
+    results_dic = run_suite(args.only, args.seed, args.repeat, args.warmup, args.scale)
+    for name, result_dic in results_dic['benchmarks'].items():
+        print(f"{name:<24} {result_dic['median_ns']:12.0f} ns/op  +/- {result_dic['stdev_ns']:9.0f}" \
+              f"  min {result_dic['min_ns']:12.0f}  {result_dic['ops_per_sec']:12.0f} ops/s")
+    if args.out is not None:
+        with open(args.out, 'w') as out_file:
+            json.dump(results_dic, out_file, indent=2)
+            out_file.write("\n")
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline_dic = json.load(baseline_file)
+        num_regressions = 0
+        print(f"\ncompared with {args.baseline} (threshold {args.threshold:.0%})")
+        for name, baseline, median, ratio, is_regression in compare(results_dic, baseline_dic, args.threshold):
+            num_regressions += is_regression
+            print(f"{name:<24} {baseline:12.0f} -> {median:12.0f} ns/op  {ratio - 1:+8.1%}" \
+                  f"{'  REGRESSION' if is_regression else ''}")
+        if num_regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,18 +11,69 @@
     updated: Nov 29, 2021
 '''
 
+import time
+import_start_float = time.perf_counter()    # start of the import, for startup_report()
+
 import random
-import pandas as pd
+import math
 import os
+import sys
+import gzip
+import hashlib
+import json
+import struct
 from collections import deque
-import copy
+from array import array
+
+# pandas is imported in Player.load_strategy() only when the Excel files are read,
+# multiprocessing in simulate_parallel() and statistics in compare_players()
 
 shapes_tpl = ('spade', 'clover', 'diamond', 'heart')
 numbers_tpl = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+values_tpl = (2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 1)
+card_values_dic = dict(zip(numbers_tpl, values_tpl))    # 'A' has value 1
+split_labels_dic = {1: 'A', 2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9', 10: 'T'}
+
+# log levels of Game
+LOG_NONE = 0        # no log string is built and nothing is printed
+LOG_SUMMARY = 1     # only the results of the run are logged and printed
+LOG_VERBOSE = 2     # every round, card and decision is logged and printed
+
+# random generators of SeededShuffler
+RNG_MT = 'mt'           # Mersenne Twister of module random
+RNG_PCG64 = 'pcg64'     # NumPy PCG64
+RNG_PHILOX = 'philox'   # NumPy Philox, counter-based, keyed per shoe
+rng_backends_tpl = (RNG_MT, RNG_PCG64, RNG_PHILOX)
+MASK64 = (1 << 64) - 1
+
+# surrender types of Rules
+SURRENDER_NONE = 'none'             # no surrender
+SURRENDER_TWO_CARDS = 'two_cards'   # surrender 15, 16 on the first two cards only (no dealer peek)
+SURRENDER_ANY = 'any'               # surrender 15, 16 with any number of cards
+
+# events of RoundRecorder, 4 bytes each: kind, player, hand, value
+EVENT_ROUND = 0         # a round starts
+EVENT_CARD = 1          # a card is added to a hand, value is the code of the card in Shoe
+EVENT_DECISION = 2      # a decision of Hand.decide(), value is the index in decisions_tpl plus DECISION_PAIR
+EVENT_OUTCOME = 3       # result of a hand in Game.check_winner(), value is the index in outcomes_tpl
+EVENT_DEAL = 4          # first two cards of a hand, hand and value are the codes of the first and second card
+DEALER_INDEX = 255      # player index of the dealer's hand
+DECISION_PAIR = 8       # flag of EVENT_DECISION value, the hand decided as a pair it may split
+decisions_tpl = ('STAND', 'HIT', 'DOUBLE', 'SPLIT', 'SUR')
+decision_codes_dic = {decision: code for code, decision in enumerate(decisions_tpl)}
+# a doubled hand that wins or loses has an outcome of its own, so every outcome has one net win
+outcomes_tpl = ('WIN', 'TIE', 'LOSE', 'SUR', 'BLACKJACK', 'DEALER_BLACKJACK', 'WIN_DOUBLE', 'LOSE_DOUBLE', \
+                'DEALER_BLACKJACK_DOUBLE')
+OUTCOME_WIN, OUTCOME_TIE, OUTCOME_LOSE, OUTCOME_SUR, OUTCOME_BLACKJACK, OUTCOME_DEALER_BLACKJACK, \
+    OUTCOME_WIN_DOUBLE, OUTCOME_LOSE_DOUBLE, OUTCOME_DEALER_BLACKJACK_DOUBLE = range(len(outcomes_tpl))
 
 class Card:
     """
     Card class represents single card
+
+    A card never changes after it is built, so the 52 cards of
+    flyweight_cards_tpl are shared by every shoe. Whether a card is
+    exposed is kept by the Hand holding it.
     
     ...
 
@@ -32,8 +83,8 @@ class Card:
         shape of the card ('spade', 'clover', 'diamond', 'heart')
     number_str : str
         number of card (2, 3, ... 10, J, Q, K, A)
-    is_exposed_bool : boolean
-        true if the card is exposed to players
+    value_int : int
+        value of the card, 'A' has value 1
 
     Methods
     -------
@@ -44,29 +95,25 @@ class Card:
         return true if the card is ace
 
     # Getters
-    get_is_exposed()
     get_number_str()
     get_shape_str()
 
-    # Setters
-    set_is_exposed()
-
     """
-    def __init__(self, shape, number, is_exposed=False):
+    __slots__ = ('__shape_str', '__number_str', '__value_int')
+
+    def __init__(self, shape, number):
         ''' initialize a card with shape, number '''
         self.__shape_str = shape
         self.__number_str = number
-        self.__is_exposed_bool = is_exposed
+        self.__value_int = card_values_dic[number]
     
     def __str__(self):
         ''' return string representation of Card object '''
         return self.get_number_str() + ' ' + self.get_shape_str()
 
     def value(self):
-        ''' calculate the value of a card. A is assigned as 1 '''
-        values_tpl = (2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 1)
-        search_in_dic = dict(zip(numbers_tpl, values_tpl))
-        return int(search_in_dic[self.get_number_str()])
+        ''' return the value of a card. A is assigned as 1 '''
+        return self.__value_int
 
     def is_ace(self):
         ''' return true if this card is ace '''
@@ -76,19 +123,12 @@ class Card:
         return is_ace
 
     # getter methods 
-    def get_is_exposed(self):
-        return self.__is_exposed_bool
-
     def get_number_str(self):
         return self.__number_str
     
     def get_shape_str(self):
         return self.__shape_str
 
-    # setter methods
-    def set_is_exposed(self, is_exposed):
-        self.__is_exposed_bool = is_exposed
-
 
 class Deck:
     """
@@ -139,10 +179,9 @@ class Deck:
         print("........Shuffle deck")
         random.shuffle(self.__cards_deq)
 
-    def draw(self, is_exposed=False):
+    def draw(self):
         ''' draw a card from Deck. return Card object '''
         drawed_card = self.__cards_deq.popleft()
-        drawed_card.set_is_exposed(is_exposed)
         self.__num_cards -= 1
         return drawed_card
     
@@ -154,6 +193,488 @@ class Deck:
         return self.__num_cards
 
 
+class Shoe:
+    """
+    A class used to represent a shoe of n decks as integer codes
+
+    Cards are kept as codes (shape index * 13 + number index) in a
+    preallocated array, and drawing moves a cursor instead of popping.
+    Reshuffling refills and shuffles the same buffer, so no Card object
+    is kept in the shoe and nothing is reallocated per shoe.
+    draw() returns one of the 52 shared Card objects of flyweight_cards_tpl,
+    exposure of a drawn card is tracked by the Hand holding it.
+
+    ...
+
+    Attributes
+    ----------
+    __ordered_arr : array
+        codes of n decks in order, used to refill the buffer
+    __codes_arr : array
+        buffer of card codes in the shoe
+    __cursor : int
+        index of the next card to draw in __codes_arr
+    __num_decks : int
+        number of card decks in this Shoe
+    __rng : random.Random
+        random generator used to shuffle, module random if not given
+    __shuffler : SeededShuffler
+        shuffles every shoe with its own seed, used instead of __rng if given
+    __counters_lst : list
+        CardCounter objects that see the cards drawn from this shoe
+
+    Methods
+    -------
+    shuffle()
+        refill and shuffle the shoe in place, reset the counters
+    draw_code()
+        return the code of the card drawn from the shoe
+    draw()
+        return the shared Card object drawn from the shoe
+    see()
+        show a card drawn unseen (ex: dealer's hole card) to the counters
+    add_counter()
+        add CardCounter that sees the cards drawn from this shoe
+    card_from_code()
+        return a Card object of the code
+    
+    # Getters
+    get_num_decks()
+    get_num_cards()
+
+    """
+    num_codes = len(shapes_tpl) * len(numbers_tpl)
+
+    def __init__(self, count_int, rng=None, shuffler=None):
+        ''' initialize the shoe with count_int decks of card codes '''
+        self.__num_decks = count_int
+        self.__rng = rng if rng is not None else random
+        self.__shuffler = shuffler
+        self.__ordered_arr = array('B', range(self.num_codes)) * count_int
+        self.__codes_arr = array('B', self.__ordered_arr)
+        self.__cursor = 0
+        self.__counters_lst = list()
+
+    def __str__(self):
+        ''' string representation of shoe object '''
+        return str([str(self.card_from_code(code)) for code in self.__codes_arr[self.__cursor:]])
+
+    def shuffle(self):
+        ''' refill and shuffle the shoe in place, reset the counters '''
+        self.__codes_arr[:] = self.__ordered_arr
+        if self.__shuffler is not None:
+            self.__shuffler.shuffle(self.__codes_arr)
+        else:
+            self.__rng.shuffle(self.__codes_arr)
+        self.__cursor = 0
+        for counter in self.__counters_lst:
+            counter.reset(self.__num_decks)
+
+    def draw_code(self):
+        ''' draw a card from the shoe. return the code of the card '''
+        code = self.__codes_arr[self.__cursor]
+        self.__cursor += 1
+        return code
+
+    def draw(self, is_seen=True):
+        ''' draw a card from the shoe. return the shared Card object.
+        the counters see the card if is_seen, otherwise when see() is called '''
+        card = flyweight_cards_tpl[self.draw_code()]
+        if is_seen:
+            for counter in self.__counters_lst:
+                counter.observe(card)
+        return card
+
+    def see(self, card):
+        ''' show a card drawn unseen (ex: dealer's hole card) to the counters '''
+        for counter in self.__counters_lst:
+            counter.observe(card)
+
+    def add_counter(self, counter):
+        ''' add CardCounter that sees the cards drawn from this shoe '''
+        counter.reset(self.__num_decks)
+        self.__counters_lst.append(counter)
+
+    @staticmethod
+    def card_from_code(code):
+        ''' return a Card object of the code '''
+        shape_idx, number_idx = divmod(code, len(numbers_tpl))
+        return Card(shapes_tpl[shape_idx], numbers_tpl[number_idx])
+
+    # getter methods
+    def get_num_decks(self):
+        return self.__num_decks
+
+    def get_num_cards(self):
+        return len(self.__codes_arr) - self.__cursor
+
+
+# 52 distinct cards shared by every Shoe, index is the code of Shoe
+flyweight_cards_tpl = tuple(Shoe.card_from_code(code) for code in range(Shoe.num_codes))
+card_codes_dic = {card: code for code, card in enumerate(flyweight_cards_tpl)}
+
+
+class CountSystem:
+    """
+    CountSystem class represents a card counting system
+
+    Every card number has a tag, the running count is the sum of the tags
+    of the cards seen. A balanced system (tags of a deck sum up to 0)
+    divides the running count by the decks left in the shoe for the true
+    count. An unbalanced system (ex: KO) starts from -(sum of a deck) *
+    (decks - 1) and uses the running count as it is.
+
+    ...
+
+    Attributes
+    ----------
+    __name_str : str
+        name of the system
+    __tags_dic : dict
+        tag of each card number, {number_str: tag}
+    __deck_sum : int
+        sum of the tags of one deck, 0 if balanced
+
+    Methods
+    -------
+    tag()
+        return tag of the card
+    initial_count()
+        return running count of a shoe of num_decks before any card is seen
+    is_balanced()
+        return true if the tags of a deck sum up to 0
+
+    # Getters
+    get_name_str()
+    get_tags()
+
+    """
+    def __init__(self, name, tags_tpl):
+        ''' tags_tpl is tags in the order of numbers_tpl '''
+        if len(tags_tpl) != len(numbers_tpl):
+            raise ValueError(f"count system {name} needs {len(numbers_tpl)} tags")
+        self.__name_str = name
+        self.__tags_dic = dict(zip(numbers_tpl, tags_tpl))
+        self.__deck_sum = len(shapes_tpl) * sum(tags_tpl)
+
+    def tag(self, card):
+        ''' return tag of the card '''
+        return self.__tags_dic[card.get_number_str()]
+
+    def initial_count(self, num_decks):
+        ''' return running count of a shoe of num_decks before any card is seen '''
+        return -self.__deck_sum * (num_decks - 1)
+
+    def is_balanced(self):
+        ''' return true if the tags of a deck sum up to 0 '''
+        return self.__deck_sum == 0
+
+    # getter methods
+    def get_name_str(self):
+        return self.__name_str
+
+    def get_tags(self):
+        return self.__tags_dic
+
+
+# count systems by name, in the order of numbers_tpl ('2' ~ 'K', 'A')
+count_systems_dic = {
+    'Hi-Lo': CountSystem('Hi-Lo', (1, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1, -1)),
+    'KO': CountSystem('KO', (1, 1, 1, 1, 1, 1, 0, 0, -1, -1, -1, -1, -1)),
+    'Hi-Opt I': CountSystem('Hi-Opt I', (0, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1, 0)),
+    'Hi-Opt II': CountSystem('Hi-Opt II', (1, 1, 2, 2, 1, 1, 0, 0, -2, -2, -2, -2, 0)),
+    'Omega II': CountSystem('Omega II', (1, 1, 2, 2, 2, 1, 0, -1, -2, -2, -2, -2, 0)),
+    'Zen': CountSystem('Zen', (1, 1, 2, 2, 2, 1, 0, 0, -2, -2, -2, -2, -1)),
+}
+
+
+class CardCounter:
+    """
+    CardCounter class keeps the running count of a shoe with a CountSystem
+
+    The shoe calls observe() for every card seen, so the count is updated
+    in O(1) per card and the discard pile is never recounted.
+
+    ...
+
+    Attributes
+    ----------
+    __system : CountSystem
+        count system used
+    __tags_dic : dict
+        tags of the system, kept for the lookup per card
+    __running_count : int
+        sum of the tags of the cards seen since the shuffle
+    __num_cards_seen : int
+        number of cards seen since the shuffle
+    __num_cards : int
+        number of cards of the shoe when it was shuffled
+
+    Methods
+    -------
+    reset()
+        start counting a shoe of num_decks
+    observe()
+        add tag of the card seen
+    decks_remaining()
+        return the number of decks not seen yet
+    true_count()
+        return running count per deck not seen, running count if unbalanced
+
+    # Getters
+    get_system()
+    get_running_count()
+    get_num_cards_seen()
+
+    """
+    def __init__(self, system):
+        if isinstance(system, str):
+            system = count_systems_dic[system]
+        self.__system = system
+        self.__tags_dic = system.get_tags()
+        self.__running_count = 0
+        self.__num_cards_seen = 0
+        self.__num_cards = 0
+
+    def reset(self, num_decks):
+        ''' start counting a shoe of num_decks '''
+        self.__running_count = self.__system.initial_count(num_decks)
+        self.__num_cards_seen = 0
+        self.__num_cards = num_decks * Shoe.num_codes
+
+    def observe(self, card):
+        ''' add tag of the card seen '''
+        self.__running_count += self.__tags_dic[card.get_number_str()]
+        self.__num_cards_seen += 1
+
+    def decks_remaining(self):
+        ''' return the number of decks not seen yet, at least half a deck '''
+        return max(self.__num_cards - self.__num_cards_seen, Shoe.num_codes // 2) / Shoe.num_codes
+
+    def true_count(self):
+        ''' return running count per deck not seen, running count if unbalanced '''
+        if not self.__system.is_balanced():
+            return self.__running_count
+        return self.__running_count / self.decks_remaining()
+
+    # getter methods
+    def get_system(self):
+        return self.__system
+
+    def get_running_count(self):
+        return self.__running_count
+
+    def get_num_cards_seen(self):
+        return self.__num_cards_seen
+
+
+def splitmix64(x):
+    ''' return the 64 bit mix of x by SplitMix64, used to derive seeds '''
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class SeededShuffler:
+    """
+    SeededShuffler class shuffles every shoe with a seed of its own
+
+    The seed of shoe i is derived from the seed of the run and i in O(1),
+    so any shoe of a run can be shuffled again without the shoes before it.
+    RNG_MT shuffles with random.Random, RNG_PCG64 and RNG_PHILOX with a NumPy
+    Generator (Philox is keyed by the seed of the shoe, one counter stream per shoe).
+
+    ...
+
+    Attributes
+    ----------
+    __seed : int
+        seed of the run
+    __backend : str
+        RNG_MT, RNG_PCG64 or RNG_PHILOX
+    __shoe_index : int
+        index of the next shoe to shuffle
+    __shoe_seed : int
+        seed of the last shoe shuffled
+
+    Methods
+    -------
+    shoe_seed()
+        return the seed of the shoe of the index
+    shuffle()
+        shuffle the array of the next shoe in place
+    shuffle_seed()
+        shuffle the array in place with the seed of a shoe
+
+    # Getters
+    get_seed()
+    get_backend()
+    get_shoe_index()
+    get_shoe_seed()
+
+    """
+    def __init__(self, seed, backend=RNG_MT, first_shoe=0):
+        if backend not in rng_backends_tpl:
+            raise ValueError(f"unknown random generator {backend!r}")
+        self.__seed = seed & MASK64
+        self.__backend = backend
+        self.__shoe_index = first_shoe
+        self.__shoe_seed = None
+
+    def shoe_seed(self, shoe_index):
+        ''' return the seed of the shoe of the index '''
+        return splitmix64((splitmix64(self.__seed) + shoe_index) & MASK64)
+
+    def shuffle(self, codes_arr):
+        ''' shuffle the array of the next shoe in place '''
+        self.__shoe_seed = self.shoe_seed(self.__shoe_index)
+        self.__shoe_index += 1
+        self.shuffle_seed(codes_arr, self.__shoe_seed)
+
+    def shuffle_seed(self, codes_arr, shoe_seed):
+        ''' shuffle the array in place with the seed of a shoe '''
+        if self.__backend == RNG_MT:
+            random.Random(shoe_seed).shuffle(codes_arr)
+            return
+        import numpy as np
+        if self.__backend == RNG_PCG64:
+            bit_generator = np.random.PCG64(shoe_seed)
+        else:
+            bit_generator = np.random.Philox(key=shoe_seed)
+        # shuffle the buffer of the array without copy
+        np.random.Generator(bit_generator).shuffle(np.frombuffer(codes_arr, dtype=np.uint8))
+
+    # getter methods
+    def get_seed(self):
+        return self.__seed
+
+    def get_backend(self):
+        return self.__backend
+
+    def get_shoe_index(self):
+        ''' return index of the last shoe shuffled '''
+        return self.__shoe_index - 1
+
+    def get_shoe_seed(self):
+        return self.__shoe_seed
+
+
+class ShoeReplay:
+    """
+    ShoeReplay class reads and writes a shoe replay file
+
+    The file is a header and one fixed width record per shoe shuffled,
+    (shoe index, seed of the shoe, first round of the shoe), so the record
+    of a shoe is read in O(1) and the shoe of a round is found by binary
+    search. A round is regenerated by shuffling its shoe with the seed and
+    playing the shoe up to the round with the same players and rules.
+
+    ...
+
+    Attributes
+    ----------
+    __file_path : str
+        path of the replay file
+    __file : file object
+        file being read or written
+    __is_writing : bool
+        true if the file is written
+    __seed : int
+        seed of the run
+    __backend : str
+        random generator of the run
+    __num_decks : int
+        number of decks of the shoe
+
+    Methods
+    -------
+    record()
+        write the record of a shoe
+    get_shoe()
+        return (seed of the shoe, first round) of the shoe index
+    find_round()
+        return index of the shoe of the round
+    close()
+        close the file
+
+    # Getters
+    get_seed()
+    get_backend()
+    get_num_decks()
+    get_num_shoes()
+
+    """
+    magic = b'BJSR'
+    version = 1
+    header_struct = struct.Struct('<4sHHQI')     # magic, version, backend, seed, decks
+    record_struct = struct.Struct('<QQQ')        # shoe index, seed of the shoe, first round
+
+    def __init__(self, file_path, mode='r', seed=0, backend=RNG_MT, num_decks=8):
+        ''' open the replay file for reading ('r') or writing ('w') '''
+        self.__file_path = file_path
+        self.__is_writing = mode == 'w'
+        if self.__is_writing:
+            self.__seed, self.__backend, self.__num_decks = seed & MASK64, backend, num_decks
+            self.__file = open(file_path, 'wb')
+            self.__file.write(self.header_struct.pack(self.magic, self.version, rng_backends_tpl.index(backend), \
+                                                      self.__seed, num_decks))
+        else:
+            self.__file = open(file_path, 'rb')
+            magic, version, backend_idx, self.__seed, self.__num_decks = \
+                self.header_struct.unpack(self.__file.read(self.header_struct.size))
+            if magic != self.magic or version != self.version:
+                raise ValueError(f"{file_path} is not a shoe replay file")
+            self.__backend = rng_backends_tpl[backend_idx]
+
+    def record(self, shoe_index, shoe_seed, first_round):
+        ''' write the record of a shoe '''
+        self.__file.write(self.record_struct.pack(shoe_index, shoe_seed, first_round))
+
+    def __read_record(self, position):
+        ''' return the record at the position '''
+        self.__file.seek(self.header_struct.size + position * self.record_struct.size)
+        return self.record_struct.unpack(self.__file.read(self.record_struct.size))
+
+    def get_shoe(self, shoe_index):
+        ''' return (seed of the shoe, first round) of the shoe index '''
+        first_index = self.__read_record(0)[0]
+        record_shoe, shoe_seed, first_round = self.__read_record(shoe_index - first_index)
+        return (shoe_seed, first_round)
+
+    def find_round(self, round_int):
+        ''' return index of the shoe of the round '''
+        low, high = 0, self.get_num_shoes() - 1
+        if high < 0 or self.__read_record(0)[2] > round_int:
+            raise KeyError(round_int)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.__read_record(middle)[2] <= round_int:
+                low = middle
+            else:
+                high = middle - 1
+        return self.__read_record(low)[0]
+
+    def close(self):
+        ''' close the file '''
+        self.__file.close()
+
+    # getter methods
+    def get_seed(self):
+        return self.__seed
+
+    def get_backend(self):
+        return self.__backend
+
+    def get_num_decks(self):
+        return self.__num_decks
+
+    def get_num_shoes(self):
+        if self.__is_writing:
+            self.__file.flush()
+        return (os.path.getsize(self.__file_path) - self.header_struct.size) // self.record_struct.size
+
+
 class Hands:
     """
     A class used to represent a Hands collection    
@@ -166,6 +687,18 @@ class Hands:
         collection of Hhand objects
     __player : Player 
         Player object, owner of this Hands 
+    __pool_lst : list
+        Hand objects of previous rounds, reused by add_hand()
+    __is_splited : bool
+        true if a hand was split this round
+    __is_restricted : bool
+        true if the rules limit double after split or resplit
+    __double_after_split : bool
+        true if a split hand can double, read from Rules
+    __max_hands : int
+        most hands by resplitting, 0 if unlimited, read from Rules
+    __resplit_aces : bool
+        true if split aces can be split again, read from Rules
 
     Methods
     -------
@@ -173,15 +706,34 @@ class Hands:
         iterator method
     add_hand()
         add Hand object to this Hands collection
+    reset()
+        reset to one empty hand, other hands go back to the pool
+    restrict()
+        return (can double, can split) of a two card hand under the rules
      
     # Getters
     get_player()
+    is_splited()
+    is_restricted()
+
+    # Setters
+    set_is_splited()
 
     """
-    def __init__(self, player):
+    __slots__ = ('__hands', '__player', '__pool_lst', '__is_splited', '__splited_hands', '__is_restricted', \
+                 '__double_after_split', '__max_hands', '__resplit_aces')
+
+    def __init__(self, player, rules=None):
         ''' initialize the Hands by adding one hand default '''
+        if rules is None:
+            rules = Rules()
+        self.__is_restricted = rules.is_split_restricted()
+        self.__double_after_split = rules.double_after_split()
+        self.__max_hands = rules.get_max_hands()
+        self.__resplit_aces = rules.resplit_aces()
         self.__hands = list()
         self.__player = player
+        self.__pool_lst = list()
         self.add_hand()
         self.__is_splited = False   # check
         self.__splited_hands = 1    # number of hand within hands (one player)
@@ -191,15 +743,51 @@ class Hands:
         return HandsIterator(self.__hands)
     
     def add_hand(self):
-        ''' add a Hand object to the Hands collection'''
-        new_hand = Hand(player = self.get_player(), hands = self)
+        ''' add a Hand object to the Hands collection, reuse one of the pool if any '''
+        if self.__pool_lst:
+            new_hand = self.__pool_lst.pop()
+            new_hand.reset()
+        else:
+            new_hand = Hand(player = self.get_player(), hands = self)
         self.__hands.append(new_hand)
         return new_hand
+
+    def reset(self):
+        ''' reset to one empty hand, other hands go back to the pool '''
+        self.__pool_lst.extend(self.__hands[1:])
+        del self.__hands[1:]
+        self.__hands[0].reset()
+        self.__is_splited = False
+        self.__splited_hands = 1
+
+    def restrict(self, is_pair, card):
+        ''' return (can double, can split) of a two card hand under the rules,
+        card is the first card of the hand '''
+        if not self.__is_splited:
+            return (True, is_pair)
+        if is_pair:
+            if self.__max_hands and len(self.__hands) >= self.__max_hands:
+                is_pair = False
+            elif not self.__resplit_aces and card.is_ace():
+                is_pair = False
+        return (self.__double_after_split, is_pair)
     
     # getter methods
     def get_player(self):
         return self.__player
 
+    def is_splited(self):
+        return self.__is_splited
+
+    def is_restricted(self):
+        return self.__is_restricted
+
+    # setter methods
+    def set_is_splited(self, is_splited):
+        self.__is_splited = is_splited
+        if is_splited:
+            self.__splited_hands = len(self.__hands)
+
 
 class HandsIterator:
     """
@@ -221,6 +809,8 @@ class HandsIterator:
     
     """
 
+    __slots__ = ('__hands', '__index')
+
     def __init__(self, hands):
         ''' initialize iterator '''
         self.__hands = hands
@@ -256,15 +846,35 @@ class Hand:
         true if a hand is over 21
     __no_more_card : bool
         true if no more card is necessary, otherwise false
+    __hard_total : int
+        running total of the cards, ace is counted as 1
+    __num_aces : int
+        running count of aces in the hand
+    __value : int
+        running value of the hand, updated by update_status()
+    __state_id : int
+        CompiledStrategy.state_id() of total, soft, pair and two cards
+    __is_two_cards : bool
+        true if the hand has two cards and can double under the rules
+    __is_restricted : bool
+        true if the rules limit double after split or resplit of the Hands
+    __hidden_mask : int
+        bit i is set if card i is not exposed (dealer's hole card)
 
     Methods
     -------
     __str__()
         return string of __cards_lst (ex: 7 spade)
+    reset()
+        empty the hand to reuse it for a new round
     add()
         add a card to the hand
+    expose_all()
+        expose every card of the hand
+    is_card_exposed()
+        return true if card of the index is exposed
     update_status()
-        checking soft, pair, and break
+        update running totals, checking soft, pair, and break
     value()
         return the total value of a hand
         if a hand is soft add 10
@@ -298,6 +908,8 @@ class Hand:
     is_soft()
     is_pair()
     is_break()
+    is_two_cards()
+    get_state_id()
     get_hands()
     no_more_card()
     get_player()
@@ -310,15 +922,31 @@ class Hand:
     set_last_decision()
 
     """
+    __slots__ = ('__player', '__cards_lst', '__hands', '__is_soft', '__is_pair', '__is_break', \
+                 '__no_more_card', '__last_decision', '__hard_total', '__num_aces', '__value', \
+                 '__state_id', '__hidden_mask', '__is_two_cards', '__is_restricted')
+
     def __init__(self, player, hands):
         self.__player = player
         self.__cards_lst = list()
         self.__hands = hands
+        self.__is_restricted = hands is not None and hands.is_restricted()
+        self.reset()
+
+    def reset(self):
+        ''' empty the hand to reuse it for a new round '''
+        self.__cards_lst.clear()
         self.__is_soft= False
         self.__is_pair = False
         self.__is_break = False
         self.__no_more_card = False
         self.__last_decision = None
+        self.__hard_total = 0
+        self.__num_aces = 0
+        self.__value = 0
+        self.__state_id = 0
+        self.__is_two_cards = False
+        self.__hidden_mask = 0
 
     # return string representation of Hdnd object
     def __str__(self):
@@ -331,36 +959,53 @@ class Hand:
         output_str = "\n".join(output_str) + "\n"
         return output_str
 
-    def add(self, card):
+    def add(self, card, is_exposed=True):
         ''' add a card to the hand '''
+        if not is_exposed:
+            self.__hidden_mask |= 1 << len(self.__cards_lst)
         self.get_card_lst().append(card)
         self.update_status(card)
+
+    def expose_all(self):
+        ''' expose every card of the hand '''
+        self.__hidden_mask = 0
+
+    def is_card_exposed(self, index):
+        ''' return true if card of the index is exposed '''
+        return not (self.__hidden_mask >> index) & 1
     
     def update_status(self, card):
-        ''' checking soft, pair, and break '''
+        ''' update running totals, checking soft, pair, and break '''
+        self.__hard_total += card.value()
+        if card.is_ace():
+            self.__num_aces += 1
         self.check_soft(card)
         self.check_pair()
+        # if a hand is soft add 10
+        self.__value = self.__hard_total
+        if self.is_soft() and self.__hard_total + 10 <= 21:
+            self.__value += 10
+        is_two_cards = len(self.__cards_lst) == 2
+        if is_two_cards and self.__is_restricted:
+            is_two_cards, is_pair = self.__hands.restrict(self.__is_pair, self.__cards_lst[0])
+            self.set_is_pair(is_pair)
+        self.__is_two_cards = is_two_cards
+        # same as CompiledStrategy.state_id(), inlined for the hot path
+        self.__state_id = ((self.__hard_total * 2 + self.__is_soft) * 2 + \
+                           is_two_cards) * 2 + self.__is_pair
         self.check_break()
 
     def value(self):
         ''' return the total value of a hand 
         if a hand is soft add 10 '''
-        value_total = 0
-        for card in self.get_card_lst():
-            value_total += card.value()
-        
-        if self.is_soft():
-            if value_total + 10 <= 21:
-                value_total += 10
-            
-        return value_total
+        return self.__value
 
     def face_value(self):
         ''' return the total of exposed cards '''
         value_total = 0
-        for card in self.get_card_lst():
+        for i, card in enumerate(self.get_card_lst()):
             # count only exposed cards
-            if card.get_is_exposed():
+            if self.is_card_exposed(i):
                 if card.is_ace():
                     value_total += 11
                 else:
@@ -394,12 +1039,28 @@ class Hand:
         return f"{player.get_name_str()}'s hand: {self.value()} \n" + str(self) + "\n"
 
     def decide(self, player, dealer, strategy_tuple):
-        ''' decide strategy based on strategy_tuple '''
+        ''' decide strategy based on strategy_tuple
+        strategy_tuple is either a CompiledStrategy or the dict of
+        DataFrames read by Player.load_strategy() '''
+        if isinstance(strategy_tuple, CompiledStrategy):
+            if not player.get_game().is_verbose():
+                # one lookup of the precomputed decision index
+                decision = strategy_tuple.get_decision_index()[self.__state_id * CompiledStrategy.num_face_values \
+                                                               + dealer.get_upcard()]
+                if decision is None:
+                    raise KeyError((self.value(), dealer.get_upcard()))
+                return decision
+            return self.__decide_compiled(player, dealer, strategy_tuple)
+
         game = player.get_game()
+        is_verbose = game.is_verbose()
         file_output_str = game.get_output_log_str()
-        file_output_str.append(self.show_hand(player))
+        if is_verbose:
+            file_output_str.append(self.show_hand(player))
         decision = ""
-        if (not self.is_soft() and self.value() in [15, 16]):    # if not soft check whether to surrender or not
+        surrender = game.get_rules().get_surrender()
+        if (not self.is_soft() and self.value() in [15, 16]) and \
+           (surrender == SURRENDER_ANY or (surrender == SURRENDER_TWO_CARDS and self.is_two_cards())):    # if not soft check whether to surrender or not
             try:
                 decision = strategy_tuple['surrender'].loc[self.value(), dealer.get_hand().face_value()]    
             except KeyError:
@@ -410,8 +1071,9 @@ class Hand:
         if decision == 'NOSUR':     # if not surrender, check it is pair or soft
             # check split is necessary
             if (self.is_pair()):
-                file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.cards_split()) + "\n")
-                file_output_str.append("dealer face_value(): " + str(dealer.get_hand().face_value()) + "\n")
+                if is_verbose:
+                    file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.cards_split()) + "\n")
+                    file_output_str.append("dealer face_value(): " + str(dealer.get_hand().face_value()) + "\n")
                 decision = strategy_tuple['pair_splitting'].loc[self.cards_split(), dealer.get_hand().face_value()] 
                 if decision in ['Y', 'Y/N']:
                     decision = 'SPLIT'
@@ -420,24 +1082,26 @@ class Hand:
             # if the decision is not split keep decide
             if decision != 'SPLIT':
                 if (self.is_soft() and self.cards_value_except_one_a() < 10): # check is_soft
-                    file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.cards_soft()) + "\n")
-                    file_output_str.append("dealer face_value(): " + str(dealer.get_hand().face_value()) + "\n")
+                    if is_verbose:
+                        file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.cards_soft()) + "\n")
+                        file_output_str.append("dealer face_value(): " + str(dealer.get_hand().face_value()) + "\n")
                     # decide from hard_totals
                     decision = strategy_tuple['soft_totals'].loc[self.cards_soft(), dealer.get_hand().face_value()]
                     decision_map = ['S', 'Ds', 'H', 'D']
-                    if (len(self.get_card_lst()) == 2): # if only two cards we can bet on double
+                    if (self.is_two_cards()): # if only two cards we can bet on double
                         decision_str = ['STAND', 'DOUBLE', 'HIT', 'DOUBLE']
                     else:       # else we can only bet on hit and stand
                         decision_str = ['STAND', 'HIT', 'HIT', 'HIT']
 
                     decision = decision_str[decision_map.index(decision)]
                 else: # else the hand is hard
-                    file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.value()) + "\n")
-                    file_output_str.append("dealer face_value(): " + str(dealer.get_hand().face_value()) + "\n")
+                    if is_verbose:
+                        file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.value()) + "\n")
+                        file_output_str.append("dealer face_value(): " + str(dealer.get_hand().face_value()) + "\n")
                     # decide from hard_totals
                     decision = strategy_tuple['hard_totals'].loc[self.value(), dealer.get_hand().face_value()]
                     decision_map = ['S', 'H', 'D']
-                    if (len(self.get_card_lst()) == 2): # if only two cards we can bet on doubl
+                    if (self.is_two_cards()): # if only two cards we can bet on doubl
                         decision_str = ['STAND', 'HIT', 'DOUBLE']
                     else:
                         decision_str = ['STAND', 'HIT', 'HIT']
@@ -445,58 +1109,69 @@ class Hand:
                     decision = decision_str[decision_map.index(decision)]
         
         return decision
+
+    def __decide_compiled(self, player, dealer, compiled):
+        ''' decide strategy with the lookup tables of CompiledStrategy,
+        same rules as decide() but without pandas calls '''
+        game = player.get_game()
+        is_verbose = game.is_verbose()
+        file_output_str = game.get_output_log_str()
+        if is_verbose:
+            file_output_str.append(self.show_hand(player))
+        dealer_face_value = dealer.get_upcard()
+        value = self.value()
+        if (not self.is_soft() and value in (15, 16)) and compiled.can_surrender(self.is_two_cards()):
+            if compiled.get_surrender()[value][dealer_face_value]:
+                return 'SUR'
+
+        # check split is necessary
+        if (self.is_pair()):
+            if is_verbose:
+                file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.cards_split()) + "\n")
+                file_output_str.append("dealer face_value(): " + str(dealer_face_value) + "\n")
+            sheet, row = compiled.hand_cell(self.__hard_total, self.is_soft(), True)
+            is_split = compiled.get_pair_splitting()[row][dealer_face_value]
+            if is_split is None:
+                raise KeyError(self.cards_split())
+            self.set_is_pair(False)
+            if is_split:
+                return 'SPLIT'
+
+        is_two_cards = self.is_two_cards()    # only two cards we can bet on double
+        sheet, row = compiled.hand_cell(self.__hard_total, self.is_soft(), False)
+        if sheet == 'soft_totals':
+            if is_verbose:
+                file_output_str.append("player " + player.get_name_str() + "'s value: " + str(self.cards_soft()) + "\n")
+                file_output_str.append("dealer face_value(): " + str(dealer_face_value) + "\n")
+            decision = compiled.get_soft_totals(is_two_cards)[row][dealer_face_value]
+            if decision is None:
+                raise KeyError(self.cards_soft())
+        else:
+            if is_verbose:
+                file_output_str.append("player " + player.get_name_str() + "'s value: " + str(value) + "\n")
+                file_output_str.append("dealer face_value(): " + str(dealer_face_value) + "\n")
+            decision = compiled.get_hard_totals(is_two_cards)[row][dealer_face_value]
+            if decision is None:
+                raise KeyError(value)
+
+        return decision
     
     def cards_value_except_one_a(self):
         ''' return value except one ace. If a hand holds two ace
         only one ace will be counted. '''
-        str_list = list()
-        cards = copy.deepcopy(self.get_card_lst())  # deep copy for preserving 
-        for card in cards:
-            if card.get_number_str() == 'A': 
-                cards.remove(card)   # remove one A
-                break
-
-        for card in cards:
-            curr_val = card.value()
-            str_list.append(curr_val)
-
-        cards_value_output = sum(str_list)
-
-        return cards_value_output
+        if self.__num_aces > 0:
+            return self.__hard_total - 1    # remove one A
+        return self.__hard_total
 
     def cards_split(self):
         ''' returns card string. for example 'A, A', 'T, T'. 
         This is used for conversion for pair_splitting '''
-        str_list = list()
-        cards = copy.deepcopy(self.get_card_lst())  # deep copy for preserving
-        for i in range(len(cards)):
-            curr_val = cards[i].value()
-            if curr_val == 10:
-                curr_val = 'T'
-            if curr_val == 1:
-                curr_val = 'A'
-            str_list.append(str(curr_val))
-
-        str_output = ", ".join(str_list)
-
-        return str_output
+        return ", ".join([split_labels_dic[card.value()] for card in self.get_card_lst()])
 
     def cards_soft(self):
         ''' returns card string. for example 'A, 9', 'A, 8'
         this is used for conversion for soft_hand '''
-        cards = copy.deepcopy(self.get_card_lst())  # deep copy for preserving
-        for card in cards:
-            if card.get_number_str() == 'A': 
-                cards.remove(card)   # remove one A
-                break
-        
-        sum_of_not_a = 0
-        for card in cards:
-            sum_of_not_a += card.value()
-
-        str_output = "A, " + str(sum_of_not_a)
-
-        return str_output
+        return "A, " + str(self.cards_value_except_one_a())
 
     def split_hand(self):
         ''' split two cards into two hands '''
@@ -505,14 +1180,20 @@ class Hand:
 
         player = self.get_player()
         game = player.get_game()
+        is_verbose = game.is_verbose()
         file_output_str = game.get_output_log_str()
-        file_output_str.append(f"splitting the first card: {str(first_card)}\n") 
-        self.__cards_lst = [first_card]
+        if is_verbose:
+            file_output_str.append(f"splitting the first card: {str(first_card)}\n") 
+        self.__cards_lst[:] = [first_card]
         # file_output_str.append(f"print __cards_lst: {str(self.__cards_lst)}\n")
+        self.__hard_total = 0
+        self.__num_aces = 0
         self.update_status(first_card)
 
-        file_output_str.append(f"splitting the second card: {str(second_card)}\n")
+        if is_verbose:
+            file_output_str.append(f"splitting the second card: {str(second_card)}\n")
 
+        self.get_hands().set_is_splited(True)
         new_hand = self.get_hands().add_hand()
         new_hand.add(second_card)
 
@@ -528,6 +1209,12 @@ class Hand:
     
     def is_break(self):
         return self.__is_break
+
+    def is_two_cards(self):
+        return self.__is_two_cards
+
+    def get_state_id(self):
+        return self.__state_id
     
     def get_hands(self):
         return self.__hands
@@ -555,6 +1242,388 @@ class Hand:
         self.__last_decision = decision
 
 
+class CompiledStrategy:
+    """
+    CompiledStrategy class represents a strategy as dense lookup tables
+
+    The four strategy sheets are converted once into nested tuples indexed by
+    integers, so Hand.decide() needs no pandas call per decision.
+    Every table is indexed by [hand state][dealer face value] where the
+    dealer face value is 2 ~ 11 (ace is valued as 11).
+    
+    ...
+
+    Attributes
+    ----------
+    __cells_dic : dict
+        cells of the sheets, {sheet name: {row: {dealer face value: cell}}}
+    __hard_totals : tuple
+        (more than two cards, two cards) tables indexed by hand value,
+        holding the final decision ('STAND', 'HIT', 'DOUBLE')
+    __soft_totals : tuple
+        (more than two cards, two cards) tables indexed by the value
+        except one ace, holding the final decision
+    __surrender : tuple
+        table indexed by hand value, true if the hand surrenders
+    __pair_splitting : tuple
+        table indexed by the value of one card of the pair (ace is 1),
+        true if the pair is split
+    __surrender_type : str
+        SURRENDER_NONE, SURRENDER_TWO_CARDS or SURRENDER_ANY of the Rules
+    __decision_index : tuple
+        final decision indexed by state_id() * num_face_values + dealer face value,
+        None if the cell is missing
+
+    Methods
+    -------
+    from_frames(strategy_tuple)
+        build CompiledStrategy from the dict of DataFrames of load_strategy()
+    from_cache(directory)
+        build CompiledStrategy from the cache file of a strategy folder, None if not valid
+    write_cache(directory)
+        write cells to the cache file of a strategy folder
+    state_id()
+        return compact id of hand state
+    decide_state()
+        return the final decision of a hand state, same order as Hand.decide()
+    hand_cell()
+        return (sheet name, row) of the state of a hand, the cell it reads unless it surrenders
+    can_surrender()
+        return true if the surrender type allows surrender of the hand
+    
+    # Getters
+    get_cells()
+    get_decision_index()
+    get_hard_totals()
+    get_soft_totals()
+    get_surrender()
+    get_pair_splitting()
+    get_surrender_type()
+
+    """
+    # conversion of cell of the sheet into decision, (more than two cards, two cards)
+    hard_decision_dic = {'S': ('STAND', 'STAND'), 'H': ('HIT', 'HIT'), 'D': ('HIT', 'DOUBLE')}
+    soft_decision_dic = {'S': ('STAND', 'STAND'), 'Ds': ('HIT', 'DOUBLE'), 'H': ('HIT', 'HIT'), 'D': ('HIT', 'DOUBLE')}
+    split_decision_tpl = ('Y', 'Y/N')
+    num_face_values = 12    # index of dealer face value 0 ~ 11
+    num_hard_totals = 22    # hard total 0 ~ 21 of a hand not broken
+    sheet_names_tpl = ('hard_totals', 'soft_totals', 'surrender', 'pair_splitting')
+    cache_file_str = 'strategy_cache.json'
+    cache_version = 1
+
+    def __init__(self, cells_dic, surrender_type=SURRENDER_ANY):
+        ''' initialize lookup tables from cells_dic
+        cells_dic maps sheet name to {row: {dealer face value: cell}}
+        rows are integers: hand value for hard_totals and surrender,
+        value except one ace for soft_totals, card value for pair_splitting.
+        surrender_type of Rules is compiled into the decision index '''
+        self.__cells_dic = cells_dic
+        self.__surrender_type = surrender_type
+        self.__hard_totals = self.__build_decision_table(cells_dic['hard_totals'], 22, self.hard_decision_dic)
+        self.__soft_totals = self.__build_decision_table(cells_dic['soft_totals'], 10, self.soft_decision_dic)
+        self.__surrender = self.__build_flag_table(cells_dic['surrender'], 22, lambda cell: cell == 'SUR', False)
+        self.__pair_splitting = self.__build_flag_table(cells_dic['pair_splitting'], 11, \
+                                                        lambda cell: cell in self.split_decision_tpl, None)
+        self.__decision_index = self.__build_decision_index()
+
+    @classmethod
+    def from_frames(cls, strategy_tuple, surrender_type=SURRENDER_ANY):
+        ''' build CompiledStrategy from the dict of DataFrames of load_strategy() '''
+        cells_dic = dict()
+        for name, frame in strategy_tuple.items():
+            rows_dic = dict()
+            for row_label in frame.index:
+                row = frame.loc[row_label]
+                # empty cell (NaN) is left out of the table
+                rows_dic[cls.row_key(row_label)] = {int(column): row[column] for column in frame.columns \
+                                                    if isinstance(row[column], str)}
+            cells_dic[name] = rows_dic
+        return cls(cells_dic, surrender_type)
+
+    @classmethod
+    def from_cache(cls, directory, surrender_type=SURRENDER_ANY):
+        ''' build CompiledStrategy from the cache file of the strategy folder.
+        return None if there is no cache or an Excel file of the folder changed '''
+        try:
+            with open(directory + os.sep + cls.cache_file_str, 'r') as cache_file:
+                cache_dic = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if cache_dic.get('version') != cls.cache_version:
+            return None
+
+        is_touched = False
+        for name in cls.sheet_names_tpl:
+            source_dic = cache_dic['sources'].get(name)
+            try:
+                stat = os.stat(directory + os.sep + name + '.xlsx')
+            except OSError:
+                return None
+            if source_dic is None or source_dic['size'] != stat.st_size:
+                return None
+            if source_dic['mtime_ns'] != stat.st_mtime_ns:
+                # touched but maybe not changed (ex: checkout), compare content
+                if source_dic['sha256'] != cls.__file_hash(directory + os.sep + name + '.xlsx'):
+                    return None
+                is_touched = True
+
+        # json keys are strings, rows and dealer face values are integers
+        cells_dic = {name: {int(row): {int(face_value): cell for face_value, cell in columns.items()} \
+                            for row, columns in cache_dic['cells'][name].items()} \
+                     for name in cls.sheet_names_tpl}
+        compiled = cls(cells_dic, surrender_type)
+        if is_touched:
+            compiled.write_cache(directory)
+        return compiled
+
+    def write_cache(self, directory):
+        ''' write cells with size, mtime and hash of the Excel files to the cache file
+        of the strategy folder. a folder that is not writable is left without cache '''
+        sources_dic = dict()
+        for name in self.sheet_names_tpl:
+            file_path = directory + os.sep + name + '.xlsx'
+            stat = os.stat(file_path)
+            sources_dic[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, \
+                                 'sha256': self.__file_hash(file_path)}
+        cache_dic = {'version': self.cache_version, 'sources': sources_dic, 'cells': self.__cells_dic}
+        temp_path = directory + os.sep + self.cache_file_str + '.tmp'
+        try:
+            with open(temp_path, 'w') as cache_file:
+                json.dump(cache_dic, cache_file, separators=(',', ':'))
+            os.replace(temp_path, directory + os.sep + self.cache_file_str)
+        except OSError:
+            pass
+
+    @staticmethod
+    def __file_hash(file_path):
+        ''' return sha256 hex digest of the file '''
+        with open(file_path, 'rb') as source_file:
+            return hashlib.sha256(source_file.read()).hexdigest()
+
+    @staticmethod
+    def row_key(row_label):
+        ''' convert row label of the sheet into integer key 
+        (ex: 16 -> 16, 'A, 7' -> 7, 'T, T' -> 10, 'A, A' -> 1) '''
+        if isinstance(row_label, str):
+            row_label = row_label.split(',')[-1].strip()
+            if row_label == 'T':
+                return 10
+            if row_label == 'A':
+                return 1
+        return int(row_label)
+
+    @staticmethod
+    def state_id(hard_total, is_soft, is_two_cards, is_pair):
+        ''' return compact id of hand state, hard total counts ace as 1 '''
+        return ((hard_total * 2 + is_soft) * 2 + is_two_cards) * 2 + is_pair
+
+    def decide_state(self, hard_total, is_soft, is_two_cards, is_pair, face_value):
+        ''' return the final decision of a hand state against dealer face value,
+        same order as Hand.decide(): surrender, pair, soft and hard.
+        None if the cell is missing '''
+        value = hard_total
+        if is_soft and hard_total + 10 <= 21:
+            value += 10
+        if (not is_soft and value in (15, 16)) and self.can_surrender(is_two_cards):
+            if self.__surrender[value][face_value]:
+                return 'SUR'
+        sheet, row = self.hand_cell(hard_total, is_soft, is_pair)
+        if sheet == 'pair_splitting':
+            is_split = self.__pair_splitting[row][face_value]
+            if is_split is None:
+                return None
+            if is_split:
+                return 'SPLIT'
+            sheet, row = self.hand_cell(hard_total, is_soft, False)
+        if sheet == 'soft_totals':
+            return self.__soft_totals[is_two_cards][row][face_value]
+        return self.__hard_totals[is_two_cards][row][face_value]
+
+    @staticmethod
+    def hand_cell(hard_total, is_soft, is_pair):
+        ''' return (sheet name, row) of the state of a hand, the cell it reads unless it surrenders.
+        pair_splitting if the hand is a pair it may split (row is the card value, ace is 1),
+        soft_totals if the value except one ace is less than 10, else hard_totals.
+        this is the only classification of a hand, shared by decide_state() and the hand history '''
+        if is_pair:
+            return ('pair_splitting', hard_total // 2)
+        if is_soft and hard_total - 1 < 10:
+            return ('soft_totals', hard_total - 1)
+        if is_soft and hard_total + 10 <= 21:
+            return ('hard_totals', hard_total + 10)
+        return ('hard_totals', hard_total)
+
+    def can_surrender(self, is_two_cards):
+        ''' return true if the surrender type allows surrender of the hand '''
+        if self.__surrender_type == SURRENDER_ANY:
+            return True
+        return self.__surrender_type == SURRENDER_TWO_CARDS and bool(is_two_cards)
+
+    def __build_decision_index(self):
+        ''' build flat tuple of final decision of every hand state and dealer face value '''
+        index_lst = [None] * (self.state_id(self.num_hard_totals, 0, 0, 0) * self.num_face_values)
+        for hard_total in range(self.num_hard_totals):
+            for is_soft in (0, 1):
+                for is_two_cards in (0, 1):
+                    for is_pair in (0, 1):
+                        if hard_total == 0:
+                            continue
+                        state_id = self.state_id(hard_total, is_soft, is_two_cards, is_pair)
+                        for face_value in range(2, self.num_face_values):
+                            index_lst[state_id * self.num_face_values + face_value] = \
+                                self.decide_state(hard_total, is_soft, is_two_cards, is_pair, face_value)
+        return tuple(index_lst)
+
+    def __build_decision_table(self, rows_dic, num_rows, decision_dic):
+        ''' build (more than two cards, two cards) tables of decision,
+        missing cell is None '''
+        tables = list()
+        for is_two_cards in (0, 1):
+            table = [[None] * self.num_face_values for i in range(num_rows)]
+            for row, columns in rows_dic.items():
+                for face_value, cell in columns.items():
+                    try:
+                        table[row][face_value] = decision_dic[cell][is_two_cards]
+                    except KeyError:
+                        raise ValueError(f"unknown strategy cell {cell!r} at ({row}, {face_value})")
+            tables.append(tuple(tuple(columns) for columns in table))
+        return tuple(tables)
+
+    def __build_flag_table(self, rows_dic, num_rows, is_flag, default):
+        ''' build table of boolean, missing cell is default '''
+        table = [[default] * self.num_face_values for i in range(num_rows)]
+        for row, columns in rows_dic.items():
+            if row >= num_rows:
+                continue
+            for face_value, cell in columns.items():
+                table[row][face_value] = is_flag(cell)
+        return tuple(tuple(columns) for columns in table)
+
+    # getter methods
+    def get_cells(self):
+        return self.__cells_dic
+
+    def get_decision_index(self):
+        return self.__decision_index
+
+    def get_hard_totals(self, is_two_cards):
+        return self.__hard_totals[is_two_cards]
+
+    def get_soft_totals(self, is_two_cards):
+        return self.__soft_totals[is_two_cards]
+
+    def get_surrender(self):
+        return self.__surrender
+
+    def get_pair_splitting(self):
+        return self.__pair_splitting
+
+    def get_surrender_type(self):
+        return self.__surrender_type
+
+
+class RunningStats:
+    """
+    RunningStats class keeps mean and variance of a stream in constant memory
+
+    Values are added by Welford's algorithm, and two RunningStats of
+    separate streams are merged by the parallel update of Chan et al.
+
+    ...
+
+    Attributes
+    ----------
+    __count : int
+        number of values
+    __mean : float
+        mean of the values
+    __m2 : float
+        sum of squared differences from the mean
+
+    Methods
+    -------
+    add()
+        add a value
+    merge()
+        add every value of another RunningStats
+    from_summary()
+        build RunningStats from count, mean and variance
+    variance()
+        return sample variance
+    sd()
+        return sample standard deviation
+    se()
+        return standard error of the mean
+    half_width()
+        return half width of the confidence interval of the mean
+
+    # Getters
+    get_count()
+    get_mean()
+
+    """
+    __slots__ = ('__count', '__mean', '__m2')
+
+    def __init__(self):
+        self.__count = 0
+        self.__mean = 0.0
+        self.__m2 = 0.0
+
+    def add(self, x):
+        ''' add a value '''
+        self.__count += 1
+        delta = x - self.__mean
+        self.__mean += delta / self.__count
+        self.__m2 += delta * (x - self.__mean)
+
+    def merge(self, other):
+        ''' add every value of another RunningStats '''
+        count = self.__count + other.get_count()
+        if count == 0:
+            return
+        delta = other.get_mean() - self.__mean
+        other_m2 = other.variance() * (other.get_count() - 1) if other.get_count() > 1 else 0.0
+        self.__m2 += other_m2 + delta * delta * self.__count * other.get_count() / count
+        self.__mean += delta * other.get_count() / count
+        self.__count = count
+
+    @classmethod
+    def from_summary(cls, count, mean, variance):
+        ''' build RunningStats from count, mean and variance '''
+        running_stats = cls()
+        running_stats.__count = count
+        running_stats.__mean = mean
+        running_stats.__m2 = variance * (count - 1) if count > 1 else 0.0
+        return running_stats
+
+    def variance(self):
+        ''' return sample variance, nan with less than two values '''
+        if self.__count < 2:
+            return float('nan')
+        return self.__m2 / (self.__count - 1)
+
+    def sd(self):
+        ''' return sample standard deviation '''
+        return math.sqrt(self.variance())
+
+    def se(self):
+        ''' return standard error of the mean '''
+        if self.__count < 2:
+            return float('inf')
+        return math.sqrt(self.variance() / self.__count)
+
+    def half_width(self, z=1.96):
+        ''' return half width of the confidence interval of the mean, 95% by default '''
+        return z * self.se()
+
+    # getter methods
+    def get_count(self):
+        return self.__count
+
+    def get_mean(self):
+        return self.__mean
+
+
 class Player:
     """
     Player class represents the player
@@ -577,6 +1646,14 @@ class Player:
         hands object of the player
     __strategy : tuple
         strategy data of this player, read from file
+    __compiled_strategy : CompiledStrategy
+        lookup tables compiled from __strategy, or read from the strategy cache
+    __bankroll : Bankroll
+        money of the player and bet spread, None if only counts are kept
+    __net_at_bet : float
+        win - lose count at the start of the round
+    __net_stats : RunningStats
+        net win per round (win - lose count of the round)
 
     Methods
     -------
@@ -590,6 +1667,10 @@ class Player:
         read strategy data from file and store it in tuple
     reset_hands()
         reset hands of the player
+    place_bet()
+        start the round, place the bet on the bankroll if the player has one
+    settle_bet()
+        add net win of the round to the statistics and pay it to the bankroll
 
     # getters
     get_win_count()
@@ -597,8 +1678,14 @@ class Player:
     get_lose_count()
     get_name_str()
     get_strategy()
+    get_compiled_strategy()
+    get_bankroll()
+    get_net_stats()
     get_game()
 
+    # setters
+    set_bankroll()
+
     """
     def __init__(self, game, name='Player'):
         self.__game = game
@@ -606,8 +1693,12 @@ class Player:
         self.__count_of_win = float(0.0)
         self.__count_of_tie = float(0.0)
         self.__count_of_lose = float(0.0)
-        self.__hands = Hands(self)
+        self.__hands = Hands(self, game.get_rules() if game is not None else None)
         self.__strategy = None
+        self.__compiled_strategy = None
+        self.__bankroll = None
+        self.__net_at_bet = 0.0
+        self.__net_stats = RunningStats()
 
     def add_win_count(self, count = 1.0):
         '''add +1 when player win'''
@@ -621,8 +1712,28 @@ class Player:
         '''add -1 when player lose, -0.5 when player SURRENDER'''
         self.__count_of_lose += count
 
-    def load_strategy(self):
-        '''read strategy data from file and store it in tuple'''
+    def load_strategy(self, use_cache=True):
+        '''read strategy data from file and store it in tuple.
+        with use_cache the compiled tables are read from the cache file of the folder
+        while the Excel files are not changed, and the DataFrames are read on get_strategy()'''
+        directory = os.getcwd() + os.sep + self.get_name_str()
+        surrender_type = self.__game.get_rules().get_surrender() if self.__game is not None else SURRENDER_ANY
+        if use_cache:
+            compiled = CompiledStrategy.from_cache(directory, surrender_type)
+            if compiled is not None:
+                self.__strategy = None
+                self.__compiled_strategy = compiled
+                return
+
+        strategy_tuple = self.__read_strategy()
+        self.__strategy = strategy_tuple
+        self.__compiled_strategy = CompiledStrategy.from_frames(strategy_tuple, surrender_type)
+        if use_cache:
+            self.__compiled_strategy.write_cache(directory)
+
+    def __read_strategy(self):
+        '''read strategy data from the Excel files, return dict of DataFrames'''
+        import pandas as pd
         curr_dicrectory = os.getcwd()
         try:
             hard_totals = pd.read_excel(curr_dicrectory + os.sep + self.get_name_str() + os.sep + 'hard_totals.xlsx', \
@@ -645,11 +1756,26 @@ class Player:
             raise FileNotFoundError()
         
         strategy_tuple = dict(zip(['hard_totals', 'soft_totals', 'surrender', 'pair_splitting'], [hard_totals, soft_totals, surrender, pair_splitting]))
-        self.__strategy = strategy_tuple
+        return strategy_tuple
 
     def reset_hands(self):
-        '''reset hands of the player'''
-        self.__hands = Hands(self)
+        '''reset hands of the player, hand objects are reused'''
+        self.__hands.reset()
+
+    def place_bet(self):
+        '''start the round, place the bet on the bankroll if the player has one'''
+        self.__net_at_bet = self.__count_of_win - self.__count_of_lose
+        if self.__bankroll is not None:
+            self.__bankroll.place_bet(self)
+
+    def settle_bet(self):
+        '''add net win of the round to the statistics and pay it to the bankroll.
+        the counts are in units of the bet, every hand of the round
+        (split, double) is played with the bet placed for the round'''
+        net_win = self.__count_of_win - self.__count_of_lose - self.__net_at_bet
+        self.__net_stats.add(net_win)
+        if self.__bankroll is not None:
+            self.__bankroll.settle(net_win)
 
     # getter methods
     def get_win_count(self):
@@ -668,22 +1794,387 @@ class Player:
         return self.__name_str
     
     def get_strategy(self):
+        if self.__strategy is None and self.__compiled_strategy is not None:
+            self.__strategy = self.__read_strategy()    # loaded from cache
         return self.__strategy
+
+    def get_compiled_strategy(self):
+        return self.__compiled_strategy
+
+    def get_bankroll(self):
+        return self.__bankroll
+
+    def get_net_stats(self):
+        return self.__net_stats
     
     def get_game(self):
         return self.__game
 
-
-class Dealer:
+    # setter methods
+    def set_bankroll(self, bankroll):
+        self.__bankroll = bankroll
+
+
+# Hi-Lo index plays ("Illustrious 18" and "Fab 4" without insurance and surrender of 14)
+# (sheet name, row, dealer face value, true count, cell at or above the true count),
+# below the true count the cell of the loaded strategy is played
+hi_lo_index_plays_tpl = (
+    ('hard_totals', 16, 10, 0, 'S'),
+    ('hard_totals', 15, 10, 4, 'S'),
+    ('pair_splitting', 10, 5, 5, 'Y'),
+    ('pair_splitting', 10, 6, 4, 'Y'),
+    ('hard_totals', 10, 10, 4, 'D'),
+    ('hard_totals', 12, 3, 2, 'S'),
+    ('hard_totals', 12, 2, 3, 'S'),
+    ('hard_totals', 11, 11, 1, 'D'),
+    ('hard_totals', 9, 2, 1, 'D'),
+    ('hard_totals', 10, 11, 4, 'D'),
+    ('hard_totals', 9, 7, 3, 'D'),
+    ('hard_totals', 16, 9, 5, 'S'),
+    ('hard_totals', 13, 2, -1, 'S'),
+    ('hard_totals', 12, 4, 0, 'S'),
+    ('hard_totals', 12, 5, -2, 'S'),
+    ('hard_totals', 12, 6, -1, 'S'),
+    ('hard_totals', 13, 3, -2, 'S'),
+    ('surrender', 15, 10, 0, 'SUR'),
+    ('surrender', 15, 9, 2, 'SUR'),
+    ('surrender', 15, 11, 1, 'SUR'),
+)
+
+
+class CountingPlayer(Player):
     """
-    Dealer class represents the dealer
-    
+    CountingPlayer class represents a player who counts cards
+
+    The player keeps a CardCounter on the shoe of the dealer and changes
+    cells of the strategy sheets by the true count (index plays).
+    One CompiledStrategy is built per integer true count from min_true_count
+    to max_true_count when the strategy is loaded, so a decision is still a
+    single lookup. The true count is taken at the start of the player's turn,
+    floored and clamped to the range.
+
     ...
 
     Attributes
     ----------
-    __game : Game
-        represents Game object that this play is play in
+    __counter : CardCounter
+        running count of the shoe of the dealer
+    __index_plays_tpl : tuple
+        (sheet name, row, dealer face value, true count, cell at or above the true count)
+    __min_true_count : int
+        lowest true count with its own strategy
+    __index_strategies_tpl : tuple
+        CompiledStrategy per true count from __min_true_count
+
+    Methods
+    -------
+    load_strategy()
+        read strategy data and build strategy per true count
+    index_cells()
+        return cells of the strategy sheets changed for the true count
+    true_count()
+        return the true count, floored and clamped to the range of strategies
+
+    # getters
+    get_counter()
+    get_compiled_strategy()
+
+    """
+    def __init__(self, game, name='Player', count_system='Hi-Lo', index_plays_tpl=hi_lo_index_plays_tpl, \
+                 min_true_count=-10, max_true_count=10):
+        super().__init__(game, name)
+        self.__counter = CardCounter(count_system)
+        self.__index_plays_tpl = tuple(index_plays_tpl)
+        self.__min_true_count = min_true_count
+        self.__max_true_count = max_true_count
+        self.__index_strategies_tpl = tuple()
+        if game is not None:
+            game.get_dealer().get_deck().add_counter(self.__counter)
+
+    def load_strategy(self, use_cache=True):
+        '''read strategy data and build strategy per true count'''
+        super().load_strategy(use_cache)
+        compiled = super().get_compiled_strategy()
+        cells_dic = compiled.get_cells()
+        self.__index_strategies_tpl = tuple(CompiledStrategy(self.index_cells(cells_dic, true_count), \
+                                                             compiled.get_surrender_type()) \
+                                            for true_count in range(self.__min_true_count, self.__max_true_count + 1))
+
+    def index_cells(self, cells_dic, true_count):
+        '''return copy of cells_dic with the index plays reached by the true count,
+        the other cells are the ones of cells_dic'''
+        index_dic = {name: {row: dict(columns) for row, columns in rows_dic.items()} \
+                     for name, rows_dic in cells_dic.items()}
+        for (name, row, face_value, index, cell) in self.__index_plays_tpl:
+            if true_count >= index:
+                index_dic[name].setdefault(row, dict())[face_value] = cell
+        return index_dic
+
+    def true_count(self):
+        '''return the true count, floored and clamped to the range of strategies'''
+        true_count = math.floor(self.__counter.true_count())
+        return min(max(true_count, self.__min_true_count), self.__max_true_count)
+
+    # getter methods
+    def get_counter(self):
+        return self.__counter
+
+    def get_compiled_strategy(self):
+        if not self.__index_strategies_tpl:
+            return super().get_compiled_strategy()
+        return self.__index_strategies_tpl[self.true_count() - self.__min_true_count]
+
+
+class FlatBet:
+    """
+    FlatBet class bets the same unit every round
+
+    A bet spread has bet(player, bankroll) returning the bet of the round,
+    any object with the method can be given to Bankroll.
+
+    ...
+
+    Attributes
+    ----------
+    __unit : float
+        bet of every round
+
+    Methods
+    -------
+    bet()
+        return the bet of the round
+
+    """
+    def __init__(self, unit=1.0):
+        self.__unit = unit
+
+    def bet(self, player, bankroll):
+        ''' return the bet of the round '''
+        return self.__unit
+
+
+class CountBetSpread:
+    """
+    CountBetSpread class bets units by the true count of a CountingPlayer
+
+    ...
+
+    Attributes
+    ----------
+    __unit : float
+        bet of one unit
+    __ramp_tpl : tuple
+        (true count, units) sorted by true count, the units of the highest
+        true count not above the player's true count are bet, 1 unit below all
+
+    Methods
+    -------
+    bet()
+        return the bet of the round
+
+    """
+    def __init__(self, unit=1.0, ramp_dic=None):
+        if ramp_dic is None:
+            ramp_dic = {1: 1, 2: 2, 3: 4, 4: 8}     # 1-8 spread
+        self.__unit = unit
+        self.__ramp_tpl = tuple(sorted(ramp_dic.items()))
+
+    def bet(self, player, bankroll):
+        ''' return the bet of the round, one unit if the player does not count '''
+        if not isinstance(player, CountingPlayer):
+            return self.__unit
+        true_count = player.true_count()
+        units = 1
+        for (index, index_units) in self.__ramp_tpl:
+            if true_count < index:
+                break
+            units = index_units
+        return self.__unit * units
+
+
+class KellyBet:
+    """
+    KellyBet class bets a fraction of the Kelly bet of the estimated edge
+
+    The edge is estimated as edge + edge_per_true_count * true count
+    (true count is 0 for a player who does not count) and the Kelly bet
+    is edge / variance * bankroll. min_bet is bet when there is no edge.
+
+    ...
+
+    Attributes
+    ----------
+    __fraction : float
+        fraction of the Kelly bet (ex: 0.5 is half Kelly)
+    __edge : float
+        edge at true count 0
+    __edge_per_true_count : float
+        edge gained per true count
+    __variance : float
+        variance of the net win of one round per unit bet
+    __min_bet : float
+        bet without edge and the lowest bet
+    __max_bet : float
+        highest bet
+
+    Methods
+    -------
+    edge()
+        return the estimated edge of the round
+    bet()
+        return the bet of the round
+
+    """
+    def __init__(self, fraction=0.5, edge=-0.005, edge_per_true_count=0.005, variance=1.3, \
+                 min_bet=1.0, max_bet=float('inf')):
+        self.__fraction = fraction
+        self.__edge = edge
+        self.__edge_per_true_count = edge_per_true_count
+        self.__variance = variance
+        self.__min_bet = min_bet
+        self.__max_bet = max_bet
+
+    def edge(self, player):
+        ''' return the estimated edge of the round '''
+        true_count = player.true_count() if isinstance(player, CountingPlayer) else 0
+        return self.__edge + self.__edge_per_true_count * true_count
+
+    def bet(self, player, bankroll):
+        ''' return the bet of the round '''
+        edge = self.edge(player)
+        if edge <= 0:
+            return self.__min_bet
+        kelly_bet = self.__fraction * edge / self.__variance * bankroll
+        return min(max(kelly_bet, self.__min_bet), self.__max_bet)
+
+
+class Bankroll:
+    """
+    Bankroll class represents the money of a player
+
+    The bet of the round is placed before the cards are dealt and every
+    hand of the round is played with it, the net win of the round in units
+    of the bet (Game.check_winner()) is paid by settle().
+    Only running values are kept, not the trajectory.
+
+    ...
+
+    Attributes
+    ----------
+    __initial : float
+        bankroll at the start
+    __bankroll : float
+        current bankroll
+    __bet_spread : FlatBet, CountBetSpread, KellyBet
+        object with bet(player, bankroll) returning the bet of the round
+    __bet : float
+        bet of the current round
+    __peak : float
+        highest bankroll
+    __low : float
+        lowest bankroll
+    __max_drawdown : float
+        largest fall from a peak
+    __num_rounds : int
+        rounds settled
+    __total_bet : float
+        sum of the bets of the rounds
+    __is_ruined : bool
+        true when the bankroll is used up, no more bet is placed
+
+    Methods
+    -------
+    place_bet()
+        decide and return the bet of the round, capped by the bankroll
+    settle()
+        pay the net win of the round in units of the bet
+    is_ruined()
+        return true if the bankroll is used up
+
+    # Getters
+    get_initial()
+    get_bankroll()
+    get_bet()
+    get_peak()
+    get_low()
+    get_max_drawdown()
+    get_num_rounds()
+    get_total_bet()
+
+    """
+    def __init__(self, initial, bet_spread=None):
+        self.__initial = initial
+        self.__bankroll = initial
+        self.__bet_spread = bet_spread if bet_spread is not None else FlatBet()
+        self.__bet = 0.0
+        self.__peak = initial
+        self.__low = initial
+        self.__max_drawdown = 0.0
+        self.__num_rounds = 0
+        self.__total_bet = 0.0
+        self.__is_ruined = initial <= 0
+
+    def place_bet(self, player):
+        ''' decide and return the bet of the round, capped by the bankroll '''
+        if self.__is_ruined:
+            self.__bet = 0.0
+        else:
+            self.__bet = min(self.__bet_spread.bet(player, self.__bankroll), self.__bankroll)
+        return self.__bet
+
+    def settle(self, net_units):
+        ''' pay the net win of the round in units of the bet '''
+        self.__bankroll += net_units * self.__bet
+        self.__total_bet += self.__bet
+        self.__num_rounds += 1
+        if self.__bankroll > self.__peak:
+            self.__peak = self.__bankroll
+        elif self.__bankroll < self.__low:
+            self.__low = self.__bankroll
+        self.__max_drawdown = max(self.__max_drawdown, self.__peak - self.__bankroll)
+        if self.__bankroll <= 0:
+            self.__is_ruined = True
+
+    def is_ruined(self):
+        ''' return true if the bankroll is used up '''
+        return self.__is_ruined
+
+    # getter methods
+    def get_initial(self):
+        return self.__initial
+
+    def get_bankroll(self):
+        return self.__bankroll
+
+    def get_bet(self):
+        return self.__bet
+
+    def get_peak(self):
+        return self.__peak
+
+    def get_low(self):
+        return self.__low
+
+    def get_max_drawdown(self):
+        return self.__max_drawdown
+
+    def get_num_rounds(self):
+        return self.__num_rounds
+
+    def get_total_bet(self):
+        return self.__total_bet
+
+
+class Dealer:
+    """
+    Dealer class represents the dealer
+    
+    ...
+
+    Attributes
+    ----------
+    __game : Game
+        represents Game object that this play is play in
     __name_str : str
         name of the player
     __count_of_win : float
@@ -696,9 +2187,13 @@ class Dealer:
         hand object of the player, dealer always has one hand 
         so not implemented Hands of dealer
     __default_deck : int
-        number of deck of cards used for one shoe
-    __deck : Deck
-        deck of cards that dealer uses
+        number of deck of cards used for one shoe, read from Rules
+    __hit_soft_17 : bool
+        true if the dealer hits 17 holding an ace, read from Rules
+    __deck : Shoe
+        shoe of cards that dealer uses
+    __upcard : int
+        face value of the exposed card of this round, ace is 11
 
     Methods
     -------
@@ -732,6 +2227,7 @@ class Dealer:
     get_deck()
     get_name_str()
     get_hand()
+    get_upcard()
     get_win_count()
     get_tie_count()
     get_lose_count()
@@ -745,10 +2241,13 @@ class Dealer:
         self.__count_of_tie = 0
         self.__count_of_lose = 0
         self.__hand = Hand(player = self, hands = None)
+        self.__upcard = 0
         # dealer handles deck
-        self.__default_deck = 8
-        self.__deck = Deck(self.__default_deck)     # this game use 8 decks of card for game
-        self.__deck.shuffle()
+        rules = game.get_rules()
+        self.__default_deck = rules.get_num_decks()
+        self.__hit_soft_17 = rules.hit_soft_17()
+        self.__deck = Shoe(self.__default_deck, game.get_rng(), game.get_shuffler())     # this game use 8 decks of card by default
+        self.shuffle_deck()
 
     def add_win_count(self, count = 1.0):
         '''add +1 when dealer win'''
@@ -769,7 +2268,7 @@ class Dealer:
     def dist_to_hand(self, hand):
         '''distribute a card to hand'''
         if not hand.no_more_card():
-            drawed_card = self.__deck.draw(is_exposed=True)
+            drawed_card = self.__deck.draw()
             hand.add(drawed_card)
 
     def dist_to_player(self, player):
@@ -784,41 +2283,49 @@ class Dealer:
             self.dist_to_player(player)
     
     def dist_to_dealer(self, is_exposed=False):
-        '''distribute card to dealer's hand'''
-        drawed_card = self.get_deck().draw(is_exposed=is_exposed)
-        self.__hand.add(drawed_card)
+        '''distribute card to dealer's hand, counters see it when exposed'''
+        drawed_card = self.get_deck().draw(is_exposed)
+        self.__hand.add(drawed_card, is_exposed)
     
     def play(self):
         '''dealer plays his card'''
+        is_verbose = self.get_game().is_verbose()
         file_output_str = self.get_game().get_output_log_str()
-        # expose all dealer card
-        for card in self.get_hand().get_card_lst():
-            if not card.get_is_exposed():
-                card.set_is_exposed(True)
-        file_output_str.append("dealer's current value: " + str(self.get_hand().value()) + "\n" + str(self.get_hand()) + "\n")
-
-        isBreak = self.get_hand().is_break()
-        if isBreak:
-            file_output_str.append("DEALER BREAK!\n")
-        
-        while (self.get_hand().value() < 17 and not self.get_hand().is_soft()) or \
-               (self.get_hand().value() <= 17 and self.get_hand().is_soft()):
-            file_output_str.append(self.get_name_str() + "'s DECISION: HIT\n")
-            self.dist_to_dealer(is_exposed = True)
-            file_output_str.append(str(self.get_hand()) + "\n")
-            file_output_str.append("dealer's current value: " + str(self.get_hand().value()) + "\n")
+        # expose all dealer card, counters see the hole card now
+        hand = self.get_hand()
+        for i, card in enumerate(hand.get_card_lst()):
+            if not hand.is_card_exposed(i):
+                self.__deck.see(card)
+        hand.expose_all()
+        if is_verbose:
+            file_output_str.append("dealer's current value: " + str(self.get_hand().value()) + "\n" + str(self.get_hand()) + "\n")
+
             isBreak = self.get_hand().is_break()
             if isBreak:
                 file_output_str.append("DEALER BREAK!\n")
         
+        hit_soft_17 = self.__hit_soft_17
+        while (self.get_hand().value() < 17) or \
+               (hit_soft_17 and self.get_hand().value() == 17 and self.get_hand().is_soft()):
+            self.dist_to_dealer(is_exposed = True)
+            if is_verbose:
+                file_output_str.append(self.get_name_str() + "'s DECISION: HIT\n")
+                file_output_str.append(str(self.get_hand()) + "\n")
+                file_output_str.append("dealer's current value: " + str(self.get_hand().value()) + "\n")
+                isBreak = self.get_hand().is_break()
+                if isBreak:
+                    file_output_str.append("DEALER BREAK!\n")
+        
     def reset_hand(self):
-        '''reset dealer's hand'''
-        self.__hand = Hand(player = self, hands = None)
+        '''reset dealer's hand, the hand object is reused'''
+        self.__hand.reset()
     
     def shuffle_deck(self):
-        '''shuffle cards in shoe'''
-        self.__deck = Deck(self.__default_deck)     # this game use 8 decks of card for game
+        '''shuffle cards in shoe, the same buffer is reused'''
+        if self.get_game().is_verbose():
+            print("........Shuffle deck")
         self.__deck.shuffle()
+        self.get_game().record_shoe()
 
     # utility methods
     def dist_default(self, players):
@@ -829,6 +2336,8 @@ class Dealer:
                 self.dist_to_dealer(is_exposed=False)
             else:
                 self.dist_to_dealer(is_exposed=True)
+        # upcard is fixed for the round, cache it for the players' decisions
+        self.__upcard = self.__hand.face_value()
 
     # getter method
     def get_deck(self):
@@ -840,6 +2349,9 @@ class Dealer:
     def get_hand(self):
         return self.__hand
 
+    def get_upcard(self):
+        return self.__upcard
+
     def get_win_count(self):
         return self.__count_of_win
 
@@ -853,6 +2365,470 @@ class Dealer:
         return self.__game
 
 
+class LogWriter:
+    """
+    LogWriter class represents a streaming sink of the game log
+
+    Strings are buffered and written to file in chunks, so memory stays
+    constant no matter how many rounds are played. Without file path
+    everything appended is discarded.
+
+    ...
+
+    Attributes
+    ----------
+    __file_path : str
+        path of the log file, None to discard the log
+    __buffer_lst : list
+        strings appended since the last flush
+    __buffer_len : int
+        number of characters in __buffer_lst
+    __buffer_size : int
+        buffered characters that trigger a flush
+    __compress : bool
+        true if the log is written with gzip
+    __max_bytes : int
+        bytes of one log file before rotation, compressed bytes with __compress, 0 means no rotation
+    __backup_count : int
+        number of rotated files kept (path.1 ~ path.n)
+    __sample_every : int
+        only every Nth round is logged
+    __rounds_set : set
+        only these rounds are logged if given, instead of __sample_every
+    __is_sampled : bool
+        true if the current round is logged
+    __writer : file object
+        file being written
+    __written : int
+        bytes written to the current file, before compression
+
+    Methods
+    -------
+    append()
+        add a string to the log
+    begin_round()
+        decide whether the round is logged by sampling
+    flush()
+        write buffered strings to file
+    close()
+        flush and close the file
+
+    # Getters
+    get_file_path()
+    is_sampled()
+
+    """
+    def __init__(self, file_path=None, buffer_size=1 << 20, compress=False, \
+                 max_bytes=0, backup_count=5, sample_every=1, rounds=None):
+        if file_path is not None and compress and not file_path.endswith('.gz'):
+            file_path += '.gz'
+        self.__file_path = file_path
+        self.__buffer_lst = list()
+        self.__buffer_len = 0
+        self.__buffer_size = buffer_size
+        self.__compress = compress
+        self.__max_bytes = max_bytes
+        self.__backup_count = backup_count
+        self.__sample_every = max(1, sample_every)
+        self.__rounds_set = set(rounds) if rounds is not None else None
+        self.__is_sampled = True
+        self.__writer = None
+        self.__written = 0
+
+    def append(self, log_str):
+        ''' add a string to the log, flush when the buffer is full '''
+        if self.__file_path is None:
+            return
+        self.__buffer_lst.append(log_str)
+        self.__buffer_len += len(log_str)
+        if self.__buffer_len >= self.__buffer_size:
+            self.flush()
+
+    def begin_round(self, round_int):
+        ''' decide whether the round is logged, the first round 
+        and every Nth round after it are logged, or the rounds given '''
+        if self.__rounds_set is not None:
+            self.__is_sampled = round_int in self.__rounds_set
+        else:
+            self.__is_sampled = (round_int - 1) % self.__sample_every == 0
+        return self.__is_sampled
+
+    def flush(self):
+        ''' write buffered strings to file, rotate the file when it is full '''
+        if not self.__buffer_lst:
+            return
+        chunk = "".join(self.__buffer_lst).encode()
+        self.__buffer_lst.clear()
+        self.__buffer_len = 0
+        if self.__writer is None:
+            self.__open()
+        elif self.__max_bytes > 0 and self.__is_full(len(chunk)):
+            self.__rotate()
+        self.__writer.write(chunk)
+        self.__written += len(chunk)
+        if self.__compress and self.__max_bytes > 0:
+            # compress the chunk now, so the size of the file is known
+            self.__writer.flush()
+
+    def close(self):
+        ''' flush and close the file '''
+        self.flush()
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+
+    def __open(self):
+        ''' open the log file for writing, the log is written as UTF-8 bytes '''
+        if self.__compress:
+            self.__writer = gzip.open(self.__file_path, 'wb')
+        else:
+            self.__writer = open(self.__file_path, 'wb')
+        self.__written = 0
+
+    def __is_full(self, chunk_size):
+        ''' return true if a chunk of chunk_size bytes does not fit in the current file.
+        the compressed size of a chunk is not known before it is written, so it is
+        estimated with the compression ratio of the chunks already in the gzip file '''
+        if self.__compress:
+            file_size = self.__writer.fileobj.tell()
+            return file_size + chunk_size * file_size / max(self.__written, 1) > self.__max_bytes
+        return self.__written + chunk_size > self.__max_bytes
+
+    def __rotate(self):
+        ''' move path to path.1 (path.1 to path.2, ...) and open a new file '''
+        self.__writer.close()
+        if self.__backup_count > 0:
+            for i in range(self.__backup_count - 1, 0, -1):
+                if os.path.exists(self.__rotated_path(i)):
+                    os.replace(self.__rotated_path(i), self.__rotated_path(i + 1))
+            os.replace(self.__file_path, self.__rotated_path(1))
+        self.__open()
+
+    def __rotated_path(self, index):
+        ''' return path of the rotated file (ex: blackjack_log.1.txt) '''
+        root, ext = os.path.splitext(self.__file_path)
+        return f"{root}.{index}{ext}"
+
+    # getter methods
+    def get_file_path(self):
+        return self.__file_path
+
+    def is_sampled(self):
+        return self.__is_sampled
+
+
+class RoundRecorder:
+    """
+    RoundRecorder class records every round as fixed-width binary events
+
+    The file is a header followed by events of 4 bytes (kind, player, hand,
+    value) in the order they happen: EVENT_ROUND starts a round, EVENT_DEAL
+    holds the first two cards of a player and of the dealer (the only hand
+    at the deal, so the hand byte holds the code of the first card and
+    value the code of the second, the dealer's first card is the hole
+    card), EVENT_CARD adds a card to a hand, EVENT_DECISION is a decision
+    of Hand.decide(), with DECISION_PAIR if the hand decided as a pair the
+    rules let it split, and EVENT_OUTCOME the result of a hand in
+    Game.check_winner(). A SPLIT decision moves the second card of the
+    hand to a new hand at the end of the player's hands. Player is the
+    index of the player in the game, DEALER_INDEX for the dealer, and hand
+    is the index of the hand in the player's hands.
+
+    A round takes 8 bytes plus about 20 bytes per player: 28 bytes with
+    one player, 60 with three and 96 with five (measured with the strategy
+    folders), so 10 million rounds of three players are about 600 MB.
+
+    The header is b'BJRR', version, header size (struct '<4sHHI') and the
+    JSON of the players and rules, padded to a multiple of 8 bytes, so the
+    events can be memory-mapped as an array of event_dtype by read().
+
+    ...
+
+    Attributes
+    ----------
+    header_format_str : str
+        struct format of the fixed part of the header
+    magic : bytes
+        first bytes of a round file
+    version : int
+        version of the file layout
+    __file_path : str
+        path of the round file
+    __header_dic : dict
+        'players', 'rules', 'num_decks' and 'blackjack_payout' of the header
+    __buffer : bytearray
+        events recorded since the last flush
+    __buffer_size : int
+        buffered bytes that trigger a flush
+    __writer : file object
+        file being written
+    __num_events : int
+        events recorded, including the events of the file appended to
+
+    Methods
+    -------
+    begin_round()
+        record the start of a round
+    deal()
+        record the first two cards of every player and the dealer
+    card()
+        record the last card added to a hand
+    decision()
+        record a decision of a hand
+    dealer_hits()
+        record the cards the dealer drew in Dealer.play()
+    outcome()
+        record the result of a hand
+    flush()
+        write buffered events to file
+    close()
+        flush and close the file
+    event_dtype()
+        return NumPy dtype of an event
+    read()
+        return header and memory-mapped events of a round file
+
+    # Getters
+    get_file_path()
+    get_header()
+    get_num_events()
+
+    """
+    header_format_str = '<4sHHI'
+    magic = b'BJRR'
+    version = 3
+
+    def __init__(self, file_path, players=(), rules=None, mode='w', buffer_size=1 << 16):
+        ''' players is the list of player names in the order of the game,
+        with mode 'a' the events are appended to the file if it exists, with the same players '''
+        if rules is None:
+            rules = Rules()
+        self.__file_path = file_path
+        self.__header_dic = {'players': list(players), 'rules': str(rules), 'num_decks': rules.get_num_decks(), \
+                             'blackjack_payout': rules.get_blackjack_payout()}
+        self.__buffer = bytearray()
+        self.__buffer_size = buffer_size
+        self.__num_events = 0
+        if mode == 'a' and os.path.exists(file_path):
+            header_dic, header_size, file_size = self.__read_header(file_path)
+            if header_dic['players'] != self.__header_dic['players']:
+                raise ValueError(f"players of {file_path} are {header_dic['players']}")
+            self.__header_dic = header_dic
+            self.__num_events = (file_size - header_size) // 4
+            self.__writer = open(file_path, 'r+b')
+            # an event cut by an interruption is overwritten
+            self.__writer.seek(header_size + self.__num_events * 4)
+            self.__writer.truncate()
+        elif mode in ('w', 'a'):
+            self.__writer = open(file_path, 'wb')
+            header_bytes = json.dumps(self.__header_dic).encode()
+            header_size = struct.calcsize(self.header_format_str) + len(header_bytes)
+            header_bytes += b' ' * (-header_size % 8)
+            header_size += -header_size % 8
+            self.__writer.write(struct.pack(self.header_format_str, self.magic, self.version, 0, header_size))
+            self.__writer.write(header_bytes)
+        else:
+            raise ValueError(f"unknown mode {mode!r}")
+
+    @classmethod
+    def __read_header(cls, file_path):
+        ''' return (header dict, header size, file size) of a round file '''
+        with open(file_path, 'rb') as record_file:
+            fixed_size = struct.calcsize(cls.header_format_str)
+            magic, version, reserved, header_size = struct.unpack(cls.header_format_str, record_file.read(fixed_size))
+            if magic != cls.magic:
+                raise ValueError(f"{file_path} is not a round file")
+            if version != cls.version:
+                raise ValueError(f"version {version} of {file_path} is not supported")
+            header_dic = json.loads(record_file.read(header_size - fixed_size))
+        return (header_dic, header_size, os.path.getsize(file_path))
+
+    def __event(self, kind, player_idx, hand_idx, value):
+        ''' add an event to the buffer, flush when the buffer is full '''
+        self.__buffer.extend((kind, player_idx, hand_idx, value))
+        self.__num_events += 1
+        if len(self.__buffer) >= self.__buffer_size:
+            self.flush()
+
+    def begin_round(self):
+        ''' record the start of a round '''
+        self.__event(EVENT_ROUND, 0, 0, 0)
+
+    def deal(self, players, dealer):
+        ''' record the first two cards of every player and the dealer, one EVENT_DEAL each '''
+        for player_idx, player in enumerate(players):
+            for hand in player.get_hands():
+                cards_lst = hand.get_card_lst()
+                self.__event(EVENT_DEAL, player_idx, card_codes_dic[cards_lst[0]], card_codes_dic[cards_lst[1]])
+        cards_lst = dealer.get_hand().get_card_lst()
+        self.__event(EVENT_DEAL, DEALER_INDEX, card_codes_dic[cards_lst[0]], card_codes_dic[cards_lst[1]])
+
+    def card(self, player_idx, hand_idx, hand):
+        ''' record the last card added to the hand '''
+        self.__event(EVENT_CARD, player_idx, hand_idx, card_codes_dic[hand.get_card_lst()[-1]])
+
+    def decision(self, player_idx, hand_idx, hand, decision):
+        ''' record a decision of the hand, with DECISION_PAIR if the hand decided as a pair '''
+        # the lowest bit of the state id is the pair the hand decided with, Hand.decide() may clear is_pair()
+        is_pair = hand.get_state_id() & 1
+        self.__event(EVENT_DECISION, player_idx, hand_idx, decision_codes_dic[decision] | (DECISION_PAIR * is_pair))
+
+    def dealer_hits(self, dealer):
+        ''' record the cards the dealer drew in Dealer.play() '''
+        for card in dealer.get_hand().get_card_lst()[2:]:
+            self.__event(EVENT_CARD, DEALER_INDEX, 0, card_codes_dic[card])
+
+    def outcome(self, player_idx, hand_idx, outcome):
+        ''' record the result of the hand, outcome is the index in outcomes_tpl '''
+        self.__event(EVENT_OUTCOME, player_idx, hand_idx, outcome)
+
+    def flush(self):
+        ''' write buffered events to file '''
+        if self.__buffer:
+            self.__writer.write(self.__buffer)
+            self.__buffer.clear()
+
+    def close(self):
+        ''' flush and close the file '''
+        if self.__writer is not None:
+            self.flush()
+            self.__writer.close()
+            self.__writer = None
+
+    @staticmethod
+    def event_dtype():
+        ''' return NumPy dtype of an event '''
+        import numpy as np
+        return np.dtype([('kind', 'u1'), ('player', 'u1'), ('hand', 'u1'), ('value', 'u1')])
+
+    @classmethod
+    def read(cls, file_path):
+        ''' return (header dict, events) of a round file, events is a read only
+        NumPy memmap of event_dtype, an event cut by an interruption is left out '''
+        import numpy as np
+        header_dic, header_size, file_size = cls.__read_header(file_path)
+        num_events = (file_size - header_size) // 4
+        if num_events == 0:
+            return (header_dic, np.zeros(0, dtype=cls.event_dtype()))
+        return (header_dic, np.memmap(file_path, dtype=cls.event_dtype(), mode='r', offset=header_size, \
+                                      shape=(num_events,)))
+
+    # getter methods
+    def get_file_path(self):
+        return self.__file_path
+
+    def get_header(self):
+        return self.__header_dic
+
+    def get_num_events(self):
+        return self.__num_events
+
+
+# this class represents the table rules of a game
+class Rules:
+    """
+    Rules class represents the table rules of a Game
+
+    Every rule is read once when the Game, Dealer and Hands are set up,
+    nothing is looked up per hand. The default rules are the rules this
+    simulator always played: 8 decks, reshuffle at 50 cards left, the
+    dealer hits 17 holding an ace, double after split, unlimited resplit,
+    a two card 21 is paid as any 21 and surrender with any number of cards.
+
+    ...
+
+    Attributes
+    ----------
+    __num_decks : int
+        number of decks in the shoe
+    __reshuffle_cards : int
+        the shoe is reshuffled when this number of cards or less is left
+    __hit_soft_17 : bool
+        true if the dealer hits 17 holding an ace (H17), false if stands on 17 (S17)
+    __double_after_split : bool
+        true if a split hand can double
+    __max_hands : int
+        most hands of a player by resplitting, 0 if unlimited
+    __resplit_aces : bool
+        true if split aces can be split again
+    __blackjack_payout : float
+        payout of a natural (two card 21 not split), None if a natural is paid as any 21
+    __surrender : str
+        SURRENDER_NONE, SURRENDER_TWO_CARDS or SURRENDER_ANY
+
+    Methods
+    -------
+    is_split_restricted()
+        return true if double after split or resplit is limited
+
+    # Getters
+    get_num_decks()
+    get_reshuffle_cards()
+    hit_soft_17()
+    double_after_split()
+    get_max_hands()
+    resplit_aces()
+    get_blackjack_payout()
+    get_surrender()
+
+    """
+    def __init__(self, num_decks=8, penetration=None, hit_soft_17=True, double_after_split=True, \
+                 max_hands=0, resplit_aces=True, blackjack_payout=None, surrender=SURRENDER_ANY):
+        ''' penetration is the fraction of the shoe dealt before reshuffle,
+        None keeps reshuffle at 50 cards left '''
+        if num_decks < 1:
+            raise ValueError(f"number of decks {num_decks} is less than 1")
+        if penetration is not None and not 0 < penetration < 1:
+            raise ValueError(f"penetration {penetration} is not between 0 and 1")
+        if surrender not in (SURRENDER_NONE, SURRENDER_TWO_CARDS, SURRENDER_ANY):
+            raise ValueError(f"unknown surrender type {surrender!r}")
+        self.__num_decks = num_decks
+        num_cards = num_decks * len(shapes_tpl) * len(numbers_tpl)
+        self.__reshuffle_cards = 50 if penetration is None else int(round(num_cards * (1 - penetration)))
+        self.__hit_soft_17 = hit_soft_17
+        self.__double_after_split = double_after_split
+        self.__max_hands = max_hands
+        self.__resplit_aces = resplit_aces
+        self.__blackjack_payout = blackjack_payout
+        self.__surrender = surrender
+
+    def __str__(self):
+        ''' string representation of rules object '''
+        return f"{self.__num_decks} decks, reshuffle at {self.__reshuffle_cards} cards, " \
+               f"{'H17' if self.__hit_soft_17 else 'S17'}, {'DAS' if self.__double_after_split else 'no DAS'}, " \
+               f"{self.__max_hands or 'unlimited'} hands, {'RSA' if self.__resplit_aces else 'no RSA'}, " \
+               f"blackjack pays {self.__blackjack_payout or 1}, surrender {self.__surrender}"
+
+    def is_split_restricted(self):
+        ''' return true if double after split or resplit is limited '''
+        return not self.__double_after_split or self.__max_hands > 0 or not self.__resplit_aces
+
+    # getter methods
+    def get_num_decks(self):
+        return self.__num_decks
+
+    def get_reshuffle_cards(self):
+        return self.__reshuffle_cards
+
+    def hit_soft_17(self):
+        return self.__hit_soft_17
+
+    def double_after_split(self):
+        return self.__double_after_split
+
+    def get_max_hands(self):
+        return self.__max_hands
+
+    def resplit_aces(self):
+        return self.__resplit_aces
+
+    def get_blackjack_payout(self):
+        return self.__blackjack_payout
+
+    def get_surrender(self):
+        return self.__surrender
+
+
 # this class represents a game
 class Game:
     """
@@ -862,8 +2838,26 @@ class Game:
 
     Attributes
     ----------
-    __output_log_str : list
-        stores string to print out to file
+    __log_level : int
+        LOG_NONE, LOG_SUMMARY or LOG_VERBOSE
+    __is_verbose : bool
+        true if the current round is logged
+    __output_log_str : LogWriter
+        streams string to print out to file
+    __rng : random.Random
+        random generator of the shoe, module random if None
+    __rules : Rules
+        table rules of the game
+    __shuffler : SeededShuffler
+        shuffles every shoe with a seed derived from the seed of the game, None without seed
+    __replay : ShoeReplay
+        replay file the seed of every shoe is written to, None if not recorded
+    __recorder : RoundRecorder
+        binary file every card, decision and outcome is recorded to, None if not recorded
+    __reshuffle_cards : int
+        the shoe is reshuffled at this number of cards left, read from Rules
+    __blackjack_payout : float
+        payout of a natural, None if paid as any 21, read from Rules
     __round : int
         round of game
     __players : Player
@@ -881,21 +2875,68 @@ class Game:
         check winner
     add_round()
         increase round by 1
+    play_round()
+        play one round with the cards left in the shoe
+    play_shoe(max_rounds)
+        play rounds until the shoe runs low or max_rounds
+    play(simulation_target, tolerance)
+        play rounds until simulation_target or every net win per round is
+        known within tolerance, shuffle the shoe when it runs low
+    record_shoe()
+        write the seed of the shoe just shuffled to the replay file
+    is_precise(tolerance)
+        return true if the net win per round of every player is known within tolerance
+    report()
+        log and print the results of the rounds played
+    get_statistics()
+        return dict of win, tie, lose counts per player and dealer
+    close_log()
+        flush and close the log file
+    is_verbose()
+        return true if every round is logged
     
     # getters
     get_dealer()
     get_players()
     get_round()
+    get_log_level()
     get_output_log_str()
+    get_rng()
+    get_rules()
+    get_shuffler()
+
+    # setters
+    set_round()
 
     """
     # create default 1 player and 1 dealer
-    def __init__(self):
-        self.__output_log_str = list()
+    def __init__(self, log_level=LOG_VERBOSE, log_writer=None, rng=None, rules=None, \
+                 seed=None, rng_backend=RNG_MT, replay_path=None, first_shoe=0, recorder=None):
+        ''' with seed every shoe is shuffled by SeededShuffler of rng_backend instead of rng,
+        replay_path records the seed of every shoe, first_shoe is the index of the first shoe,
+        recorder is RoundRecorder of the rounds played, players are added in the order of its header '''
+        self.__rng = rng
+        self.__rules = rules if rules is not None else Rules()
+        self.__shuffler = SeededShuffler(seed, rng_backend, first_shoe) if seed is not None else None
+        self.__replay = None
+        if replay_path is not None:
+            if self.__shuffler is None:
+                raise ValueError("replay file needs a seed")
+            self.__replay = ShoeReplay(replay_path, 'w', seed, rng_backend, self.__rules.get_num_decks())
+        self.__recorder = recorder
+        self.__reshuffle_cards = self.__rules.get_reshuffle_cards()
+        self.__blackjack_payout = self.__rules.get_blackjack_payout()
+        self.__log_level = log_level
+        self.__is_verbose = log_level >= LOG_VERBOSE
+        if log_writer is None:
+            log_file = os.getcwd() + os.sep + 'blackjack_log.txt' if log_level > LOG_NONE else None
+            log_writer = LogWriter(log_file)
+        self.__output_log_str = log_writer
         self.__round = 0
         self.__players = list()
         self.__dealer = Dealer(self)
-        self.__output_log_str.append(f"Game prepared with {self.__dealer.get_deck().get_num_decks()} decks of cards\n")
+        if self.is_verbose():
+            self.__output_log_str.append(f"Game prepared with {self.__dealer.get_deck().get_num_decks()} decks of cards\n")
 
     def add_player(self, player):
         '''add player to game object'''
@@ -903,6 +2944,8 @@ class Game:
 
     def show_players(self):
         '''show players of the game'''
+        if not self.is_verbose():
+            return
         self.__output_log_str.append(f"Current Game participants are \n")
         self.__output_log_str.append('-'*30 + "\n")
         for player in self.__players:
@@ -911,11 +2954,15 @@ class Game:
     
     def check_winner(self):
         '''check winner'''
+        is_verbose = self.is_verbose()
         file_output_str = self.get_output_log_str()
-        file_output_str.append("--- WINNERS ---\n")
-        for player in self.get_players():
+        if is_verbose:
+            file_output_str.append("--- WINNERS ---\n")
+        blackjack_payout = self.__blackjack_payout
+        recorder = self.__recorder
+        for player_idx, player in enumerate(self.get_players()):
             player_name = player.get_name_str()
-            for hand in player.get_hands():
+            for hand_idx, hand in enumerate(player.get_hands()):
                 dealer = self.get_dealer()
                 hand_of_dealer = dealer.get_hand()
                 hand_of_player = hand
@@ -924,38 +2971,290 @@ class Game:
                 if hand.get_last_decision() == 'SUR':
                     player.add_lose_count(0.5)
                     dealer.add_win_count(0.5)
+                    outcome = OUTCOME_SUR
                 else :
                     count = 1
                     if hand.get_last_decision() == 'DOUBLE':
                         count = 2 * count
 
-                    if not hand.is_break() and not hand_of_dealer.is_break():
-                        if hand.value() > hand_of_dealer.value():
-                            file_output_str.append(f"PLAYER {player_name} WIN (P: {value_of_player}, D: {value_of_dealer})\n")
+                    natural = 0
+                    if blackjack_payout is not None and (value_of_player == 21 or value_of_dealer == 21):
+                        natural = self.__natural_winner(hand, hand_of_dealer)
+                    if natural > 0:
+                        if is_verbose:
+                            file_output_str.append(f"PLAYER {player_name} WIN (BLACKJACK) (P: {value_of_player}, D: {value_of_dealer})\n")
+                        player.add_win_count(blackjack_payout)
+                        dealer.add_lose_count(blackjack_payout)
+                        outcome = OUTCOME_BLACKJACK
+                    elif natural < 0:
+                        if is_verbose:
+                            file_output_str.append(f"PLAYER {player_name} LOSE (DEALER BLACKJACK) (P: {value_of_player}, D: {value_of_dealer})\n")
+                        dealer.add_win_count(count)
+                        player.add_lose_count(count)
+                        outcome = OUTCOME_DEALER_BLACKJACK_DOUBLE if count == 2 else OUTCOME_DEALER_BLACKJACK
+                    elif not hand.is_break() and not hand_of_dealer.is_break():
+                        if value_of_player > value_of_dealer:
+                            if is_verbose:
+                                file_output_str.append(f"PLAYER {player_name} WIN (P: {value_of_player}, D: {value_of_dealer})\n")
                             player.add_win_count(count)
                             dealer.add_lose_count(count)
-                        elif hand.value() < hand_of_dealer.value():
-                            file_output_str.append(f"PLAYER {player_name} LOSE (P: {value_of_player}, D: {value_of_dealer})\n")
+                            outcome = OUTCOME_WIN_DOUBLE if count == 2 else OUTCOME_WIN
+                        elif value_of_player < value_of_dealer:
+                            if is_verbose:
+                                file_output_str.append(f"PLAYER {player_name} LOSE (P: {value_of_player}, D: {value_of_dealer})\n")
                             dealer.add_win_count(count)
                             player.add_lose_count(count)
+                            outcome = OUTCOME_LOSE_DOUBLE if count == 2 else OUTCOME_LOSE
                         else:
-                            file_output_str.append(f"PLAYER {player_name} TIE with DEALER (P: {value_of_player}, D: {value_of_dealer})\n")
+                            if is_verbose:
+                                file_output_str.append(f"PLAYER {player_name} TIE with DEALER (P: {value_of_player}, D: {value_of_dealer})\n")
                             player.add_tie_count()
                             dealer.add_tie_count()
+                            outcome = OUTCOME_TIE
 
                     elif hand.is_break():
-                        file_output_str.append(f"PLAYER {player_name} LOSE (BREAK, over 21)  (P: {value_of_player}, D: {value_of_dealer})\n")
+                        if is_verbose:
+                            file_output_str.append(f"PLAYER {player_name} LOSE (BREAK, over 21)  (P: {value_of_player}, D: {value_of_dealer})\n")
                         dealer.add_win_count(count)
                         player.add_lose_count(count)
+                        outcome = OUTCOME_LOSE_DOUBLE if count == 2 else OUTCOME_LOSE
                     else:
-                        file_output_str.append(f"PLAYER {player_name} WIN (P: {value_of_player}, D: {value_of_dealer})\n")
+                        if is_verbose:
+                            file_output_str.append(f"PLAYER {player_name} WIN (P: {value_of_player}, D: {value_of_dealer})\n")
                         player.add_win_count(count)
                         dealer.add_lose_count(count)
+                        outcome = OUTCOME_WIN_DOUBLE if count == 2 else OUTCOME_WIN
+                if recorder is not None:
+                    recorder.outcome(player_idx, hand_idx, outcome)
+
+    @staticmethod
+    def __natural_winner(hand, hand_of_dealer):
+        '''return 1 if only the player has a natural (two card 21 of a hand not split),
+        -1 if only the dealer has, otherwise 0'''
+        is_player_natural = hand.value() == 21 and len(hand.get_card_lst()) == 2 and \
+                            not hand.get_hands().is_splited()
+        is_dealer_natural = hand_of_dealer.value() == 21 and len(hand_of_dealer.get_card_lst()) == 2
+        return int(is_player_natural) - int(is_dealer_natural)
 
     def add_round(self):
         '''increase round by 1'''
         self.__round += 1
 
+    def play_round(self):
+        '''play one round with the cards left in the shoe'''
+        is_verbose = self.is_verbose()
+        file_output_str = self.get_output_log_str()
+        dealer = self.get_dealer()
+        players = self.get_players()
+        recorder = self.__recorder
+        self.add_round()
+        if recorder is not None:
+            recorder.begin_round()
+        if self.__log_level >= LOG_VERBOSE:
+            self.__is_verbose = file_output_str.begin_round(self.get_round())
+            is_verbose = self.__is_verbose
+        if is_verbose:
+            file_output_str.append(f"----- round {self.get_round()} START -----\n")
+        # bets are placed before the cards are dealt
+        for player in players:
+            player.place_bet()
+
+        # distribute two cards per player, 
+        # and draw cards to self (one is exposed the other is not)
+        dealer.dist_default(players)
+        if recorder is not None:
+            recorder.deal(players, dealer)
+
+        # for each gamer play hit or stand or break
+        for player_idx, player in enumerate(players):
+            if is_verbose:
+                file_output_str.append("-"*30 + "\n") 
+                file_output_str.append(f"Player {player.get_name_str()}'s game\n") 
+                file_output_str.append("-"*30 + "\n") 
+            strategy = player.get_compiled_strategy()
+            for hand_idx, hand in enumerate(player.get_hands()):
+                # if only one card distributed add one more
+                if len(hand.get_card_lst()) == 1:
+                    dealer.dist_to_hand(hand)
+                    if recorder is not None:
+                        recorder.card(player_idx, hand_idx, hand)
+                isBreak = hand.is_break()
+                decision = hand.decide(player, dealer, strategy)
+                hand.set_last_decision(decision)
+                if recorder is not None:
+                    recorder.decision(player_idx, hand_idx, hand, decision)
+                if is_verbose:
+                    file_output_str.append(player.get_name_str() + "'s DECISION: " + decision + "\n")
+                if decision == 'SPLIT':
+                    hand.split_hand()
+                if decision == 'DOUBLE':
+                    dealer.dist_to_hand(hand)
+                    if recorder is not None:
+                        recorder.card(player_idx, hand_idx, hand)
+                    if is_verbose:
+                        file_output_str.append(f"player " + player.get_name_str() + " takes only one card more and can't receive more\n") 
+                        file_output_str.append(hand.show_hand(player))
+                    hand.set_no_more_card(True)
+                
+                while (decision not in ['SUR', 'STAND'] and not isBreak and not hand.no_more_card()):
+                    dealer.dist_to_hand(hand)
+                    if recorder is not None:
+                        recorder.card(player_idx, hand_idx, hand)
+                    if is_verbose:
+                        file_output_str.append(hand.show_hand(player))
+                    isBreak = hand.is_break()
+                    if not isBreak and not hand.no_more_card():
+                        decision = hand.decide(player, dealer, strategy)
+                        hand.set_last_decision(decision)
+                        if recorder is not None:
+                            recorder.decision(player_idx, hand_idx, hand, decision)
+                        if is_verbose:
+                            file_output_str.append(player.get_name_str() + "'s DECISION: " + decision + "\n")
+                        if decision == 'SPLIT':
+                            hand.split_hand()
+                        if decision == 'DOUBLE':
+                            dealer.dist_to_hand(hand)
+                            if recorder is not None:
+                                recorder.card(player_idx, hand_idx, hand)
+                            if is_verbose:
+                                file_output_str.append(f"player " + player.get_name_str() + " takes only one card more and can't receive more\n") 
+                                file_output_str.append(hand.show_hand(player)) 
+                            hand.set_no_more_card(True)
+        
+        # dealer hit or stand
+        if is_verbose:
+            file_output_str.append("-"*30 + "\n") 
+            file_output_str.append(f"Player {dealer.get_name_str()}'s game\n") 
+            file_output_str.append("-"*30 + "\n") 
+        dealer.play()     
+        if recorder is not None:
+            recorder.dealer_hits(dealer)
+
+        # check winner
+        self.check_winner()
+        for player in players:
+            player.settle_bet()
+
+        # reset hands
+        for player in players:
+            player.reset_hands()
+        
+        dealer.reset_hand()
+        if is_verbose:
+            print(f"round {self.get_round()} finished. remaining cards: " + str(dealer.get_deck().get_num_cards()) + "\n")
+            file_output_str.append(f"round {self.get_round()} finished. remaining cards: " + str(dealer.get_deck().get_num_cards()) + "\n")
+            file_output_str.append("-" * 20 + "\n")
+
+    def play_shoe(self, max_rounds):
+        '''play rounds until the shoe runs low or max_rounds, return rounds played'''
+        deck = self.get_dealer().get_deck()
+        shoe_round = 0
+        reshuffle_cards = self.__reshuffle_cards
+        while (deck.get_num_cards() > reshuffle_cards and shoe_round < max_rounds):
+            shoe_round += 1
+            self.play_round()
+        return shoe_round
+
+    def play(self, simulation_target, tolerance=None, z=1.96, min_rounds=1000):
+        '''play rounds until simulation_target, shuffle the shoe when it runs low.
+        with tolerance the play also stops after a shoe when the confidence interval
+        (z, 95% by default) of net win per round of every player is within +/- tolerance,
+        checked after min_rounds. simulation_target can be float('inf') with tolerance'''
+        dealer = self.get_dealer()
+        simulation_round = 0
+        while (simulation_round < simulation_target):
+            simulation_round += self.play_shoe(simulation_target - simulation_round)
+
+            # shuffle deck
+            dealer.shuffle_deck()
+
+            if tolerance is not None and simulation_round >= min_rounds and self.is_precise(tolerance, z):
+                break
+
+    def record_shoe(self):
+        '''write the seed of the shoe just shuffled to the replay file'''
+        if self.__replay is not None:
+            self.__replay.record(self.__shuffler.get_shoe_index(), self.__shuffler.get_shoe_seed(), self.__round + 1)
+
+    def is_precise(self, tolerance, z=1.96):
+        '''return true if the net win per round of every player is known within +/- tolerance'''
+        for player in self.get_players():
+            if player.get_net_stats().half_width(z) > tolerance:
+                return False
+        return True
+
+    def report(self):
+        '''log and print the results of the rounds played'''
+        if self.get_log_level() < LOG_SUMMARY:
+            return
+        file_output_str = self.get_output_log_str()
+        dealer = self.get_dealer()
+        file_output_str.append(f"results of {self.get_round()} rounds played\n")
+        
+        for player in self.get_players():
+            file_output_str.append(f"player {player.get_name_str()} won: {player.get_win_count()} tie: {player.get_tie_count()} lose: {player.get_lose_count()}\n")
+            file_output_str.append(f"\t\tNET WIN {player.get_win_count() - player.get_lose_count()}\n") 
+            file_output_str.append(self.__net_stats_str(player))
+            file_output_str.append(f"winning average (except tie): {player.get_win_count()/(player.get_win_count()+player.get_lose_count()):.2%} <----------\n") 
+            file_output_str.append(f"winning average (including tie): {player.get_win_count() / (player.get_win_count() + player.get_tie_count() + player.get_lose_count()):.2%}\n")
+
+            print(f"player {player.get_name_str()} won: {player.get_win_count()} tie: {player.get_tie_count()} lose: {player.get_lose_count()}\n")
+            print(f"\t\tNET WIN {player.get_win_count() - player.get_lose_count()}\n") 
+            print(self.__net_stats_str(player))
+            print(f"winning average (except tie): {player.get_win_count()/(player.get_win_count()+player.get_lose_count()):.2%} <----------\n") 
+            print(f"winning average (including tie): {player.get_win_count() / (player.get_win_count() + player.get_tie_count() + player.get_lose_count()):.2%}\n")
+
+        dealer_count = dealer.get_win_count() + dealer.get_tie_count() + dealer.get_lose_count()
+        file_output_str.append(f"dealer {dealer.get_name_str()} won: {dealer.get_win_count()} tie: {dealer.get_tie_count()} lose: {dealer.get_lose_count()}\n")
+        file_output_str.append(f"winning average (except tie): {dealer.get_win_count()/(dealer.get_win_count() + dealer.get_lose_count()):.2%}\n")
+        file_output_str.append(f"winning average (including tie): {dealer.get_win_count()/dealer_count:.2%}\n")
+        # file_output_str.append("Deck is empty ----\n")
+        # file_output_str.append("shuffle deck\n")
+        file_output_str.append("simulation completed.\n")
+
+        print(f"dealer {dealer.get_name_str()} won: {dealer.get_win_count()} tie: {dealer.get_tie_count()} lose: {dealer.get_lose_count()}\n")
+        print(f"winning average (except tie): {dealer.get_win_count()/(dealer.get_win_count() + dealer.get_lose_count()):.2%}\n")
+        print(f"winning average (including tie): {dealer.get_win_count()/dealer_count:.2%}\n")
+        # print("Deck is empty ----\n")
+        # print("shuffle deck\n")
+        print("simulation completed.\n")
+
+    @staticmethod
+    def __net_stats_str(player):
+        '''return line of net win per round with 95% confidence interval'''
+        net_stats = player.get_net_stats()
+        return f"\t\tNET WIN per round {net_stats.get_mean():.4%} +/- {net_stats.half_width():.4%} (95% CI), sd {net_stats.sd():.4f}\n"
+
+    def get_statistics(self):
+        '''return dict of win, tie, lose counts per player and dealer,
+        players also have 'mean', 'variance' and 'se' of net win per round'''
+        statistics_dic = dict()
+        for player in self.get_players() + [self.get_dealer()]:
+            statistics_dic[player.get_name_str()] = {
+                'rounds': self.get_round(),
+                'win': player.get_win_count(),
+                'tie': player.get_tie_count(),
+                'lose': player.get_lose_count(),
+                'net_win': player.get_win_count() - player.get_lose_count(),
+            }
+        for player in self.get_players():
+            net_stats = player.get_net_stats()
+            statistics_dic[player.get_name_str()].update({'mean': net_stats.get_mean(), \
+                                                          'variance': net_stats.variance(), 'se': net_stats.se()})
+        return statistics_dic
+
+    def close_log(self):
+        '''flush and close the log file, the replay file and the round file'''
+        self.get_output_log_str().close()
+        if self.__replay is not None:
+            self.__replay.close()
+        if self.__recorder is not None:
+            self.__recorder.close()
+
+    def is_verbose(self):
+        '''return true if the current round is logged'''
+        return self.__is_verbose
+
     # getter methods
     def get_dealer(self):
         return self.__dealer
@@ -965,12 +3264,406 @@ class Game:
     
     def get_round(self):
         return self.__round
+
+    def get_log_level(self):
+        return self.__log_level
     
     def get_output_log_str(self):
         return self.__output_log_str
 
+    def get_rng(self):
+        return self.__rng
+
+    def get_rules(self):
+        return self.__rules
+
+    def get_shuffler(self):
+        return self.__shuffler
+
+    # setter methods
+    def set_round(self, round_int):
+        self.__round = round_int
+
+
+class Profiler:
+    """
+    Profiler class counts calls and times of the phases of a round
+
+    While enabled, the methods of phases_tpl are replaced on their classes
+    by wrappers that count calls and add up perf_counter_ns() around them.
+    Disabled, the original methods are put back, so a game that is not
+    profiled runs the same code as without Profiler. Times are cumulative:
+    a phase called inside another one (ex: 'log' inside 'decide' of a
+    verbose round) is counted in both.
+
+    ...
+
+    Attributes
+    ----------
+    phases_tpl : tuple
+        (phase name, class, method name) of every phase timed
+    active : Profiler
+        the profiler enabled in this process, None if none is
+    __counters_dic : dict
+        phase name -> [calls, cumulative ns]
+    __originals_lst : list
+        (class, method name, original function) replaced while enabled
+    __num_hands : int
+        player hands played, counted when the hands are reset
+    __start_ns : int
+        perf_counter_ns() when enabled
+    __wall_ns : int
+        ns between enable() and disable(), summed if enabled again
+
+    Methods
+    -------
+    enable()
+        replace the methods of the phases with timed wrappers
+    disable()
+        put the original methods back
+    summary()
+        return dict of the counters, machine readable
+    write()
+        write summary() to a JSON file
+
+    # Getters
+    get_counters()
+
+    """
+    phases_tpl = (
+        ('round', Game, 'play_round'),
+        ('dist_default', Dealer, 'dist_default'),
+        ('decide', Hand, 'decide'),
+        ('dealer_play', Dealer, 'play'),
+        ('check_winner', Game, 'check_winner'),
+        ('shuffle_deck', Dealer, 'shuffle_deck'),
+        ('log', LogWriter, 'append'),
+        ('log_flush', LogWriter, 'flush'),
+    )
+    active = None
+
+    def __init__(self):
+        self.__counters_dic = {name: [0, 0] for name, cls, method_name in self.phases_tpl}
+        self.__originals_lst = list()
+        self.__num_hands = 0
+        self.__start_ns = 0
+        self.__wall_ns = 0
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+        return False
+
+    def enable(self):
+        ''' replace the methods of the phases with timed wrappers '''
+        if Profiler.active is not None:
+            raise RuntimeError("another Profiler is enabled")
+        Profiler.active = self
+        for name, cls, method_name in self.phases_tpl:
+            function = cls.__dict__[method_name]
+            self.__originals_lst.append((cls, method_name, function))
+            setattr(cls, method_name, self.__timed(function, self.__counters_dic[name]))
+        reset_hands = Player.__dict__['reset_hands']
+        self.__originals_lst.append((Player, 'reset_hands', reset_hands))
+        setattr(Player, 'reset_hands', self.__counting_hands(reset_hands))
+        self.__start_ns = time.perf_counter_ns()
+
+    def disable(self):
+        ''' put the original methods back '''
+        if Profiler.active is not self:
+            return
+        self.__wall_ns += time.perf_counter_ns() - self.__start_ns
+        for cls, method_name, function in reversed(self.__originals_lst):
+            setattr(cls, method_name, function)
+        self.__originals_lst.clear()
+        Profiler.active = None
+
+    @staticmethod
+    def __timed(function, counter_lst):
+        ''' return function that counts the calls and times of function in counter_lst '''
+        perf_counter_ns = time.perf_counter_ns
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counter_lst[1] += perf_counter_ns() - start
+                counter_lst[0] += 1
+        timed.__wrapped__ = function
+        return timed
+
+    def __counting_hands(self, function):
+        ''' return Player.reset_hands that counts the hands of the round before resetting them '''
+        def counting_hands(player):
+            for hand in player.get_hands():
+                self.__num_hands += 1
+            return function(player)
+        counting_hands.__wrapped__ = function
+        return counting_hands
+
+    def summary(self):
+        ''' return dict of 'wall_ns', 'rounds', 'hands', 'rounds_per_sec', 'hands_per_sec'
+        and 'phases', phase name -> {'calls', 'total_ns', 'mean_ns', 'calls_per_sec', 'share'}.
+        per sec rates are of the wall time, 'share' is the part of the wall time spent in the phase '''
+        wall_ns = self.__wall_ns
+        if Profiler.active is self:
+            wall_ns += time.perf_counter_ns() - self.__start_ns
+        wall_sec = wall_ns / 1e9
+        phases_dic = dict()
+        for name, (calls, total_ns) in self.__counters_dic.items():
+            phases_dic[name] = {'calls': calls, 'total_ns': total_ns, \
+                                'mean_ns': total_ns / calls if calls else 0.0, \
+                                'calls_per_sec': calls / wall_sec if wall_sec else 0.0, \
+                                'share': total_ns / wall_ns if wall_ns else 0.0}
+        rounds = self.__counters_dic['round'][0]
+        return {'python': sys.version.split()[0], 'wall_ns': wall_ns, 'rounds': rounds, 'hands': self.__num_hands, \
+                'rounds_per_sec': rounds / wall_sec if wall_sec else 0.0, \
+                'hands_per_sec': self.__num_hands / wall_sec if wall_sec else 0.0, 'phases': phases_dic}
+
+    def write(self, file_path):
+        ''' write summary() to a JSON file '''
+        with open(file_path, 'w') as profile_file:
+            json.dump(self.summary(), profile_file, indent=2)
+            profile_file.write("\n")
+
+    # getter methods
+    def get_counters(self):
+        return self.__counters_dic
+
+
+def simulate(players, rounds, log_level=LOG_NONE, log_writer=None, rng=None, tolerance=None, rules=None, \
+             seed=None, rng_backend=RNG_MT, replay_path=None, profile_path=None, record_path=None):
+    '''simulate rounds without user input and return statistics per player
+    players is a list of player names, each name is a strategy folder.
+    with LOG_NONE no log string is built and nothing is printed,
+    log_writer streams the log (default blackjack_log.txt),
+    rng is random.Random used to shuffle (default module random),
+    with tolerance the simulation stops early when the net win per round
+    of every player is known within +/- tolerance (95% confidence),
+    rules is Rules of the table (default Rules()),
+    with seed every shoe is shuffled with a seed of its own by rng_backend,
+    and replay_path records the seed of every shoe for replay_round(),
+    with profile_path the rounds are played under Profiler and its
+    summary is written to profile_path as JSON, and with record_path every
+    round is recorded by RoundRecorder '''
+    recorder = RoundRecorder(record_path, players, rules) if record_path is not None else None
+    game = Game(log_level, log_writer, rng, rules, seed, rng_backend, replay_path, recorder=recorder)
+    for name in players:
+        game.add_player(Player(game, name))
+    game.show_players()
+    dealer = game.get_dealer()
+    if game.is_verbose():
+        game.get_output_log_str().append(f"cards in deck is {dealer.get_deck().get_num_cards()}\n\n")
+
+    # load each player's strategy
+    for player in game.get_players():
+        player.load_strategy()
+
+    profiler = Profiler() if profile_path is not None else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        game.play(rounds, tolerance)
+        game.report()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        game.close_log()
+    if profiler is not None:
+        profiler.write(profile_path)
+
+    return game.get_statistics()
+
+
+def replay_round(players, replay_path, round_int, log_writer=None, rules=None):
+    '''regenerate one round of a run recorded by simulate() with replay_path.
+    only the shoe of the round is shuffled again and played up to the round,
+    so players and rules must be the same as the run. the round is logged
+    to log_writer (default blackjack_log.txt) and statistics of the round
+    are returned '''
+    replay = ShoeReplay(replay_path)
+    try:
+        shoe_index = replay.find_round(round_int)
+        shoe_seed, first_round = replay.get_shoe(shoe_index)
+        seed, rng_backend = replay.get_seed(), replay.get_backend()
+    finally:
+        replay.close()
+    if log_writer is None:
+        log_writer = LogWriter(os.getcwd() + os.sep + 'blackjack_log.txt', rounds=[round_int])
+
+    game = Game(LOG_VERBOSE, log_writer, rules=rules, seed=seed, rng_backend=rng_backend, first_shoe=shoe_index)
+    if game.get_shuffler().get_shoe_seed() != shoe_seed:
+        raise ValueError(f"shoe {shoe_index} of {replay_path} is not shuffled with the seed recorded")
+    for name in players:
+        game.add_player(Player(game, name))
+    for player in game.get_players():
+        player.load_strategy()
+
+    game.set_round(first_round - 1)
+    try:
+        game.play_shoe(round_int - first_round)
+        before_dic = game.get_statistics()
+        game.play_shoe(1)
+    finally:
+        game.close_log()
+    after_dic = game.get_statistics()
+    return {name: {key: after_dic[name][key] - before_dic[name][key] for key in ('win', 'tie', 'lose', 'net_win')} \
+            for name in after_dic}
+
+
+def simulate_batch(batch_tpl):
+    '''simulate one batch of simulate_parallel() in a worker process
+    batch_tpl is (players, rounds, seed, rules) '''
+    players, rounds, seed, rules = batch_tpl
+    return simulate(players, rounds, LOG_NONE, rng=random.Random(seed), rules=rules)
+
+
+# keys of get_statistics() that are not summed over batches
+summary_keys_tpl = ('mean', 'variance', 'se')
+
+
+def simulate_parallel(players, rounds, workers=None, seed=0, batches=None, rules=None):
+    '''simulate rounds in worker processes and return merged statistics
+    rounds are split into batches (default one per worker), each batch
+    starts with a fresh shoe and its own seed derived from seed,
+    so the result is reproducible for the same seed and batches '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if batches is None:
+        batches = workers
+    batches = max(1, min(batches, rounds))
+    master_rng = random.Random(seed)
+    batch_lst = list()
+    for i in range(batches):
+        batch_rounds = rounds // batches + (1 if i < rounds % batches else 0)
+        batch_lst.append((list(players), batch_rounds, master_rng.getrandbits(64), rules))
+
+    import multiprocessing
+    with multiprocessing.Pool(min(workers, batches)) as pool:
+        results = pool.map(simulate_batch, batch_lst, chunksize=1)
+
+    # merge counters of each batch, in batch order
+    statistics_dic = dict()
+    net_stats_dic = dict()
+    for result in results:
+        for name, counts in result.items():
+            merged = statistics_dic.setdefault(name, dict.fromkeys(counts, 0))
+            for key, count in counts.items():
+                if key not in summary_keys_tpl:
+                    merged[key] += count
+            if 'mean' in counts:
+                net_stats = RunningStats.from_summary(counts['rounds'], counts['mean'], counts['variance'])
+                net_stats_dic.setdefault(name, RunningStats()).merge(net_stats)
+    for name, net_stats in net_stats_dic.items():
+        statistics_dic[name].update({'mean': net_stats.get_mean(), 'variance': net_stats.variance(), 'se': net_stats.se()})
+    return statistics_dic
+
+
+def compare_players(players, num_shoes, seed=0, rules=None):
+    '''play the same shuffled shoes for each player alone and compare them
+    every shoe is shuffled with the same seed for every player, so the
+    players see the same card sequence and differences are paired per shoe.
+    return dict of player name -> {'rounds', 'net_win', 'net_win_per_round'}
+    and 'differences' -> {(player, earlier player): {'mean', 'se'}} of every
+    pair of players, 'mean' is the difference of net win per round of the
+    player and the earlier player in players. a shoe deals a different number
+    of rounds to each player, so net win per round is the ratio of the totals
+    over the shoes and 'se' is its delta method standard error, paired per shoe '''
+    import statistics
+    games = list()
+    for name in players:
+        game = Game(LOG_NONE, rng=random.Random(), rules=rules)
+        game.add_player(Player(game, name))
+        game.get_players()[0].load_strategy()
+        games.append(game)
+
+    master_rng = random.Random(seed)
+    per_shoe = [list() for game in games]
+    for i in range(num_shoes):
+        shoe_seed = master_rng.getrandbits(64)
+        for game, results in zip(games, per_shoe):
+            player = game.get_players()[0]
+            net_win = player.get_win_count() - player.get_lose_count()
+            game.get_rng().seed(shoe_seed)
+            game.get_dealer().shuffle_deck()
+            shoe_round = game.play_shoe(float('inf'))
+            results.append((player.get_win_count() - player.get_lose_count() - net_win, shoe_round))
+
+    comparison_dic = dict()
+    for game in games:
+        player = game.get_players()[0]
+        net_win = player.get_win_count() - player.get_lose_count()
+        comparison_dic[player.get_name_str()] = {'rounds': game.get_round(), 'net_win': net_win, \
+                                                 'net_win_per_round': net_win / game.get_round()}
+    # net win per round of a player is sum of net win / sum of rounds over the shoes,
+    # its error per shoe is linearized as (net win - ratio * rounds) / mean rounds (delta method)
+    ratios, residuals = list(), list()
+    for results in per_shoe:
+        total_rounds = sum(rounds for net_win, rounds in results)
+        ratio = sum(net_win for net_win, rounds in results) / total_rounds
+        mean_rounds = total_rounds / len(results)
+        ratios.append(ratio)
+        residuals.append([(net_win - ratio * rounds) / mean_rounds for net_win, rounds in results])
+    differences_dic = dict()
+    for j in range(1, len(players)):
+        for i in range(j):
+            differences = [residual - baseline for residual, baseline in zip(residuals[j], residuals[i])]
+            se = statistics.stdev(differences) / len(differences) ** 0.5 if len(differences) > 1 else float('nan')
+            differences_dic[(players[j], players[i])] = {'mean': ratios[j] - ratios[i], 'se': se}
+    comparison_dic['differences'] = differences_dic
+    return comparison_dic
+
+
+def startup_report(players, use_cache=True):
+    '''time the startup of a simulation and return dict of seconds
+    'import': import of this module, 'strategy_load': load_strategy() of every player,
+    'first_round': first round of the game, 'pandas_imported': true if pandas was imported
+    'strategy_load' is broken down per player in 'players' '''
+    game = Game(LOG_NONE)
+    for name in players:
+        game.add_player(Player(game, name))
+
+    players_dic = dict()
+    for player in game.get_players():
+        start = time.perf_counter()
+        player.load_strategy(use_cache)
+        players_dic[player.get_name_str()] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    game.play_round()
+    first_round = time.perf_counter() - start
+    return {'import': import_time_float, 'strategy_load': sum(players_dic.values()), \
+            'first_round': first_round, 'pandas_imported': 'pandas' in sys.modules, 'players': players_dic}
+
 
 def main():
+    players = ["Steve", "Bill_14", "Bill_15", "Bill_16", "Bill_17"]
+    if '--startup' in sys.argv[1:]:
+        report_dic = startup_report(players, '--no-cache' not in sys.argv[1:])
+        print(f"import          {report_dic['import'] * 1000:9.2f} ms")
+        print(f"strategy load   {report_dic['strategy_load'] * 1000:9.2f} ms" \
+              f"  (pandas {'imported' if report_dic['pandas_imported'] else 'not imported'})")
+        for name, seconds in report_dic['players'].items():
+            print(f"    {name:<11} {seconds * 1000:9.2f} ms")
+        print(f"first round     {report_dic['first_round'] * 1000:9.2f} ms")
+        return
+    if '--profile' in sys.argv[1:]:
+        # python black_jack.py --profile [rounds], summary in profile.json
+        args = sys.argv[sys.argv.index('--profile') + 1:]
+        rounds = int(args[0]) if args else 100000
+        simulate(players, rounds, LOG_NONE, profile_path='profile.json')
+        with open('profile.json', 'r') as profile_file:
+            summary_dic = json.load(profile_file)
+        print(f"{summary_dic['rounds']} rounds, {summary_dic['hands']} hands in {summary_dic['wall_ns'] / 1e9:.2f} s" \
+              f"  ({summary_dic['rounds_per_sec']:.0f} rounds/s, {summary_dic['hands_per_sec']:.0f} hands/s)")
+        for name, phase_dic in summary_dic['phases'].items():
+            print(f"    {name:<13} {phase_dic['calls']:>10} calls {phase_dic['total_ns'] / 1e6:10.1f} ms" \
+                  f" {phase_dic['mean_ns']:9.0f} ns/call {phase_dic['share']:7.1%}")
+        return
+
     print("\nThis program will simulate Black Jack card game.")
     print("and will display of statistics of winning rate.\n")
     isValid = False
@@ -982,126 +3675,10 @@ def main():
         except ValueError:
             print("Please, input integer value")
     
-    simulation_target = sim_target
-    simulation_round = 0
-
-    # create game
-    game = Game()
-    file_output_str = game.get_output_log_str()
-    game.add_player(Player(game, "Steve"))
-    game.add_player(Player(game, "Bill_14"))
-    game.add_player(Player(game, "Bill_15"))
-    game.add_player(Player(game, "Bill_16"))
-    game.add_player(Player(game, "Bill_17"))
-    game.show_players()
-    dealer = game.get_dealer()
-    players = game.get_players()
-    file_output_str.append(f"cards in deck is {dealer.get_deck().get_num_cards()}\n\n")
-
-    # load each player's strategy
-    for player in players:
-        player.load_strategy()
-
-    while (simulation_round < simulation_target):
-        while (dealer.get_deck().get_num_cards() > 50 and simulation_round < simulation_target):
-            simulation_round += 1
-            game.add_round()
-            file_output_str.append(f"----- round {game.get_round()} START -----\n")
-            # distribute two cards per player, 
-            # and draw cards to self (one is exposed the other is not)
-            dealer.dist_default(players)
-
-            # for each gamer play hit or stand or break
-            for player in players:
-                file_output_str.append("-"*30 + "\n") 
-                file_output_str.append(f"Player {player.get_name_str()}'s game\n") 
-                file_output_str.append("-"*30 + "\n") 
-                for hand in player.get_hands():
-                    # if only one card distributed add one more
-                    if len(hand.get_card_lst()) == 1:
-                        dealer.dist_to_hand(hand)
-                    isBreak = hand.is_break()
-                    decision = hand.decide(player, dealer, player.get_strategy())
-                    hand.set_last_decision(decision)
-                    file_output_str.append(player.get_name_str() + "'s DECISION: " + decision + "\n")
-                    if decision == 'SPLIT':
-                        hand.split_hand()
-                    if decision == 'DOUBLE':
-                        dealer.dist_to_hand(hand)
-                        file_output_str.append(f"player " + player.get_name_str() + " takes only one card more and can't receive more\n") 
-                        file_output_str.append(hand.show_hand(player))
-                        hand.set_no_more_card(True)
-                    
-                    while (decision not in ['SUR', 'STAND'] and not isBreak and not hand.no_more_card()):
-                        dealer.dist_to_hand(hand)
-                        file_output_str.append(hand.show_hand(player))
-                        isBreak = hand.is_break()
-                        if not isBreak and not hand.no_more_card():
-                            decision = hand.decide(player, dealer, player.get_strategy())
-                            hand.set_last_decision(decision)
-                            file_output_str.append(player.get_name_str() + "'s DECISION: " + decision + "\n")
-                            if decision == 'SPLIT':
-                                hand.split_hand()
-                            if decision == 'DOUBLE':
-                                dealer.dist_to_hand(hand)
-                                file_output_str.append(f"player " + player.get_name_str() + " takes only one card more and can't receive more\n") 
-                                file_output_str.append(hand.show_hand(player)) 
-                                hand.set_no_more_card(True)
-            
-            # dealer hit or stand
-            file_output_str.append("-"*30 + "\n") 
-            file_output_str.append(f"Player {dealer.get_name_str()}'s game\n") 
-            file_output_str.append("-"*30 + "\n") 
-            dealer.play()     
+    simulate(players, sim_target, LOG_VERBOSE)
 
-            # check winner
-            game.check_winner()
 
-            # reset hands
-            for player in players:
-                player.reset_hands()
-            
-            dealer.reset_hand()
-            print(f"round {game.get_round()} finished. remaining cards: " + str(dealer.get_deck().get_num_cards()) + "\n")
-            file_output_str.append(f"round {game.get_round()} finished. remaining cards: " + str(dealer.get_deck().get_num_cards()) + "\n")
-            file_output_str.append("-" * 20 + "\n")
+import_time_float = time.perf_counter() - import_start_float
 
-        # shuffle deck
-        dealer.shuffle_deck()
-
-    # display status
-    file_output_str.append(f"results of {game.get_round()} rounds played\n")
-    
-    for player in players:
-        file_output_str.append(f"player {player.get_name_str()} won: {player.get_win_count()} tie: {player.get_tie_count()} lose: {player.get_lose_count()}\n")
-        file_output_str.append(f"\t\tNET WIN {player.get_win_count() - player.get_lose_count()}\n") 
-        file_output_str.append(f"winning average (except tie): {player.get_win_count()/(player.get_win_count()+player.get_lose_count()):.2%} <----------\n") 
-        file_output_str.append(f"winning average (including tie): {player.get_win_count() / (player.get_win_count() + player.get_tie_count() + player.get_lose_count()):.2%}\n")
-
-        print(f"player {player.get_name_str()} won: {player.get_win_count()} tie: {player.get_tie_count()} lose: {player.get_lose_count()}\n")
-        print(f"\t\tNET WIN {player.get_win_count() - player.get_lose_count()}\n") 
-        print(f"winning average (except tie): {player.get_win_count()/(player.get_win_count()+player.get_lose_count()):.2%} <----------\n") 
-        print(f"winning average (including tie): {player.get_win_count() / (player.get_win_count() + player.get_tie_count() + player.get_lose_count()):.2%}\n")
-
-    file_output_str.append(f"dealer {dealer.get_name_str()} won: {dealer.get_win_count()} tie: {dealer.get_tie_count()} lose: {dealer.get_lose_count()}\n")
-    file_output_str.append(f"winning average (except tie): {player.get_win_count()/(player.get_win_count() + player.get_lose_count()):.2%}\n")
-    file_output_str.append(f"winning average (including tie): {player.get_win_count()/game.get_round():.2%}\n")
-    # file_output_str.append("Deck is empty ----\n")
-    # file_output_str.append("shuffle deck\n")
-    file_output_str.append("simulation completed.\n")
-
-    print(f"dealer {dealer.get_name_str()} won: {dealer.get_win_count()} tie: {dealer.get_tie_count()} lose: {dealer.get_lose_count()}\n")
-    print(f"winning average (except tie): {player.get_win_count()/(player.get_win_count() + player.get_lose_count()):.2%}\n")
-    print(f"winning average (including tie): {player.get_win_count()/game.get_round():.2%}\n")
-    # print("Deck is empty ----\n")
-    # print("shuffle deck\n")
-    print("simulation completed.\n")
-
-    curr_dicrectory = os.getcwd()
-    # write output to file
-    with open(curr_dicrectory + os.sep + 'blackjack_log.txt', 'w') as writer:
-        writer.write("".join(file_output_str))
-
-
-if __name__ != '__main()__':
-    main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+'''
+    Exact dealer outcome probabilities
+
+    Computes the exact probability of the dealer's final total
+    (17, 18, 19, 20, 21 or bust) for a dealer upcard and the composition
+    of the remaining shoe, with the rule of Dealer.play() in black_jack.py:
+    the dealer hits under 17 and, if hit_soft_17 (H17, the default rule),
+    hits 17 when the hand holds an ace.
+
+    A composition is a tuple of 10 counts of the cards left in the shoe,
+    indexed by card value - 1 (ace, 2, 3, ... 9, ten-valued cards).
+    The *_infinite functions draw from an infinite shoe instead.
+'''
+
+from functools import lru_cache
+
+outcomes_tpl = (17, 18, 19, 20, 21, 'bust')
+BUST_IDX = len(outcomes_tpl) - 1
+# probability of each card value - 1 in an infinite shoe, ten-valued cards are 4 of 13
+infinite_card_probabilities = tuple([1 / 13] * 9 + [4 / 13])
+
+
+def full_shoe_composition(num_decks=8):
+    ''' return composition of num_decks full decks '''
+    return tuple([4 * num_decks] * 9 + [16 * num_decks])
+
+
+def remove_card(composition, card_value):
+    ''' return composition without one card of card_value (ace is 1) '''
+    if composition[card_value - 1] <= 0:
+        raise ValueError(f"no card of value {card_value} left in the shoe")
+    counts = list(composition)
+    counts[card_value - 1] -= 1
+    return tuple(counts)
+
+
+def hand_value(hard_total, has_ace):
+    ''' return the value of a hand, add 10 if the hand holds an ace and does not break '''
+    if has_ace and hard_total + 10 <= 21:
+        return hard_total + 10
+    return hard_total
+
+
+def dealer_hits(hard_total, has_ace, hit_soft_17=True):
+    ''' return true if the dealer hits, same condition as Dealer.play() '''
+    value = hand_value(hard_total, has_ace)
+    return value < 17 or (hit_soft_17 and value == 17 and has_ace)
+
+
+@lru_cache(maxsize=1 << 20)
+def dealer_distribution(hard_total, has_ace, composition, hit_soft_17=True):
+    ''' return probabilities of outcomes_tpl for a dealer hand of
+    hard_total (ace is 1) drawing from composition '''
+    if not dealer_hits(hard_total, has_ace, hit_soft_17):
+        probs = [0.0] * len(outcomes_tpl)
+        value = hand_value(hard_total, has_ace)
+        probs[BUST_IDX if value > 21 else value - 17] = 1.0
+        return tuple(probs)
+
+    num_cards = sum(composition)
+    if num_cards == 0:
+        raise ValueError("shoe is empty before the dealer stands")
+    probs = [0.0] * len(outcomes_tpl)
+    for i, count in enumerate(composition):
+        if count == 0:
+            continue
+        card_value = i + 1
+        weight = count / num_cards
+        next_probs = dealer_distribution(hard_total + card_value, has_ace or card_value == 1, \
+                                         remove_card(composition, card_value), hit_soft_17)
+        for j in range(len(probs)):
+            probs[j] += weight * next_probs[j]
+    return tuple(probs)
+
+
+@lru_cache(maxsize=None)
+def dealer_distribution_infinite(hard_total, has_ace, hit_soft_17=True):
+    ''' return probabilities of outcomes_tpl for a dealer hand of
+    hard_total (ace is 1) drawing from an infinite shoe '''
+    if not dealer_hits(hard_total, has_ace, hit_soft_17):
+        probs = [0.0] * len(outcomes_tpl)
+        value = hand_value(hard_total, has_ace)
+        probs[BUST_IDX if value > 21 else value - 17] = 1.0
+        return tuple(probs)
+
+    probs = [0.0] * len(outcomes_tpl)
+    for i, weight in enumerate(infinite_card_probabilities):
+        card_value = i + 1
+        next_probs = dealer_distribution_infinite(hard_total + card_value, has_ace or card_value == 1, hit_soft_17)
+        for j in range(len(probs)):
+            probs[j] += weight * next_probs[j]
+    return tuple(probs)
+
+
+def dealer_probabilities_infinite(upcard, hit_soft_17=True):
+    ''' return probabilities of outcomes_tpl for the dealer upcard (2 ~ 11, ace is 11)
+    drawing the hole card and hits from an infinite shoe '''
+    card_value = 1 if upcard == 11 else upcard
+    return dealer_distribution_infinite(card_value, card_value == 1, hit_soft_17)
+
+
+@lru_cache(maxsize=1 << 16)
+def dealer_probabilities(upcard, composition, hit_soft_17=True):
+    ''' return probabilities of outcomes_tpl for the dealer upcard
+    upcard is the dealer face value 2 ~ 11 (ace is 11) as in the strategy sheets,
+    composition is the shoe after the upcard is removed, the hole card is drawn from it '''
+    card_value = 1 if upcard == 11 else upcard
+    return dealer_distribution(card_value, card_value == 1, tuple(composition), hit_soft_17)
+
+
+def stand_expectation(player_value, probs):
+    ''' return expected win - lose of a unit bet standing on player_value
+    against dealer probabilities of outcomes_tpl, same as Game.check_winner() '''
+    if player_value > 21:
+        return -1.0
+    expectation = probs[BUST_IDX]
+    for i, dealer_value in enumerate(outcomes_tpl[:BUST_IDX]):
+        if player_value > dealer_value:
+            expectation += probs[i]
+        elif player_value < dealer_value:
+            expectation -= probs[i]
+    return expectation
+
+
+def main():
+    composition = full_shoe_composition(8)
+    print("upcard " + " ".join(f"{str(outcome):>7}" for outcome in outcomes_tpl))
+    for upcard in range(2, 12):
+        probs = dealer_probabilities(upcard, remove_card(composition, 1 if upcard == 11 else upcard))
+        print(f"{upcard:>6} " + " ".join(f"{prob:>7.4f}" for prob in probs))
+
+
+if __name__ == '__main__':
+    main()
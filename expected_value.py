@@ -0,0 +1,301 @@
+'''
+    Infinite-deck expected value of a strategy
+
+    Computes the expected return per round of a strategy loaded by
+    Player.load_strategy() with an infinite shoe, by recursion over hand
+    states instead of simulation. The rules are the same as black_jack.py: Hand.decide()
+    (surrender, split with resplit, soft, hard, doubling on two cards only),
+    Dealer.play() and the accounting of Game.check_winner().
+    Cards are drawn from an infinite shoe with the proportions of the decks
+    of black_jack.py, the same as vector_engine.py. It is not the expected
+    value of the finite shoe Game deals from, where the cards already
+    dealt change the odds of the next ones (dealer_probability.dealer_probabilities()
+    gives the dealer side of that for a shoe composition).
+
+    Of the Rules, the surrender type and H17 / S17 are followed. The number
+    of decks and the penetration do not apply to an infinite shoe, and
+    restricted splits or a blackjack payout raise ValueError.
+
+    It also reports each cell of the strategy sheets with its reach
+    (expected visits per round) and its contribution to the expected value.
+'''
+
+from black_jack import SURRENDER_ANY, SURRENDER_TWO_CARDS, CompiledStrategy, Player, Rules
+from dealer_probability import dealer_probabilities_infinite, hand_value, stand_expectation
+
+NUM_NUMBERS = 13    # numbers of card ('2' ~ 'A'), each is drawn with probability 1/13
+# (card value, number of card numbers with the value), ace is 1
+value_counts_tpl = tuple((value, 4 if value == 10 else 1) for value in range(1, 11))
+upcards_tpl = tuple(range(2, 12))   # dealer face value, ace is 11
+
+
+class InfiniteDeckEV:
+    """
+    InfiniteDeckEV class computes the infinite-deck expected value of a strategy
+
+    Hand state is (hard total, has ace, two cards, pair value) where hard
+    total counts ace as 1 and pair value is the card value of a two card
+    pair of the same number, otherwise 0.
+
+    ...
+
+    Attributes
+    ----------
+    __compiled : CompiledStrategy
+        lookup tables of the strategy
+    __surrender_type : str
+        surrender type of the Rules
+    __hit_soft_17 : bool
+        true if the dealer hits 17 holding an ace
+    __ev_dic : dict
+        memo of expected value per (hand state, upcard)
+    __split_dic : dict
+        memo of expected value of a hand starting from one card of a split pair
+
+    Methods
+    -------
+    from_player_name()
+        build InfiniteDeckEV from the strategy folder of a player
+    expected_value()
+        return the expected return per round
+    expected_value_upcard()
+        return the expected return per round for one dealer upcard
+    state_value()
+        return the expected return of a hand state
+    cell_contributions()
+        return reach and contribution to the expected value per sheet cell
+
+    """
+    def __init__(self, strategy_tuple, rules=None):
+        ''' initialize from the dict of DataFrames of Player.load_strategy() or CompiledStrategy,
+        rules is Rules (default rules if None) '''
+        if rules is None:
+            rules = Rules()
+        if rules.is_split_restricted() or rules.get_blackjack_payout() is not None:
+            raise ValueError(f"rules not supported by InfiniteDeckEV: {rules}")
+        if not isinstance(strategy_tuple, CompiledStrategy):
+            strategy_tuple = CompiledStrategy.from_frames(strategy_tuple)
+        self.__compiled = strategy_tuple
+        self.__surrender_type = rules.get_surrender()
+        self.__hit_soft_17 = rules.hit_soft_17()
+        self.__ev_dic = dict()
+        self.__split_dic = dict()
+
+    @classmethod
+    def from_player_name(cls, name, rules=None):
+        ''' build InfiniteDeckEV from the strategy folder of a player '''
+        player = Player(None, name)
+        player.load_strategy()
+        return cls(player.get_compiled_strategy(), rules)
+
+    def expected_value(self):
+        ''' return the expected return per round, averaged over dealer upcards '''
+        total = 0.0
+        for upcard in upcards_tpl:
+            total += self.__upcard_probability(upcard) * self.expected_value_upcard(upcard)
+        return total
+
+    def expected_value_upcard(self, upcard):
+        ''' return the expected return per round for the dealer upcard '''
+        total = 0.0
+        for (state, weight) in self.__initial_states():
+            total += weight * self.state_value(state, upcard)
+        return total
+
+    def state_value(self, state, upcard):
+        ''' return the expected return of a hand state against the dealer upcard '''
+        key = (state, upcard)
+        if key not in self.__ev_dic:
+            self.__ev_dic[key] = self.__compute_state_value(state, upcard)
+        return self.__ev_dic[key]
+
+    def cell_contributions(self):
+        ''' return dict of (sheet name, row, upcard) -> {'reach', 'contribution'}
+        reach is the expected number of decisions made by the cell per round,
+        contribution is the expected return of the bets settled by the cell,
+        the contributions sum up to expected_value() '''
+        cells_dic = dict()
+        for upcard in upcards_tpl:
+            self.__forward_upcard(upcard, self.__upcard_probability(upcard), cells_dic)
+        return cells_dic
+
+    @staticmethod
+    def __upcard_probability(upcard):
+        ''' return probability of the dealer face value '''
+        return (4 if upcard == 10 else 1) / NUM_NUMBERS
+
+    @staticmethod
+    def __initial_states():
+        ''' return list of (state, probability) of the first two cards '''
+        states_dic = dict()
+        for first_value, first_count in value_counts_tpl:
+            for second_value, second_count in value_counts_tpl:
+                weight = first_count * second_count / NUM_NUMBERS ** 2
+                state = (first_value + second_value, first_value == 1 or second_value == 1, True, 0)
+                if first_value == second_value:
+                    # same number is a pair, same value of different number (ex: 10, J) is not
+                    pair_weight = first_count / NUM_NUMBERS ** 2
+                    pair_state = (state[0], state[1], True, first_value)
+                    states_dic[pair_state] = states_dic.get(pair_state, 0.0) + pair_weight
+                    weight -= pair_weight
+                if weight > 0:
+                    states_dic[state] = states_dic.get(state, 0.0) + weight
+        return list(states_dic.items())
+
+    @staticmethod
+    def __next_cards(pair_value=0):
+        ''' return list of (card value, probability) of the next card,
+        excluding the number of pair_value that makes a pair again '''
+        cards_lst = list()
+        for value, count in value_counts_tpl:
+            if value == pair_value:
+                count -= 1
+            if count > 0:
+                cards_lst.append((value, count / NUM_NUMBERS))
+        return cards_lst
+
+    def __decision(self, state, upcard):
+        ''' return (sheet name, row, decision) with the same order as Hand.decide() '''
+        hard, has_ace, is_two_cards, pair_value = state
+        value = hand_value(hard, has_ace)
+        if not has_ace and value in (15, 16) and self.__can_surrender(is_two_cards) \
+           and self.__compiled.get_surrender()[value][upcard]:
+            return ('surrender', value, 'SUR')
+        if pair_value:
+            is_split = self.__compiled.get_pair_splitting()[pair_value][upcard]
+            if is_split is None:
+                raise KeyError(pair_value)
+            if is_split:
+                return ('pair_splitting', pair_value, 'SPLIT')
+        if has_ace and hard - 1 < 10:
+            decision = self.__compiled.get_soft_totals(is_two_cards)[hard - 1][upcard]
+            cell = ('soft_totals', hard - 1)
+        else:
+            decision = self.__compiled.get_hard_totals(is_two_cards)[value][upcard]
+            cell = ('hard_totals', value)
+        if decision is None:
+            raise KeyError(cell)
+        return cell + (decision,)
+
+    def __can_surrender(self, is_two_cards):
+        ''' return true if the surrender type of the rules allows surrender of the hand '''
+        if self.__surrender_type == SURRENDER_ANY:
+            return True
+        return self.__surrender_type == SURRENDER_TWO_CARDS and is_two_cards
+
+    def __compute_state_value(self, state, upcard):
+        ''' expected return of the decision of the state '''
+        hard, has_ace, is_two_cards, pair_value = state
+        value = hand_value(hard, has_ace)
+        probs = dealer_probabilities_infinite(upcard, self.__hit_soft_17)
+        decision = self.__decision(state, upcard)[2]
+        if decision == 'SUR':
+            return -0.5
+        if decision == 'SPLIT':
+            return 2 * self.__split_value(pair_value, upcard)
+        if decision == 'STAND':
+            return stand_expectation(value, probs)
+        total = 0.0
+        for card_value, weight in self.__next_cards():
+            next_hard, next_ace = hard + card_value, has_ace or card_value == 1
+            next_value = hand_value(next_hard, next_ace)
+            if next_value > 21:
+                total -= weight
+            elif decision == 'HIT':
+                total += weight * self.state_value((next_hard, next_ace, False, 0), upcard)
+            else:
+                total += weight * stand_expectation(next_value, probs)
+        if decision == 'DOUBLE':
+            total *= 2
+        return total
+
+    def __split_value(self, pair_value, upcard):
+        ''' expected return of a hand starting from one card of the split pair.
+        drawing the same number again gives the pair, which is split again,
+        so the value solves v = others + 2 * v / 13 '''
+        key = (pair_value, upcard)
+        if key in self.__split_dic:
+            return self.__split_dic[key]
+        others = 0.0
+        for card_value, weight in self.__next_cards(pair_value):
+            next_state = (pair_value + card_value, pair_value == 1 or card_value == 1, True, 0)
+            others += weight * self.state_value(next_state, upcard)
+        split_value = others / (1 - 2 / NUM_NUMBERS)
+        self.__split_dic[key] = split_value
+        return split_value
+
+    def __forward_upcard(self, upcard, upcard_weight, cells_dic):
+        ''' propagate expected visits of hand states for the upcard and
+        add reach and contribution of each cell to cells_dic '''
+        probs = dealer_probabilities_infinite(upcard, self.__hit_soft_17)
+        mass_dic = dict()
+        pairs_lst = list()
+        for state, weight in self.__initial_states():
+            if state[3]:
+                pairs_lst.append((state, weight * upcard_weight))
+            else:
+                mass_dic[state] = mass_dic.get(state, 0.0) + weight * upcard_weight
+
+        def add_cell(cell, reach, contribution):
+            cell_dic = cells_dic.setdefault((cell[0], cell[1], upcard), {'reach': 0.0, 'contribution': 0.0})
+            cell_dic['reach'] += reach
+            cell_dic['contribution'] += contribution
+
+        # pairs first, a split pair only leads to two card hands or the same pair
+        for state, mass in pairs_lst:
+            hard, has_ace, is_two_cards, pair_value = state
+            cell = self.__decision(state, upcard)
+            if cell[2] == 'SPLIT':
+                mass = mass / (1 - 2 / NUM_NUMBERS)     # resplit of the same pair
+                add_cell(cell, mass, 0.0)
+                for card_value, weight in self.__next_cards(pair_value):
+                    next_state = (pair_value + card_value, pair_value == 1 or card_value == 1, True, 0)
+                    mass_dic[next_state] = mass_dic.get(next_state, 0.0) + 2 * mass * weight
+            elif cell[2] == 'SUR':
+                add_cell(cell, mass, -0.5 * mass)
+            else:
+                # not split, keep deciding as a two card hand
+                add_cell(('pair_splitting', pair_value), mass, 0.0)
+                next_state = (hard, has_ace, True, 0)
+                mass_dic[next_state] = mass_dic.get(next_state, 0.0) + mass
+
+        # every hit increases hard total, so states are settled in order of hard total
+        for hard in range(2, 22):
+            for has_ace in (False, True):
+                for is_two_cards in (True, False):
+                    state = (hard, has_ace, is_two_cards, 0)
+                    mass = mass_dic.get(state, 0.0)
+                    if mass == 0.0 or hand_value(hard, has_ace) > 21:
+                        continue
+                    cell = self.__decision(state, upcard)
+                    decision = cell[2]
+                    value = hand_value(hard, has_ace)
+                    if decision == 'SUR':
+                        add_cell(cell, mass, -0.5 * mass)
+                    elif decision == 'STAND':
+                        add_cell(cell, mass, mass * stand_expectation(value, probs))
+                    else:
+                        contribution = 0.0
+                        for card_value, weight in self.__next_cards():
+                            next_hard, next_ace = hard + card_value, has_ace or card_value == 1
+                            next_value = hand_value(next_hard, next_ace)
+                            bet = 2 if decision == 'DOUBLE' else 1
+                            if next_value > 21:
+                                contribution -= bet * mass * weight
+                            elif decision == 'DOUBLE':
+                                contribution += bet * mass * weight * stand_expectation(next_value, probs)
+                            else:
+                                next_state = (next_hard, next_ace, False, 0)
+                                mass_dic[next_state] = mass_dic.get(next_state, 0.0) + mass * weight
+                        add_cell(cell, mass, contribution)
+
+
+def main():
+    players = ["Steve", "Bill_14", "Bill_15", "Bill_16", "Bill_17"]
+    for name in players:
+        calculator = InfiniteDeckEV.from_player_name(name)
+        print(f"player {name} infinite-deck expected NET WIN per round: {calculator.expected_value():.4%}")
+
+
+if __name__ == '__main__':
+    main()
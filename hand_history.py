@@ -0,0 +1,415 @@
+'''
+    Hand history queries
+
+    Answers questions like "net win of hard 12 against dealer 3 for
+    Bill_16, per decision" from a round file of RoundRecorder, without
+    simulating again.
+
+    Every decision of the round file is one row: the player, the state of
+    the hand, the dealer upcard, the decision, the number of cards and the
+    net win of the hand at the end of the round. The state is the cell
+    the hand reads by CompiledStrategy.hand_cell(), the classification
+    Hand.decide() uses through CompiledStrategy.decide_state(), from the
+    cards of the hand and the DECISION_PAIR flag of the decision: a pair
+    the rules let the hand split is (pair_splitting, card value), else
+    (soft_totals, value except one ace) or (hard_totals, value), so a pair
+    of eights that may not be split again is a hard 16. Surrender is a
+    decision, not a state: a hard 16 that surrenders is a hard 16 with the
+    decision SUR. A SPLIT row has the net win of both hands the pair
+    became.
+
+    The rows are indexed by (player, state, two cards, upcard, decision),
+    where two cards is true if the hand holds two cards: the row
+    numbers sorted by key, the first position of every key and prefix sums
+    of the net win. An aggregate query reads two prefix sums per key range,
+    and the rows of a query are read in time proportional to the rows
+    matched. The index is written as .npy files to a folder next to the
+    round file, memory-mapped when opened, and built again when the round
+    file has grown.
+
+    usage:
+        python hand_history.py [round file]
+'''
+
+import json
+import os
+import sys
+
+import numpy as np
+
+from black_jack import DEALER_INDEX, DECISION_PAIR, EVENT_CARD, EVENT_DEAL, EVENT_DECISION, EVENT_OUTCOME, EVENT_ROUND, LOG_NONE, \
+    CompiledStrategy, RoundRecorder, RunningStats, Shoe, decision_codes_dic, decisions_tpl, numbers_tpl, \
+    outcomes_tpl, simulate, values_tpl
+
+INDEX_VERSION = 4
+INDEX_SUFFIX = '.index'
+CHUNK_EVENTS = 1 << 24      # events of one step of the build, cut at the start of a round
+ROW_BITS = 5                # bits of the row of a sheet in a state code
+row_dtype = np.dtype([('event', '<i8'), ('round', '<i8'), ('player', 'u1'), ('state', 'u1'), ('upcard', 'u1'), \
+                      ('decision', 'u1'), ('num_cards', 'u1'), ('net', '<f8')])
+
+# value (ace is 1) and ace flag of every card code of Shoe
+code_values_arr = np.array([values_tpl[code % len(numbers_tpl)] for code in range(Shoe.num_codes)], dtype=np.int64)
+code_aces_arr = np.array([numbers_tpl[code % len(numbers_tpl)] == 'A' for code in range(Shoe.num_codes)], \
+                         dtype=np.int64)
+# net win of every outcome of outcomes_tpl, None is the blackjack payout of the round file
+outcome_units_dic = {'WIN': 1, 'TIE': 0, 'LOSE': -1, 'SUR': -0.5, 'BLACKJACK': None, 'DEALER_BLACKJACK': -1, \
+                     'WIN_DOUBLE': 2, 'LOSE_DOUBLE': -2, 'DEALER_BLACKJACK_DOUBLE': -2}
+sheet_aliases_dic = {'hard': 'hard_totals', 'soft': 'soft_totals', 'pair': 'pair_splitting'}
+state_sheets_tpl = tuple(sheet_aliases_dic.values())     # sheets a hand state is in
+upcards_tpl = tuple(range(2, 12))   # dealer face value, ace is 11
+
+
+def state_code(sheet, row):
+    ''' return state code of the cell (sheet name, row) '''
+    return (CompiledStrategy.sheet_names_tpl.index(sheet) << ROW_BITS) | row
+
+
+def state_cell(code):
+    ''' return (sheet name, row) of the state code '''
+    return (CompiledStrategy.sheet_names_tpl[code >> ROW_BITS], code & ((1 << ROW_BITS) - 1))
+
+
+def state_table():
+    ''' return array of state code of a hand indexed by [hard total, is soft, is pair],
+    filled by CompiledStrategy.hand_cell() '''
+    table = np.zeros((CompiledStrategy.num_hard_totals, 2, 2), dtype=np.uint8)
+    for hard_total in range(1, CompiledStrategy.num_hard_totals):
+        for is_soft in (0, 1):
+            for is_pair in (0, 1):
+                table[hard_total, is_soft, is_pair] = state_code(*CompiledStrategy.hand_cell(hard_total, is_soft, \
+                                                                                             is_pair))
+    return table
+
+
+def group_cumsum(delta, is_start):
+    ''' return sum of delta before every element within its group,
+    groups are contiguous and start where is_start is true '''
+    before = np.cumsum(delta) - delta
+    return before - before[is_start][np.cumsum(is_start) - 1]
+
+
+def decision_rows(events, first_event, first_round, net_units_arr, table):
+    ''' return rows of row_dtype of the decisions of events, a slice of the events of a round file
+    starting with a round. first_event and first_round are the event and round of the slice '''
+    # every EVENT_DEAL is read as two EVENT_CARD of hand 0, source is the event of the round file
+    is_deal = events['kind'] == EVENT_DEAL
+    source = np.repeat(np.arange(len(events)), 1 + is_deal)
+    is_second = np.zeros(len(source), dtype=bool)
+    is_second[1:] = source[1:] == source[:-1]
+    source_deal = is_deal[source]
+    kind = np.where(source_deal, EVENT_CARD, events['kind'][source])
+    player = events['player'][source].astype(np.int64)
+    hand = np.where(source_deal, 0, events['hand'][source]).astype(np.int64)
+    value = np.where(source_deal & ~is_second, events['hand'][source], events['value'][source]).astype(np.int64)
+    # a decision is the index in decisions_tpl plus DECISION_PAIR if the hand decided as a pair
+    is_pair = (kind == EVENT_DECISION) & (value & DECISION_PAIR > 0)
+    value = np.where(kind == EVENT_DECISION, value & ~DECISION_PAIR, value)
+    round_arr = np.cumsum(kind == EVENT_ROUND) - 1
+    is_player = player != DEALER_INDEX
+    player_round = round_arr * 256 + player
+
+    # dealer upcard of every round, the second card dealt to the dealer
+    upcard_arr = np.zeros(round_arr[-1] + 1, dtype=np.int64)
+    dealer_idx = np.nonzero((kind == EVENT_CARD) & ~is_player)[0]
+    dealer_rounds, first_idx = np.unique(round_arr[dealer_idx], return_index=True)
+    dealt_twice = first_idx + 1 < len(dealer_idx)
+    dealer_rounds, first_idx = dealer_rounds[dealt_twice], first_idx[dealt_twice]
+    upcard_codes = value[dealer_idx[first_idx + 1]]
+    upcard_arr[dealer_rounds] = np.where(code_aces_arr[upcard_codes] == 1, 11, code_values_arr[upcard_codes])
+
+    # every pair split by a player in a round has the number of the first card of the player
+    card_idx = np.nonzero((kind == EVENT_CARD) & is_player)[0]
+    first_keys, first_idx = np.unique(player_round[card_idx], return_index=True)
+    first_codes = value[card_idx[first_idx]]
+
+    # cards and decisions of every hand, grouped by (round, player, hand) in the order they happen
+    selected = np.nonzero(is_player & ((kind == EVENT_CARD) | (kind == EVENT_DECISION)))[0]
+    group = player_round[selected] * 256 + hand[selected]
+    order = np.argsort(group, kind='stable')
+    selected, group = selected[order], group[order]
+    is_start = np.ones(len(group), dtype=bool)
+    is_start[1:] = group[1:] != group[:-1]
+    selected_kind, selected_value = kind[selected], value[selected]
+    pair_codes = first_codes[np.searchsorted(first_keys, player_round[selected])]
+    is_card = selected_kind == EVENT_CARD
+    is_split = (selected_kind == EVENT_DECISION) & (selected_value == decision_codes_dic['SPLIT'])
+    # a card is added to the hand, a split takes the second card of the pair away
+    sign = is_card.astype(np.int64) - is_split
+    codes = np.where(is_card, selected_value, pair_codes)
+    # a hand made by a split starts with the second card of the pair
+    is_split_hand = hand[selected] > 0
+    hard_total = group_cumsum(sign * code_values_arr[codes], is_start) + is_split_hand * code_values_arr[pair_codes]
+    num_aces = group_cumsum(sign * code_aces_arr[codes], is_start) + is_split_hand * code_aces_arr[pair_codes]
+    num_cards = group_cumsum(sign, is_start) + is_split_hand
+
+    is_decision = selected_kind == EVENT_DECISION
+    decision_idx = selected[is_decision]
+    decision_group = group[is_decision]
+    decisions = selected_value[is_decision]
+
+    # net win of every hand, a hand without outcome (a round cut by an interruption) is left out
+    outcome_idx = np.nonzero((kind == EVENT_OUTCOME) & is_player)[0]
+    outcome_group = player_round[outcome_idx] * 256 + hand[outcome_idx]
+    outcome_order = np.argsort(outcome_group)
+    outcome_group, outcome_net = outcome_group[outcome_order], net_units_arr[value[outcome_idx][outcome_order]]
+    def hand_net(groups):
+        ''' return (net win, has outcome) of the hands of groups '''
+        if len(outcome_group) == 0:
+            return np.zeros(len(groups)), np.zeros(len(groups), dtype=bool)
+        position = np.minimum(np.searchsorted(outcome_group, groups), len(outcome_group) - 1)
+        return outcome_net[position], outcome_group[position] == groups
+    net, has_outcome = hand_net(decision_group)
+
+    # the nth split of a player in a round makes hand n, its net win is added to the split
+    split_idx = np.nonzero(is_player & (kind == EVENT_DECISION) & (value == decision_codes_dic['SPLIT']))[0]
+    if len(split_idx):
+        split_keys = player_round[split_idx]
+        unique_keys, first_split, inverse = np.unique(split_keys, return_index=True, return_inverse=True)
+        made_hand = np.arange(len(split_idx)) - first_split[inverse.ravel()] + 1
+        made_net, made_has_outcome = hand_net(split_keys * 256 + made_hand)
+        is_split_row = decisions == decision_codes_dic['SPLIT']
+        position = np.searchsorted(split_idx, decision_idx[is_split_row])
+        net[is_split_row] += made_net[position]
+        has_outcome[is_split_row] &= made_has_outcome[position]
+
+    rows = np.zeros(int(has_outcome.sum()), dtype=row_dtype)
+    rounds = round_arr[decision_idx][has_outcome]
+    rows['event'] = source[decision_idx[has_outcome]] + first_event
+    rows['round'] = rounds + first_round
+    rows['player'] = player[decision_idx][has_outcome]
+    state = table[hard_total[is_decision], (num_aces[is_decision] > 0).astype(np.int64), \
+                  is_pair[decision_idx].astype(np.int64)]
+    rows['state'] = state[has_outcome]
+    rows['upcard'] = upcard_arr[rounds]
+    rows['decision'] = decisions[has_outcome]
+    rows['num_cards'] = num_cards[is_decision][has_outcome]
+    rows['net'] = net[has_outcome]
+    return rows[np.argsort(rows['event'], kind='stable')]
+
+
+def row_keys(rows):
+    ''' return index key of rows, (player, state, two cards, upcard, decision) in bits 8, 8, 1, 4, 3 '''
+    two_cards = (rows['num_cards'] == 2).astype(np.int64)
+    return ((((rows['player'].astype(np.int64) << 8 | rows['state']) << 1 | two_cards) << 4 | rows['upcard']) << 3) \
+           | rows['decision']
+
+
+class HandHistory:
+    """
+    HandHistory class queries the decisions of a round file of RoundRecorder
+
+    ...
+
+    Attributes
+    ----------
+    __file_path : str
+        path of the round file
+    __index_dir : str
+        folder of the index files, file path + '.index'
+    __header_dic : dict
+        header of the round file
+    __rows : ndarray
+        rows of row_dtype of every decision, memory-mapped
+    __order : ndarray
+        row numbers sorted by key, memory-mapped
+    __keys : ndarray
+        distinct keys in order, memory-mapped
+    __starts : ndarray
+        first position in __order of every key, and the number of rows, memory-mapped
+    __prefix_net : ndarray
+        sum of net win of the rows before every position of __order, memory-mapped
+    __prefix_square : ndarray
+        sum of squared net win of the rows before every position of __order, memory-mapped
+
+    Methods
+    -------
+    build()
+        build the index of the round file
+    parse_state()
+        return state code of a state given as (sheet, row)
+    query()
+        return count, net win, mean, sd and se of the matching rows
+    breakdown()
+        return query() of every decision of a state against an upcard
+    rows()
+        return the matching rows
+
+    # Getters
+    get_header()
+    get_num_rows()
+
+    """
+    index_files_tpl = ('rows', 'order', 'keys', 'starts', 'prefix_net', 'prefix_square')
+
+    def __init__(self, file_path, rebuild=False):
+        ''' open the index of the round file, build it if missing, stale or rebuild '''
+        self.__file_path = file_path
+        self.__index_dir = file_path + INDEX_SUFFIX
+        self.__header_dic = None
+        meta_dic = self.__read_meta()
+        if rebuild or meta_dic is None or meta_dic['file_size'] != os.path.getsize(file_path):
+            meta_dic = self.build()
+        self.__header_dic = meta_dic['header']
+        arrays_dic = {name: np.load(os.path.join(self.__index_dir, name + '.npy'), mmap_mode='r') \
+                      for name in self.index_files_tpl}
+        self.__rows = arrays_dic['rows'][:meta_dic['num_rows']]
+        self.__order = arrays_dic['order']
+        self.__keys = arrays_dic['keys']
+        self.__starts = arrays_dic['starts']
+        self.__prefix_net = arrays_dic['prefix_net']
+        self.__prefix_square = arrays_dic['prefix_square']
+
+    def __read_meta(self):
+        ''' return meta dict of the index, None if missing or of another version '''
+        try:
+            with open(os.path.join(self.__index_dir, 'meta.json'), 'r') as meta_file:
+                meta_dic = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        return meta_dic if meta_dic.get('version') == INDEX_VERSION else None
+
+    def build(self):
+        ''' build the rows and the index of the round file, return meta dict of the index '''
+        header_dic, events = RoundRecorder.read(self.__file_path)
+        os.makedirs(self.__index_dir, exist_ok=True)
+        payout = header_dic['blackjack_payout'] or 1
+        net_units_arr = np.array([payout if outcome_units_dic[outcome] is None else outcome_units_dic[outcome] \
+                                  for outcome in outcomes_tpl], dtype=np.float64)
+        table = state_table()
+
+        # events after the last outcome are a round cut by an interruption
+        num_events = len(events)
+        kind = events['kind']
+        outcome_idx = np.nonzero(kind == EVENT_OUTCOME)[0]
+        end = outcome_idx[-1] + 1 if len(outcome_idx) else 0
+        bound = max(1, int(np.count_nonzero(kind[:end] == EVENT_DECISION)))
+        rows = np.lib.format.open_memmap(os.path.join(self.__index_dir, 'rows.npy'), mode='w+', \
+                                         dtype=row_dtype, shape=(bound,))
+        num_rows = 0
+        start, first_round = 0, 0
+        while start < end:
+            stop = min(start + CHUNK_EVENTS, end)
+            if stop < end:
+                round_idx = np.nonzero(kind[start:stop] == EVENT_ROUND)[0]
+                if len(round_idx) > 1:
+                    stop = start + int(round_idx[-1])
+            chunk = np.asarray(events[start:stop])
+            chunk_rows = decision_rows(chunk, start, first_round, net_units_arr, table)
+            rows[num_rows:num_rows + len(chunk_rows)] = chunk_rows
+            num_rows += len(chunk_rows)
+            first_round += int(np.count_nonzero(chunk['kind'] == EVENT_ROUND))
+            start = stop
+        rows.flush()
+
+        keys = row_keys(rows[:num_rows])
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        unique_keys, starts = np.unique(sorted_keys, return_index=True)
+        net = np.asarray(rows['net'][:num_rows])[order]
+        arrays_dic = {'order': order, 'keys': unique_keys, 'starts': np.append(starts, num_rows), \
+                      'prefix_net': np.concatenate(([0.0], np.cumsum(net))), \
+                      'prefix_square': np.concatenate(([0.0], np.cumsum(net * net)))}
+        for name, array in arrays_dic.items():
+            np.save(os.path.join(self.__index_dir, name + '.npy'), array)
+        del rows
+        meta_dic = {'version': INDEX_VERSION, 'file_size': os.path.getsize(self.__file_path), \
+                    'num_events': num_events, 'num_rows': num_rows, 'num_rounds': first_round, 'header': header_dic}
+        with open(os.path.join(self.__index_dir, 'meta.json'), 'w') as meta_file:
+            json.dump(meta_dic, meta_file)
+        return meta_dic
+
+    @staticmethod
+    def parse_state(state):
+        ''' return state code of (sheet, row), sheet is hard_totals, soft_totals, pair_splitting or
+        'hard', 'soft', 'pair' and row is a row of the sheet (ex: ('hard', 12), ('soft', 'A, 7'), ('pair', 'T, T')).
+        surrender is a decision, not a state '''
+        sheet, row = state
+        sheet = sheet_aliases_dic.get(sheet, sheet)
+        if sheet not in state_sheets_tpl:
+            raise ValueError(f"{sheet!r} is not a sheet of hand states")
+        return state_code(sheet, CompiledStrategy.row_key(row))
+
+    def __key_ranges(self, player, state, two_cards, upcard, decision):
+        ''' return (first keys, last keys + 1) of the key ranges of the query, None is any '''
+        if isinstance(player, str):
+            player = self.__header_dic['players'].index(player)
+        if isinstance(state, tuple):
+            state = self.parse_state(state)
+        if upcard == 'A':
+            upcard = 11
+        if isinstance(decision, str):
+            decision = decision_codes_dic[decision]
+        if two_cards is not None:
+            two_cards = int(two_cards)
+        components = ((player, range(len(self.__header_dic['players'])), 8), (state, range(256), 8), \
+                      (two_cards, (0, 1), 1), (upcard, upcards_tpl, 4), (decision, range(len(decisions_tpl)), 3))
+        # components after the last one given are any value, one range covers them
+        num_given = max([i + 1 for i, (given, domain, bits) in enumerate(components) if given is not None], default=0)
+        prefixes = np.zeros(1, dtype=np.int64)
+        for given, domain, bits in components[:num_given]:
+            values = np.array([given] if given is not None else domain, dtype=np.int64)
+            prefixes = (prefixes[:, None] << bits | values[None, :]).ravel()
+        shift = sum(bits for given, domain, bits in components[num_given:])
+        return (prefixes << shift, (prefixes + 1) << shift)
+
+    def __positions(self, player, state, upcard, decision, two_cards):
+        ''' return (first positions, last positions + 1) in the order of the key ranges of the query '''
+        first_keys, last_keys = self.__key_ranges(player, state, two_cards, upcard, decision)
+        return (self.__starts[np.searchsorted(self.__keys, first_keys)], \
+                self.__starts[np.searchsorted(self.__keys, last_keys)])
+
+    def query(self, player=None, state=None, upcard=None, decision=None, two_cards=None):
+        ''' return dict of 'count', 'net_win', 'mean', 'sd' and 'se' of the net win of the rows of
+        player (name or index), state ((sheet, row) or code), upcard (2 ~ 11 or 'A'), decision and
+        two_cards (true for hands of two cards), None is any. read from the prefix sums, rows are not read '''
+        first, last = self.__positions(player, state, upcard, decision, two_cards)
+        count = int((last - first).sum())
+        net_win = float((self.__prefix_net[last] - self.__prefix_net[first]).sum())
+        square = float((self.__prefix_square[last] - self.__prefix_square[first]).sum())
+        mean = net_win / count if count else 0.0
+        variance = (square - net_win * mean) / (count - 1) if count > 1 else 0.0
+        stats = RunningStats.from_summary(count, mean, max(variance, 0.0))
+        return {'count': count, 'net_win': net_win, 'mean': mean, 'sd': stats.sd(), 'se': stats.se()}
+
+    def breakdown(self, player, state, upcard, two_cards=None):
+        ''' return dict of decision -> query() of every decision taken in the state against the upcard '''
+        breakdown_dic = dict()
+        for decision in decisions_tpl:
+            result_dic = self.query(player, state, upcard, decision, two_cards)
+            if result_dic['count']:
+                breakdown_dic[decision] = result_dic
+        return breakdown_dic
+
+    def rows(self, player=None, state=None, upcard=None, decision=None, two_cards=None):
+        ''' return rows of row_dtype matching the query in the order of the round file '''
+        first, last = self.__positions(player, state, upcard, decision, two_cards)
+        numbers = [self.__order[i:j] for i, j in zip(first, last) if j > i]
+        if not numbers:
+            return np.zeros(0, dtype=row_dtype)
+        return self.__rows[np.sort(np.concatenate(numbers))]
+
+    # getter methods
+    def get_header(self):
+        return self.__header_dic
+
+    def get_num_rows(self):
+        return len(self.__rows)
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'hand_history.bjr'
+    if not os.path.exists(file_path):
+        simulate(["Steve", "Bill_14", "Bill_15", "Bill_16", "Bill_17"], 200000, LOG_NONE, seed=0, \
+                 record_path=file_path)
+    history = HandHistory(file_path)
+    print(f"{history.get_num_rows()} decisions of {', '.join(history.get_header()['players'])}")
+    for name in history.get_header()['players']:
+        print(f"player {name}, hard 12 against dealer 3:")
+        for decision, result_dic in history.breakdown(name, ('hard', 12), 3).items():
+            print(f"    {decision:<6} {result_dic['count']:>8} hands  net win per hand {result_dic['mean']:+.4f}" \
+                  f" +/- {1.96 * result_dic['se']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+'''
+    Strategy optimizer
+
+    Searches the cells of the strategy sheets (hard_totals, soft_totals,
+    surrender, pair_splitting) for the maximum net win, starting from the
+    strategy folder of a player, and writes the best strategy to a new
+    folder with the same Excel layout that Player.load_strategy() reads.
+
+    A cell only changes the hands played against its dealer upcard, so
+    each candidate is scored on that upcard alone:
+    'crn' plays every candidate on the same cards of draw_cards() (common
+    random numbers) and replays only the rounds that read the cell, the
+    other rounds play the same; a change is kept when the mean of the
+    paired differences per round beats significance times its standard error,
+    'ev' uses the infinite-deck expected value of InfiniteDeckEV.
+'''
+
+import copy
+import os
+
+import numpy as np
+
+from black_jack import CompiledStrategy, Player
+from expected_value import InfiniteDeckEV
+from vector_engine import NUM_ROWS, VectorEngine, cell_index, draw_cards
+
+# cells tried for each sheet, 'Ds' plays the same as 'D' and 'Y/N' as 'Y'
+alternatives_dic = {
+    'surrender': ('SUR', 'NOSUR'),
+    'pair_splitting': ('Y', 'N'),
+    'soft_totals': ('S', 'H', 'D'),
+    'hard_totals': ('S', 'H', 'D'),
+}
+upcards_tpl = tuple(range(2, 12))   # dealer face value, ace is 11
+
+
+class StrategyOptimizer:
+    """
+    StrategyOptimizer class searches strategy cells for the maximum net win
+
+    ...
+
+    Attributes
+    ----------
+    __cells_dic : dict
+        best cells found, {sheet name: {row: {dealer face value: cell}}}
+    __score : str
+        'crn' or 'ev'
+    __rounds : int
+        rounds per upcard of 'crn'
+    __seed : int
+        seed of the cards shared by every candidate of 'crn'
+    __min_gain : float
+        net win per round a change must gain to be kept
+    __significance : float
+        standard errors of the paired difference a change of 'crn' must gain to be kept
+    __rules : Rules
+        rules the candidates are scored with, default rules if None
+    __scores_dic : dict
+        score of the best cells per upcard
+    __rounds_dic : dict
+        'crn' state of the best cells per upcard, (player cards, dealer cards,
+        net win per round, cells read per round)
+
+    Methods
+    -------
+    from_player_name()
+        build StrategyOptimizer from the strategy folder of a player
+    score_upcard()
+        return net win per round of cells against the upcard
+    optimize()
+        change cells one by one and keep changes that gain
+    expected_value()
+        return infinite-deck expected net win per round of the best cells
+
+    # Getters
+    get_cells()
+
+    """
+    def __init__(self, compiled_strategy, score='crn', rounds=200000, seed=0, min_gain=0.0, significance=3.0, \
+                 rules=None):
+        self.__cells_dic = copy.deepcopy(compiled_strategy.get_cells())
+        self.__score = score
+        self.__rounds = rounds
+        self.__seed = seed
+        self.__min_gain = min_gain
+        self.__significance = significance
+        self.__rules = rules
+        self.__scores_dic = dict()
+        self.__rounds_dic = dict()
+
+    @classmethod
+    def from_player_name(cls, name, **kwargs):
+        ''' build StrategyOptimizer from the strategy folder of a player '''
+        player = Player(None, name)
+        player.load_strategy()
+        return cls(player.get_compiled_strategy(), **kwargs)
+
+    def score_upcard(self, cells_dic, upcard):
+        ''' return net win per round of cells against the upcard '''
+        compiled = CompiledStrategy(cells_dic)
+        if self.__score == 'ev':
+            return InfiniteDeckEV(compiled, self.__rules).expected_value_upcard(upcard)
+        player_cards, dealer_cards = self.__cards(upcard)
+        return float(VectorEngine(compiled, rules=self.__rules).play_rounds(player_cards, dealer_cards, upcard)[3].mean())
+
+    def __cards(self, upcard):
+        ''' return (player cards, dealer cards) of the rounds against the upcard, the same for every candidate '''
+        return draw_cards(np.random.default_rng([self.__seed, upcard]), self.__rounds)
+
+    def optimize(self, max_passes=3):
+        ''' change cells one by one and keep changes that gain more than min_gain
+        (and, for 'crn', more than significance standard errors),
+        repeat until a pass keeps no change. return number of changes kept '''
+        for upcard in upcards_tpl:
+            if self.__score == 'ev':
+                self.__scores_dic[upcard] = self.score_upcard(self.__cells_dic, upcard)
+                continue
+            player_cards, dealer_cards = self.__cards(upcard)
+            engine = VectorEngine(CompiledStrategy(self.__cells_dic), rules=self.__rules)
+            result_tpl = engine.play_rounds(player_cards, dealer_cards, upcard, track_cells=True)
+            self.__rounds_dic[upcard] = (player_cards, dealer_cards, result_tpl[3], result_tpl[4])
+            self.__scores_dic[upcard] = float(result_tpl[3].mean())
+
+        num_changes = 0
+        for i in range(max_passes):
+            pass_changes = 0
+            for upcard in upcards_tpl:
+                for sheet, alternatives in alternatives_dic.items():
+                    for row, columns in self.__cells_dic[sheet].items():
+                        if upcard not in columns:
+                            continue
+                        pass_changes += self.__optimize_cell(sheet, row, upcard, alternatives)
+            num_changes += pass_changes
+            if pass_changes == 0:
+                break
+        return num_changes
+
+    def __optimize_cell(self, sheet, row, upcard, alternatives):
+        ''' try alternatives of one cell, keep the best. return 1 if changed '''
+        if self.__score == 'ev':
+            return self.__optimize_cell_ev(sheet, row, upcard, alternatives)
+        return self.__optimize_cell_crn(sheet, row, upcard, alternatives)
+
+    def __optimize_cell_ev(self, sheet, row, upcard, alternatives):
+        ''' try alternatives of one cell scored by the infinite-deck expected value, keep the best.
+        return 1 if changed '''
+        columns = self.__cells_dic[sheet][row]
+        current = columns[upcard]
+        best_cell, best_score = current, self.__scores_dic[upcard]
+        for cell in alternatives:
+            if cell == current:
+                continue
+            columns[upcard] = cell
+            score = self.score_upcard(self.__cells_dic, upcard)
+            if score > best_score + self.__min_gain:
+                best_cell, best_score = cell, score
+        columns[upcard] = best_cell
+        self.__scores_dic[upcard] = best_score
+        return 0 if best_cell == current else 1
+
+    def __optimize_cell_crn(self, sheet, row, upcard, alternatives):
+        ''' try alternatives of one cell on the rounds that read it, keep the best
+        whose paired gain beats min_gain and significance standard errors. return 1 if changed '''
+        player_cards, dealer_cards, net, cells = self.__rounds_dic[upcard]
+        if row >= NUM_ROWS:
+            return 0
+        replayed = np.nonzero(cells[:, cell_index(sheet, row)])[0]
+        if len(replayed) == 0:
+            # no round reads the cell, every alternative plays the same
+            return 0
+        columns = self.__cells_dic[sheet][row]
+        current = columns[upcard]
+        best_cell, best_gain, best_result = current, 0.0, None
+        for cell in alternatives:
+            if cell == current:
+                continue
+            columns[upcard] = cell
+            engine = VectorEngine(CompiledStrategy(self.__cells_dic), rules=self.__rules)
+            result_tpl = engine.play_rounds(player_cards[replayed], dealer_cards[replayed], upcard, track_cells=True)
+            # paired differences per round, zero for the rounds not replayed
+            difference = result_tpl[3] - net[replayed]
+            gain = difference.sum() / self.__rounds
+            variance = ((difference ** 2).sum() / self.__rounds - gain ** 2) * self.__rounds / (self.__rounds - 1)
+            standard_error = (variance / self.__rounds) ** 0.5
+            if gain > best_gain + self.__min_gain and gain > self.__significance * standard_error:
+                best_cell, best_gain, best_result = cell, gain, result_tpl
+        columns[upcard] = best_cell
+        if best_result is None:
+            return 0
+        net[replayed] = best_result[3]
+        cells[replayed] = best_result[4]
+        self.__scores_dic[upcard] += best_gain
+        return 1
+
+    def expected_value(self):
+        ''' return infinite-deck expected net win per round of the best cells over every upcard '''
+        return InfiniteDeckEV(CompiledStrategy(self.__cells_dic), self.__rules).expected_value()
+
+    # getter methods
+    def get_cells(self):
+        return self.__cells_dic
+
+
+def row_label(sheet, row):
+    ''' convert integer row of the sheet into the row label of the Excel file
+    (ex: 16 -> 16, soft 7 -> 'A, 7', pair 10 -> 'T, T', pair 1 -> 'A, A') '''
+    if sheet == 'soft_totals':
+        return f"A, {row}"
+    if sheet == 'pair_splitting':
+        label = {1: 'A', 10: 'T'}.get(row, str(row))
+        return f"{label}, {label}"
+    return row
+
+
+def write_strategy(cells_dic, name):
+    ''' write cells to the strategy folder name in the layout of Player.load_strategy() '''
+    import pandas as pd
+
+    directory = os.getcwd() + os.sep + name
+    os.makedirs(directory, exist_ok=True)
+    for sheet, rows_dic in cells_dic.items():
+        frame = pd.DataFrame.from_dict({row_label(sheet, row): columns for row, columns in rows_dic.items()}, \
+                                       orient='index', columns=list(upcards_tpl))
+        if sheet == 'surrender':
+            frame = frame.replace('NOSUR', None)    # empty cell is 'NOSUR'
+        frame = frame.rename(columns={11: 'A'})     # ace is written as 'A'
+        with pd.ExcelWriter(directory + os.sep + sheet + '.xlsx') as writer:
+            frame.to_excel(writer, startrow=1)
+            writer.sheets['Sheet1'].cell(row=1, column=5, value='DEALER UPCARD')
+
+
+def main():
+    name = "Bill_14"
+    optimizer = StrategyOptimizer.from_player_name(name, score='ev')
+    print(f"player {name} infinite-deck expected NET WIN per round: {optimizer.expected_value():.4%}")
+    num_changes = optimizer.optimize()
+    print(f"{num_changes} cells changed, infinite-deck expected NET WIN per round: {optimizer.expected_value():.4%}")
+    write_strategy(optimizer.get_cells(), name + "_optimized")
+
+
+if __name__ == '__main__':
+    main()
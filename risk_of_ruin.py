@@ -0,0 +1,187 @@
+'''
+    Risk of ruin
+
+    Plays many sessions of one player with a Bankroll and a bet spread of
+    black_jack.py, and reports the risk of ruin (fraction of sessions whose
+    bankroll is used up), the mean and standard deviation of the money won
+    per round, N0 (rounds for the expected win to equal one standard
+    deviation, variance / mean ** 2) and quantiles of the bankroll along
+    the sessions.
+
+    Nothing is stored per round or per session: RunningStats keeps mean and
+    variance of the money won, and the quantiles are estimated by the P-square
+    algorithm (Jain and Chlamtac, 1985) with five markers per quantile.
+'''
+
+import math
+import random
+
+from black_jack import LOG_NONE, Bankroll, CountingPlayer, Game, Player, RunningStats
+
+
+class P2Quantile:
+    """
+    P2Quantile class estimates a quantile of a stream in constant memory
+
+    ...
+
+    Attributes
+    ----------
+    __p : float
+        quantile to estimate, 0 ~ 1
+    __heights_lst : list
+        heights of the five markers, the first five values until they are sorted
+    __positions_lst : list
+        positions of the markers
+    __desired_lst : list
+        desired positions of the markers
+    __increments_tpl : tuple
+        increments of the desired positions per value
+
+    Methods
+    -------
+    add()
+        add a value of the stream
+    value()
+        return the estimate of the quantile
+
+    """
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError(f"quantile {p} is not between 0 and 1")
+        self.__p = p
+        self.__heights_lst = list()
+        self.__positions_lst = [1, 2, 3, 4, 5]
+        self.__desired_lst = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.__increments_tpl = (0, p / 2, p, (1 + p) / 2, 1)
+
+    def add(self, x):
+        ''' add a value of the stream '''
+        heights = self.__heights_lst
+        if len(heights) < 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        # cell of x, the extreme markers follow the minimum and maximum
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+        positions = self.__positions_lst
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.__desired_lst[i] += self.__increments_tpl[i]
+
+        # move the middle markers toward their desired positions
+        for i in (1, 2, 3):
+            d = self.__desired_lst[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self.__parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i])
+                heights[i] = height
+                positions[i] += d
+
+    def __parabolic(self, i, d):
+        ''' piecewise parabolic prediction of the marker height '''
+        q, n = self.__heights_lst, self.__positions_lst
+        return q[i] + d / (n[i + 1] - n[i - 1]) * ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) + \
+                                                  (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        ''' return the estimate of the quantile, nan before any value '''
+        heights = self.__heights_lst
+        if not heights:
+            return float('nan')
+        if len(heights) < 5:
+            return heights[min(len(heights) - 1, int(self.__p * len(heights)))]
+        return heights[2]
+
+
+def simulate_sessions(name, num_sessions, rounds_per_session, initial_bankroll, bet_spread=None, \
+                      count_system=None, seed=0, quantiles_tpl=(0.05, 0.5, 0.95), num_checkpoints=10):
+    '''play num_sessions sessions of rounds_per_session rounds for the player of the strategy
+    folder name, each starting with initial_bankroll and a fresh shoe. a session ends early when
+    the bankroll is used up. with count_system (ex: 'Hi-Lo') the player is a CountingPlayer.
+    return dict of 'risk_of_ruin', 'mean', 'sd' (money won per round), 'n0', 'risk_of_ruin_estimate'
+    (exp(-2 * mean * bankroll / variance)), 'final' quantiles of the bankroll and 'trajectory',
+    list of (round, quantiles of the bankroll at the round) '''
+    game = Game(LOG_NONE, rng=random.Random())
+    player = CountingPlayer(game, name, count_system) if count_system is not None else Player(game, name)
+    game.add_player(player)
+    player.load_strategy()
+    dealer = game.get_dealer()
+
+    step = max(1, rounds_per_session // num_checkpoints)
+    checkpoints_tpl = tuple(range(step, rounds_per_session + 1, step))
+    trajectory_lst = [[P2Quantile(p) for p in quantiles_tpl] for checkpoint in checkpoints_tpl]
+    final_lst = [P2Quantile(p) for p in quantiles_tpl]
+
+    master_rng = random.Random(seed)
+    num_ruined = 0
+    won_stats = RunningStats()
+    for i in range(num_sessions):
+        game.get_rng().seed(master_rng.getrandbits(64))
+        dealer.shuffle_deck()
+        bankroll = Bankroll(initial_bankroll, bet_spread)
+        player.set_bankroll(bankroll)
+        checkpoint_idx = 0
+        for session_round in range(1, rounds_per_session + 1):
+            before = bankroll.get_bankroll()
+            if game.play_shoe(1) == 0:
+                dealer.shuffle_deck()
+                game.play_shoe(1)
+            won_stats.add(bankroll.get_bankroll() - before)
+            if checkpoint_idx < len(checkpoints_tpl) and session_round == checkpoints_tpl[checkpoint_idx]:
+                for estimator in trajectory_lst[checkpoint_idx]:
+                    estimator.add(bankroll.get_bankroll())
+                checkpoint_idx += 1
+            if bankroll.is_ruined():
+                break
+
+        # a ruined bankroll stays where it fell for the rest of the session
+        for estimators in trajectory_lst[checkpoint_idx:]:
+            for estimator in estimators:
+                estimator.add(bankroll.get_bankroll())
+        for estimator in final_lst:
+            estimator.add(bankroll.get_bankroll())
+        num_ruined += bankroll.is_ruined()
+
+    player.set_bankroll(None)
+    mean = won_stats.get_mean()
+    variance = won_stats.variance()
+    if mean > 0:
+        n0 = variance / mean ** 2
+        risk_estimate = math.exp(-2 * mean * initial_bankroll / variance) if variance > 0 else 0.0
+    else:
+        n0 = float('inf') if mean == 0 else variance / mean ** 2
+        risk_estimate = 1.0
+    return {'sessions': num_sessions, 'rounds': won_stats.get_count(), 'risk_of_ruin': num_ruined / num_sessions, \
+            'mean': mean, 'sd': math.sqrt(variance), 'n0': n0, 'risk_of_ruin_estimate': risk_estimate, \
+            'final': dict(zip(quantiles_tpl, (estimator.value() for estimator in final_lst))), \
+            'trajectory': [(checkpoint, dict(zip(quantiles_tpl, (estimator.value() for estimator in estimators)))) \
+                           for checkpoint, estimators in zip(checkpoints_tpl, trajectory_lst)]}
+
+
+def main():
+    from black_jack import CountBetSpread, FlatBet
+    for name, count_system, bet_spread in (("Steve", None, FlatBet()), ("Steve", 'Hi-Lo', CountBetSpread())):
+        result_dic = simulate_sessions(name, 200, 2000, 100, bet_spread, count_system)
+        print(f"player {name} ({count_system or 'no count'}): risk of ruin {result_dic['risk_of_ruin']:.2%}" \
+              f" (estimate {result_dic['risk_of_ruin_estimate']:.2%}), mean per round {result_dic['mean']:.4f}," \
+              f" sd {result_dic['sd']:.4f}, N0 {result_dic['n0']:.0f}")
+        for session_round, quantiles_dic in result_dic['trajectory']:
+            print(f"\tround {session_round:>6}: " + "  ".join(f"{p:.0%} {value:8.2f}" for p, value in quantiles_dic.items()))
+
+
+if __name__ == '__main__':
+    main()
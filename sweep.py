@@ -0,0 +1,168 @@
+'''
+    Parameter sweep runner
+
+    Simulates every cell of a grid of strategy folders x rule variants x
+    round counts without user input. Cells are run in a process pool,
+    every finished cell is appended to a checkpoint file at once, so an
+    interrupted sweep resumes with the cells not finished yet. The results
+    of every cell are written to one CSV file, and to a Parquet file when
+    pandas with a Parquet engine is installed.
+
+    Each cell has its own seed derived from the sweep seed and the cell,
+    so a cell gives the same result whether it runs first, last or again
+    after a resume. The checkpoint key of a cell holds a hash of its Rules
+    arguments, the sweep seed and the tolerance, so a resume with other
+    settings runs the cell again instead of returning the old result.
+
+    usage:
+        python sweep.py --strategies Steve Bill_14 --rules default S17 3:2 \
+                        --rounds 100000 1000000 --out sweep_results
+'''
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import time
+
+from black_jack import Rules, simulate
+
+# rule variants by name, keyword arguments of Rules
+rule_presets_dic = {
+    'default': {},
+    'S17': {'hit_soft_17': False},
+    '3:2': {'blackjack_payout': 1.5},
+    '6:5': {'blackjack_payout': 1.2},
+    'no DAS': {'double_after_split': False},
+    'max 4 hands': {'max_hands': 4, 'resplit_aces': False},
+    'two card surrender': {'surrender': 'two_cards'},
+    'no surrender': {'surrender': 'none'},
+    '6 decks': {'num_decks': 6, 'penetration': 0.75},
+    '2 decks': {'num_decks': 2, 'penetration': 0.65},
+}
+CHECKPOINT_FILE = 'checkpoint.jsonl'
+RESULTS_FILE = 'results'
+columns_tpl = ('strategy', 'rules', 'target_rounds', 'rounds', 'seed', 'win', 'tie', 'lose', 'net_win', \
+               'mean', 'variance', 'se', 'seconds', 'rules_kwargs')
+
+
+def cell_key(strategy, rule_name, rounds, rules_kwargs, seed, tolerance):
+    ''' return key of a cell in the checkpoint file,
+    "strategy|rule name|rounds|hash of the Rules kwargs, sweep seed and tolerance" '''
+    settings_str = json.dumps({'rules': rules_kwargs, 'seed': seed, 'tolerance': tolerance}, sort_keys=True)
+    return f"{strategy}|{rule_name}|{rounds}|{hashlib.sha256(settings_str.encode()).hexdigest()[:16]}"
+
+
+def cell_seed(seed, key):
+    ''' return seed of a cell, the same for the same sweep seed and cell '''
+    return random.Random(f"{seed}:{key}").getrandbits(64)
+
+
+def run_cell(cell_tpl):
+    ''' simulate one cell in a worker process, cell_tpl is
+    (key, strategy, rule name, rules kwargs, rounds, seed, tolerance). return (key, row of the results),
+    'rounds' of the row is the rounds played, less than 'target_rounds' if stopped by tolerance '''
+    key, strategy, rule_name, rules_kwargs, rounds, seed, tolerance = cell_tpl
+    start = time.perf_counter()
+    statistics_dic = simulate([strategy], rounds, rng=random.Random(seed), tolerance=tolerance, \
+                              rules=Rules(**rules_kwargs))[strategy]
+    row_dic = {'strategy': strategy, 'rules': rule_name, 'target_rounds': rounds, 'seed': seed, \
+               'seconds': time.perf_counter() - start, 'rules_kwargs': json.dumps(rules_kwargs, sort_keys=True)}
+    for column in ('rounds', 'win', 'tie', 'lose', 'net_win', 'mean', 'variance', 'se'):
+        row_dic[column] = statistics_dic[column]
+    return (key, row_dic)
+
+
+def read_checkpoint(out_dir):
+    ''' return dict of cell key -> row of the cells finished, a line cut by an interruption is skipped '''
+    rows_dic = dict()
+    try:
+        with open(os.path.join(out_dir, CHECKPOINT_FILE), 'r') as checkpoint_file:
+            for line in checkpoint_file:
+                try:
+                    row_dic = json.loads(line)
+                except ValueError:
+                    continue
+                rows_dic[row_dic['key']] = row_dic['row']
+    except FileNotFoundError:
+        pass
+    return rows_dic
+
+
+def run_sweep(strategies, rules_dic, rounds_lst, out_dir, workers=None, seed=0, tolerance=None):
+    ''' simulate every cell of strategies x rules_dic (name -> Rules kwargs) x rounds_lst,
+    skip the cells in the checkpoint of out_dir, and write the results of every cell.
+    return list of rows in the order of the grid '''
+    os.makedirs(out_dir, exist_ok=True)
+    rows_dic = read_checkpoint(out_dir)
+    grid_lst = [(strategy, rule_name, rounds) for strategy in strategies for rule_name in rules_dic \
+                for rounds in rounds_lst]
+    keys_lst = [cell_key(strategy, rule_name, rounds, rules_dic[rule_name], seed, tolerance) \
+                for (strategy, rule_name, rounds) in grid_lst]
+    cells_lst = list()
+    for key, (strategy, rule_name, rounds) in zip(keys_lst, grid_lst):
+        if key not in rows_dic:
+            cells_lst.append((key, strategy, rule_name, rules_dic[rule_name], rounds, cell_seed(seed, key), tolerance))
+
+    if cells_lst:
+        import multiprocessing
+        if workers is None:
+            workers = os.cpu_count() or 1
+        with open(os.path.join(out_dir, CHECKPOINT_FILE), 'a') as checkpoint_file, \
+             multiprocessing.Pool(min(workers, len(cells_lst))) as pool:
+            # each finished cell is saved before the next one is waited for
+            for (key, row_dic) in pool.imap_unordered(run_cell, cells_lst):
+                checkpoint_file.write(json.dumps({'key': key, 'row': row_dic}) + "\n")
+                checkpoint_file.flush()
+                rows_dic[key] = row_dic
+
+    rows_lst = [rows_dic[key] for key in keys_lst]
+    write_results(rows_lst, out_dir)
+    return rows_lst
+
+
+def write_results(rows_lst, out_dir):
+    ''' write rows to results.csv, and results.parquet if pandas can write Parquet '''
+    with open(os.path.join(out_dir, RESULTS_FILE + '.csv'), 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=columns_tpl)
+        writer.writeheader()
+        writer.writerows(rows_lst)
+    try:
+        import pandas as pd
+        pd.DataFrame(rows_lst, columns=list(columns_tpl)).to_parquet(os.path.join(out_dir, RESULTS_FILE + '.parquet'))
+    except ImportError:
+        pass    # pandas or the Parquet engine (pyarrow, fastparquet) is not installed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simulate strategy folders x rule variants x round counts")
+    parser.add_argument('--strategies', nargs='+', default=["Steve", "Bill_14", "Bill_15", "Bill_16", "Bill_17"], \
+                        help="strategy folders in the working directory")
+    parser.add_argument('--rules', nargs='+', default=['default'], \
+                        help=f"rule presets ({', '.join(rule_presets_dic)}) or a JSON file of name -> Rules arguments")
+    parser.add_argument('--rounds', nargs='+', type=int, default=[100000])
+    parser.add_argument('--out', default='sweep_results', help="folder of the checkpoint and results files")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tolerance', type=float, default=None, \
+                        help="stop a cell when its net win per round is known within +/- tolerance")
+    args = parser.parse_args()
+
+    rules_dic = dict()
+    for rule in args.rules:
+        if rule.endswith('.json'):
+            with open(rule, 'r') as rules_file:
+                rules_dic.update(json.load(rules_file))
+        else:
+            rules_dic[rule] = rule_presets_dic[rule]
+
+    rows_lst = run_sweep(args.strategies, rules_dic, args.rounds, args.out, args.workers, args.seed, args.tolerance)
+    for row_dic in rows_lst:
+        print(f"{row_dic['strategy']:<10} {row_dic['rules']:<15} {row_dic['rounds']:>10}" \
+              f"  NET WIN per round {row_dic['mean']:.4%} +/- {1.96 * row_dic['se']:.4%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+import itertools
+
+import pytest
+
+from black_jack import compare_players
+
+
+def test_differences_of_every_pair_are_ratios_of_the_totals():
+    players = ['Steve', 'Bill_14', 'Bill_16']
+    comparison_dic = compare_players(players, 30, seed=1)
+    differences_dic = comparison_dic['differences']
+    assert set(differences_dic) == {(player, baseline) for baseline, player in itertools.combinations(players, 2)}
+    for (player, baseline), difference_dic in differences_dic.items():
+        assert difference_dic['mean'] == pytest.approx(comparison_dic[player]['net_win_per_round'] - \
+                                                       comparison_dic[baseline]['net_win_per_round'])
+        assert difference_dic['se'] > 0
@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from black_jack import LogWriter, Player, RoundRecorder, Rules, decision_codes_dic, outcomes_tpl, simulate
+from hand_history import HandHistory, decision_rows, outcome_units_dic, state_cell, state_table
+
+players = ['Steve', 'Bill_14', 'Bill_16']
+
+
+def record(file_path, rules=None):
+    simulate(players, 3000, log_writer=LogWriter(None), rules=rules, seed=4, record_path=file_path)
+    return HandHistory(file_path)
+
+
+def plain_rows(file_path):
+    ''' return rows of every decision of the round file, read in one step without the index '''
+    header_dic, events = RoundRecorder.read(file_path)
+    payout = header_dic['blackjack_payout'] or 1
+    net_units_arr = np.array([payout if outcome_units_dic[outcome] is None else outcome_units_dic[outcome] \
+                              for outcome in outcomes_tpl], dtype=np.float64)
+    return decision_rows(np.asarray(events), 0, 0, net_units_arr, state_table())
+
+
+@pytest.fixture(scope='module')
+def history_path(tmp_path_factory):
+    file_path = str(tmp_path_factory.mktemp('history') / 'rounds.bjr')
+    record(file_path)
+    return file_path
+
+
+def test_query_matches_a_loop_over_decision_rows(history_path):
+    history = HandHistory(history_path)
+    rows = plain_rows(history_path)
+    assert history.get_num_rows() == len(rows)
+
+    totals_dic = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        key = (int(row['player']), int(row['state']), int(row['upcard']), int(row['decision']), \
+               int(row['num_cards'] == 2))
+        # every key, and the queries of a player, a state against an upcard and a decision
+        for query_key in (key, (key[0], None, None, None, None), (None, key[1], key[2], None, None), \
+                          (None, None, None, key[3], None)):
+            totals_dic[query_key][0] += 1
+            totals_dic[query_key][1] += float(row['net'])
+    for (player, state, upcard, decision, two_cards), (count, net_win) in totals_dic.items():
+        result_dic = history.query(player, state, upcard, decision, two_cards)
+        assert result_dic['count'] == count
+        assert result_dic['net_win'] == pytest.approx(net_win, abs=1e-9)
+    assert history.query()['count'] == len(rows)
+
+
+def test_states_agree_with_the_decisions(tmp_path):
+    ''' the state of a row is the cell Hand.decide() read, under resplit restrictions too '''
+    history = record(str(tmp_path / 'rounds.bjr'), Rules(max_hands=2, resplit_aces=False, double_after_split=False))
+    rows = history.rows()
+    for player_idx, name in enumerate(players):
+        player = Player(None, name)
+        player.load_strategy()
+        pair_splitting = player.get_compiled_strategy().get_pair_splitting()
+        # surrender is decided before the pair, whatever the state
+        for row in rows[(rows['player'] == player_idx) & (rows['decision'] != decision_codes_dic['SUR'])]:
+            sheet, sheet_row = state_cell(int(row['state']))
+            is_split = int(row['decision']) == decision_codes_dic['SPLIT']
+            if sheet == 'pair_splitting':
+                assert pair_splitting[sheet_row][int(row['upcard'])] == is_split
+            else:
+                assert not is_split
@@ -0,0 +1,30 @@
+import gzip
+import os
+
+import pytest
+
+from black_jack import LogWriter
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_rotation_counts_bytes_on_disk(tmp_path, compress):
+    ''' max_bytes is the size of a file on disk, with non ASCII text and with gzip '''
+    file_path = str(tmp_path / 'log.txt')
+    writer = LogWriter(file_path, buffer_size=1000, compress=compress, max_bytes=20000, backup_count=3)
+    lines_lst = [f"round {i} ♠ ♥\n" for i in range(100000)]
+    for line in lines_lst:
+        writer.append(line)
+    writer.close()
+
+    file_path = writer.get_file_path()
+    root, ext = os.path.splitext(file_path)
+    paths_lst = [f"{root}.{i}{ext}" for i in range(3, 0, -1)] + [file_path]
+    for path in paths_lst:
+        assert os.path.getsize(path) <= 20000
+    # the last files hold the end of the log, in order
+    open_file = gzip.open if compress else open
+    text = ""
+    for path in paths_lst:
+        with open_file(path, 'rb') as log_file:
+            text += log_file.read().decode()
+    assert text == "".join(lines_lst)[-len(text):]
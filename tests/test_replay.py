@@ -0,0 +1,38 @@
+import pytest
+
+from black_jack import LogWriter, ShoeReplay, replay_round, simulate
+
+players = ['Steve', 'Bill_14', 'Bill_16']
+num_rounds = 300
+seed = 5
+
+
+def played_round(round_int):
+    ''' return statistics of one round of the seeded run, from runs of round_int and round_int - 1 rounds '''
+    after_dic = simulate(players, round_int, log_writer=LogWriter(None), seed=seed)
+    before_dic = simulate(players, round_int - 1, log_writer=LogWriter(None), seed=seed) if round_int > 1 else None
+    return {name: {key: after_dic[name][key] - (before_dic[name][key] if before_dic else 0) \
+                   for key in ('win', 'tie', 'lose', 'net_win')} for name in after_dic}
+
+
+@pytest.fixture(scope='module')
+def replay_path(tmp_path_factory):
+    file_path = str(tmp_path_factory.mktemp('replay') / 'shoes.bsr')
+    simulate(players, num_rounds, log_writer=LogWriter(None), seed=seed, replay_path=file_path)
+    return file_path
+
+
+def test_replay_round_reproduces_the_recorded_round(replay_path, tmp_path):
+    replay = ShoeReplay(replay_path)
+    try:
+        assert replay.get_num_shoes() > 1
+        second_shoe_round = replay.get_shoe(replay.find_round(num_rounds))[1]
+    finally:
+        replay.close()
+    # the first round, the first and the last round of a shoe after the first one, and the last round
+    for round_int in (1, second_shoe_round, second_shoe_round - 1, num_rounds):
+        log_path = str(tmp_path / f"round_{round_int}.txt")
+        replayed_dic = replay_round(players, replay_path, round_int, LogWriter(log_path, rounds=[round_int]))
+        assert replayed_dic == played_round(round_int)
+        with open(log_path) as log_file:
+            assert f"----- round {round_int} START -----" in log_file.read()
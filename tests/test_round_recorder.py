@@ -0,0 +1,42 @@
+import black_jack as bj
+from black_jack import DEALER_INDEX, EVENT_CARD, EVENT_DEAL, EVENT_ROUND, RoundRecorder
+
+
+def record_rounds(file_path, names, num_rounds, monkeypatch):
+    ''' simulate num_rounds rounds recorded to file_path, return codes drawn per round '''
+    draw_code, play_round = bj.Shoe.draw_code, bj.Game.play_round
+    drawn_lst = list()
+    def recording_draw_code(shoe):
+        code = draw_code(shoe)
+        drawn_lst[-1].append(code)
+        return code
+    def recording_play_round(game):
+        drawn_lst.append(list())
+        play_round(game)
+    monkeypatch.setattr(bj.Shoe, 'draw_code', recording_draw_code)
+    monkeypatch.setattr(bj.Game, 'play_round', recording_play_round)
+    bj.simulate(names, num_rounds, log_writer=bj.LogWriter(None), seed=3, record_path=file_path)
+    return drawn_lst
+
+
+def test_one_deal_event_per_hand(tmp_path, monkeypatch):
+    names = ['Steve', 'Bill_14', 'Bill_16']
+    file_path = str(tmp_path / 'rounds.bjr')
+    drawn_lst = record_rounds(file_path, names, 200, monkeypatch)
+    header_dic, events = RoundRecorder.read(file_path)
+    assert header_dic['players'] == names
+
+    starts = [i for i, kind in enumerate(events['kind']) if kind == EVENT_ROUND]
+    assert len(starts) == len(drawn_lst)
+    num_hands = len(names) + 1
+    for start, drawn in zip(starts, drawn_lst):
+        deal = events[start + 1:start + 1 + num_hands]
+        assert (deal['kind'] == EVENT_DEAL).all()
+        assert deal['player'].tolist() == list(range(len(names))) + [DEALER_INDEX]
+        # cards are dealt one per hand in turn, then the second one
+        assert deal['hand'].tolist() == drawn[:num_hands]
+        assert deal['value'].tolist() == drawn[num_hands:2 * num_hands]
+    # no other event deals the first two cards
+    assert (events['kind'] == EVENT_DEAL).sum() == num_hands * len(drawn_lst)
+    num_drawn = sum(len(drawn) for drawn in drawn_lst)
+    assert (events['kind'] == EVENT_CARD).sum() == num_drawn - 2 * num_hands * len(drawn_lst)
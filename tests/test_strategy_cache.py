@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+
+from black_jack import CompiledStrategy, Player
+
+
+def load_cells():
+    ''' return cells of Steve loaded with the cache '''
+    player = Player(None, 'Steve')
+    player.load_strategy()
+    return player.get_compiled_strategy().get_cells()
+
+
+def read_cache(directory):
+    with open(os.path.join(directory, CompiledStrategy.cache_file_str)) as cache_file:
+        return json.load(cache_file)
+
+
+def write_cell(file_path, row_label, column, cell):
+    ''' write cell of the row and dealer upcard column of a strategy sheet '''
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_path)
+    sheet = workbook.active
+    columns = [value for value in next(sheet.iter_rows(min_row=2, max_row=2, values_only=True))]
+    for row in sheet.iter_rows(min_row=3):
+        if row[0].value == row_label:
+            row[columns.index(column)].value = cell
+    workbook.save(file_path)
+
+
+def test_cache_follows_the_excel_files(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(os.getcwd(), 'Steve'), tmp_path / 'Steve', \
+                    ignore=shutil.ignore_patterns(CompiledStrategy.cache_file_str))
+    monkeypatch.chdir(tmp_path)
+    directory = str(tmp_path / 'Steve')
+    hard_path = os.path.join(directory, 'hard_totals.xlsx')
+
+    read_strategy = Player._Player__read_strategy
+    read_lst = list()
+    def counting_read_strategy(player):
+        read_lst.append(player.get_name_str())
+        return read_strategy(player)
+    monkeypatch.setattr(Player, '_Player__read_strategy', counting_read_strategy)
+    def is_read():
+        ''' return true if the Excel files were read since the last call '''
+        result = len(read_lst) > 0
+        read_lst.clear()
+        return result
+
+    cells_dic = load_cells()
+    assert is_read()
+    assert load_cells() == cells_dic and not is_read()
+
+    # touched but not changed: the cache is used and gets the new mtime
+    stat = os.stat(hard_path)
+    os.utime(hard_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_cells() == cells_dic and not is_read()
+    assert read_cache(directory)['sources']['hard_totals']['mtime_ns'] == stat.st_mtime_ns + 10 ** 9
+
+    # same size and mtime but another sha256: the cache is rebuilt
+    cache_dic = read_cache(directory)
+    cache_dic['sources']['hard_totals']['mtime_ns'] += 1
+    cache_dic['sources']['hard_totals']['sha256'] = '0' * 64
+    with open(os.path.join(directory, CompiledStrategy.cache_file_str), 'w') as cache_file:
+        json.dump(cache_dic, cache_file)
+    assert CompiledStrategy.from_cache(directory) is None
+    assert load_cells() == cells_dic and is_read()
+    assert read_cache(directory)['sources']['hard_totals']['sha256'] != '0' * 64
+
+    # changed cell: the cache is rebuilt with the cell
+    cell = 'H' if cells_dic['hard_totals'][12][2] != 'H' else 'S'
+    write_cell(hard_path, 12, 2, cell)
+    changed_dic = load_cells()
+    assert is_read() and changed_dic['hard_totals'][12][2] == cell
+    assert load_cells() == changed_dic and not is_read()
@@ -0,0 +1,26 @@
+import json
+import os
+
+from sweep import CHECKPOINT_FILE, cell_key, cell_seed, run_sweep
+
+
+def test_cell_key_holds_rules_seed_and_tolerance():
+    key = cell_key('Steve', 'S17', 1000, {'hit_soft_17': False, 'num_decks': 6}, 0, None)
+    # the order of the Rules kwargs does not matter
+    assert key == cell_key('Steve', 'S17', 1000, {'num_decks': 6, 'hit_soft_17': False}, 0, None)
+    assert key.startswith('Steve|S17|1000|')
+    assert key != cell_key('Steve', 'S17', 1000, {'hit_soft_17': True, 'num_decks': 6}, 0, None)
+    assert key != cell_key('Steve', 'S17', 1000, {'hit_soft_17': False, 'num_decks': 6}, 99, None)
+    assert key != cell_key('Steve', 'S17', 1000, {'hit_soft_17': False, 'num_decks': 6}, 0, 0.01)
+    assert cell_seed(0, key) == cell_seed(0, key)
+
+
+def test_resume_with_another_seed_runs_the_cell_again(tmp_path):
+    out_dir = str(tmp_path)
+    first = run_sweep(['Steve'], {'default': {}}, [300], out_dir, workers=1, seed=0)
+    other = run_sweep(['Steve'], {'default': {}}, [300], out_dir, workers=1, seed=99)
+    again = run_sweep(['Steve'], {'default': {}}, [300], out_dir, workers=1, seed=0)
+    assert other[0]['seed'] != first[0]['seed']
+    assert again == first
+    with open(os.path.join(out_dir, CHECKPOINT_FILE)) as checkpoint_file:
+        assert len([json.loads(line) for line in checkpoint_file]) == 2
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from black_jack import Rules
+from vector_engine import CardRows, compare_with_object_engine
+
+
+@pytest.mark.parametrize('rules_kwargs', [{}, {'hit_soft_17': False, 'surrender': 'none'}])
+def test_agrees_with_object_engine(rules_kwargs):
+    comparison_dic = compare_with_object_engine('Steve', 50000, seed=2, rules=Rules(**rules_kwargs), \
+                                                vector_rounds=500000)
+    for key in ('win', 'tie', 'lose', 'net_win'):
+        assert comparison_dic[key]['agrees'], (key, comparison_dic[key])
+    assert comparison_dic['net_win']['agrees_expected_value'], comparison_dic['net_win']
+    assert comparison_dic['agrees']
+
+
+def test_card_rows_past_the_end_of_a_row():
+    cards = np.arange(8, dtype=np.int8).reshape(2, 4)
+    first = CardRows(cards).draw(np.array([0, 0, 0, 0, 0, 0, 1]))
+    assert first[:4].tolist() == [0, 1, 2, 3]
+    assert first[6] == 4
+    # cards past the end depend on the row only, not on the rows played with it
+    again = CardRows(cards[:1]).draw(np.zeros(6, dtype=np.int64))
+    assert again.tolist() == first[:6].tolist()
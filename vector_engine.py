@@ -0,0 +1,398 @@
+'''
+    Vectorized Black Jack engine
+
+    Simulates millions of independent rounds of one fixed strategy at once
+    with NumPy arrays, for fast screening of strategy sheets.
+
+    Rules are the same as black_jack.py: Hand.decide() for the player
+    (surrender, split, soft, hard and doubling on two cards only),
+    Dealer.play() for the dealer and Game.check_winner() for win, tie and
+    lose counts. Cards are drawn from an infinite shoe with the same
+    proportions as the decks of black_jack.py (every number is 1/13), so
+    results agree with the object engine, which deals from a finite shoe,
+    within statistical error; compare_with_object_engine() checks it.
+
+    Of the Rules, the surrender type and H17 / S17 are followed. The number
+    of decks and the penetration do not apply to an infinite shoe, and
+    restricted splits or a blackjack payout raise ValueError.
+
+    The cards of a round are drawn in advance as one row of a player card
+    matrix and one row of a dealer card matrix (draw_cards()) and taken in
+    order. Two strategies played on the same matrices see the same cards in
+    every round they play the same way (common random numbers), and a round
+    that never reads a cell plays the same whatever the cell holds.
+'''
+
+import numpy as np
+
+from black_jack import SURRENDER_NONE, SURRENDER_TWO_CARDS, CompiledStrategy, Player, Rules, numbers_tpl, values_tpl
+
+# decision codes of the vectorized engine
+STAND, HIT, DOUBLE, SPLIT, SUR = range(5)
+decisions_tpl = ('STAND', 'HIT', 'DOUBLE', 'SPLIT', 'SUR')
+
+ACE_IDX = numbers_tpl.index('A')
+card_values_arr = np.array(values_tpl, dtype=np.int16)     # 'A' has value 1
+
+PLAYER_CARDS = 32   # cards per round of the player hands, more are drawn by CardRows.extra_card()
+DEALER_CARDS = 16   # cards per round of the dealer hand, more are drawn by CardRows.extra_card()
+NUM_ROWS = 22       # rows per sheet of a cell index
+
+
+def draw_cards(rng, num_rounds):
+    ''' draw the cards of num_rounds rounds with the numpy Generator rng.
+    return (player cards, dealer cards), number index of numbers_tpl, one row per round '''
+    return (rng.integers(0, len(numbers_tpl), size=(num_rounds, PLAYER_CARDS), dtype=np.int8), \
+            rng.integers(0, len(numbers_tpl), size=(num_rounds, DEALER_CARDS), dtype=np.int8))
+
+
+def cell_index(sheet, row):
+    ''' return column of the cell (sheet name, row) in the cells read per round '''
+    return CompiledStrategy.sheet_names_tpl.index(sheet) * NUM_ROWS + row
+
+
+class CardRows:
+    """
+    CardRows class takes the cards of every round in order from its row of a card matrix
+
+    ...
+
+    Attributes
+    ----------
+    __cards : ndarray
+        number index of the cards [round, card]
+    __cursor : ndarray
+        cards taken per round
+
+    Methods
+    -------
+    draw()
+        take the next card of rounds
+    extra_card()
+        return a card of a round past the end of its row
+
+    """
+    __slots__ = ('__cards', '__cursor')
+
+    def __init__(self, cards):
+        self.__cards = cards
+        self.__cursor = np.zeros(len(cards), dtype=np.int64)
+
+    def draw(self, rounds):
+        ''' take the next card of each round of rounds, a round given twice takes two cards.
+        return number index of numbers_tpl '''
+        if len(rounds) == 0:
+            return np.zeros(0, dtype=np.int8)
+        # order of each round among the equal rounds
+        order = np.argsort(rounds, kind='stable')
+        sorted_rounds = rounds[order]
+        is_first = np.ones(len(rounds), dtype=bool)
+        is_first[1:] = sorted_rounds[1:] != sorted_rounds[:-1]
+        starts = np.nonzero(is_first)[0]
+        rank = np.empty(len(rounds), dtype=np.int64)
+        rank[order] = np.arange(len(rounds)) - np.repeat(starts, np.diff(np.append(starts, len(rounds))))
+        column = self.__cursor[rounds] + rank
+        np.add.at(self.__cursor, rounds, 1)
+        width = self.__cards.shape[1]
+        cards = self.__cards[rounds, np.minimum(column, width - 1)]
+        # a round that takes more cards than its row holds (several splits) is rare
+        for i in np.nonzero(column >= width)[0]:
+            cards[i] = self.extra_card(self.__cards[rounds[i]], column[i])
+        return cards
+
+    @staticmethod
+    def extra_card(row, column):
+        ''' return a card of the round of the row past the end of the row, number index of numbers_tpl.
+        it is drawn with a seed of the cards of the row and the column, so the same row gives the same
+        cards whatever rounds are played with it '''
+        return np.random.default_rng([*row.tolist(), int(column)]).integers(0, len(numbers_tpl))
+
+
+class VectorEngine:
+    """
+    VectorEngine class simulates rounds of one strategy with NumPy arrays
+
+    ...
+
+    Attributes
+    ----------
+    __hard_totals : ndarray
+        decision codes [more than two cards / two cards, hand value, dealer face value]
+    __soft_totals : ndarray
+        decision codes [more than two cards / two cards, value except one ace, dealer face value]
+    __surrender : ndarray
+        true if surrender [hand value, dealer face value]
+    __pair_splitting : ndarray
+        1 if split, 0 if not, -1 if missing [card value, dealer face value]
+    __surrender_type : str
+        surrender type of the Rules
+    __hit_soft_17 : bool
+        true if the dealer hits 17 holding an ace
+    __rng : numpy.random.Generator
+        random generator of the cards
+
+    Methods
+    -------
+    from_player_name()
+        build VectorEngine from the strategy folder of a player
+    simulate()
+        simulate rounds and return win, tie, lose counts
+    play_rounds()
+        play one round per row of card matrices
+    play_hands()
+        play player hands of a batch, including split hands
+    play_dealer()
+        play dealer hands of a batch
+
+    """
+    def __init__(self, compiled_strategy, seed=None, rules=None):
+        ''' convert tables of CompiledStrategy into arrays of decision codes,
+        rules is Rules (default rules if None) '''
+        if rules is None:
+            rules = Rules()
+        if rules.is_split_restricted() or rules.get_blackjack_payout() is not None:
+            raise ValueError(f"rules not supported by VectorEngine: {rules}")
+        self.__hard_totals = np.stack([self.__codes(compiled_strategy.get_hard_totals(i)) for i in (0, 1)])
+        self.__soft_totals = np.stack([self.__codes(compiled_strategy.get_soft_totals(i)) for i in (0, 1)])
+        self.__surrender = np.array(compiled_strategy.get_surrender(), dtype=bool)
+        pair_lst = [[-1 if cell is None else int(cell) for cell in row] for row in compiled_strategy.get_pair_splitting()]
+        self.__pair_splitting = np.array(pair_lst, dtype=np.int8)
+        self.__surrender_type = rules.get_surrender()
+        self.__hit_soft_17 = rules.hit_soft_17()
+        self.__rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_player_name(cls, name, seed=None, rules=None):
+        ''' build VectorEngine from the strategy folder of a player '''
+        player = Player(None, name)
+        player.load_strategy()
+        return cls(player.get_compiled_strategy(), seed, rules)
+
+    @staticmethod
+    def __codes(table):
+        ''' convert table of decision string into array of codes, missing cell is -1 '''
+        return np.array([[-1 if cell is None else decisions_tpl.index(cell) for cell in row] for row in table], \
+                        dtype=np.int8)
+
+    def simulate(self, num_rounds, batch_size=1000000, upcard=None):
+        ''' simulate num_rounds rounds and return win, tie, lose counts
+        in the same format as Game.get_statistics().
+        if upcard (dealer face value 2 ~ 11) is given, every round is played against it '''
+        statistics_dic = {'rounds': 0, 'win': 0.0, 'tie': 0.0, 'lose': 0.0}
+        while statistics_dic['rounds'] < num_rounds:
+            size = min(batch_size, num_rounds - statistics_dic['rounds'])
+            win, tie, lose, net, cells = self.play_rounds(*draw_cards(self.__rng, size), upcard)
+            statistics_dic['rounds'] += size
+            statistics_dic['win'] += win
+            statistics_dic['tie'] += tie
+            statistics_dic['lose'] += lose
+        statistics_dic['net_win'] = statistics_dic['win'] - statistics_dic['lose']
+        return statistics_dic
+
+    def play_rounds(self, player_cards, dealer_cards, upcard=None, track_cells=False):
+        ''' play one round per row of the card matrices of draw_cards().
+        if upcard (dealer face value 2 ~ 11) is given, every round is played against it.
+        return (win, tie, lose, net win per round, cells), cells is None or, if track_cells,
+        true if the round read the cell [round, cell_index()] '''
+        size = len(player_cards)
+        player_rows, dealer_rows = CardRows(player_cards), CardRows(dealer_cards)
+        rounds = np.arange(size)
+        hole, up = dealer_rows.draw(rounds), dealer_rows.draw(rounds)
+        if upcard is not None:
+            up = np.full(size, ACE_IDX if upcard == 11 else values_tpl.index(upcard), dtype=np.int8)
+        # dealer face value of the exposed card, ace is valued as 11
+        face_value = np.where(up == ACE_IDX, 11, card_values_arr[up])
+        cells = np.zeros((size, len(CompiledStrategy.sheet_names_tpl) * NUM_ROWS), dtype=bool) if track_cells else None
+        first, second = player_rows.draw(rounds), player_rows.draw(rounds)
+        round_idx, value, is_break, bet, is_sur = self.play_hands(first, second, face_value, player_rows, cells)
+        dealer_value, dealer_break = self.play_dealer(hole, up, dealer_rows)
+
+        # same accounting as Game.check_winner()
+        dealer_value, dealer_break = dealer_value[round_idx], dealer_break[round_idx]
+        played = ~is_sur
+        both_stand = played & ~is_break & ~dealer_break
+        win_mask = (both_stand & (value > dealer_value)) | (played & ~is_break & dealer_break)
+        lose_mask = (both_stand & (value < dealer_value)) | (played & is_break)
+        tie_mask = both_stand & (value == dealer_value)
+        win = float(bet[win_mask].sum())
+        lose = float(bet[lose_mask].sum()) + 0.5 * float(is_sur.sum())
+        tie = float(tie_mask.sum())
+        hand_net = bet * (win_mask.astype(np.int8) - lose_mask.astype(np.int8)) - 0.5 * is_sur
+        net = np.bincount(round_idx, weights=hand_net, minlength=size)
+        return win, tie, lose, net, cells
+
+    def play_hands(self, first, second, face_value, player_rows, cells=None):
+        ''' play player hands of a batch taking cards from the CardRows player_rows,
+        a split hand is played in the next pass. cells read are set in cells if given.
+        return (round index, value, is_break, bet, is_sur) per hand '''
+        results = list()
+        round_idx = np.arange(len(first))
+        while len(round_idx) > 0:
+            split_round, split_card, result_tpl = self.__play_pass(round_idx, first, second, face_value[round_idx], \
+                                                                   player_rows, cells)
+            results.append(result_tpl)
+            # the second card of a split pair starts a new hand
+            round_idx, first = split_round, split_card
+            second = player_rows.draw(round_idx)
+        return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+    def __play_pass(self, round_idx, first, second, face_value, player_rows, cells):
+        ''' play hands of (first, second) until every hand stands, breaks,
+        doubles or surrenders. return split hands and results '''
+        size = len(round_idx)
+        hard = card_values_arr[first] + card_values_arr[second]
+        has_ace = (first == ACE_IDX) | (second == ACE_IDX)
+        num_cards = np.full(size, 2, dtype=np.int16)
+        bet = np.ones(size, dtype=np.int8)
+        is_sur = np.zeros(size, dtype=bool)
+        is_break = np.zeros(size, dtype=bool)
+        first, second = first.copy(), second.copy()
+        split_round, split_card = list(), list()
+
+        active = np.arange(size)
+        while len(active) > 0:
+            h, a, n, up = hard[active], has_ace[active], num_cards[active], face_value[active]
+            value = np.where(a & (h + 10 <= 21), h + 10, h)
+            is_two_cards = (n == 2).astype(np.int8)
+            decision = np.full(len(active), -1, dtype=np.int8)
+
+            # surrender only 15, 16 of hard hand, if the surrender type allows it
+            sur_mask = ~a & ((value == 15) | (value == 16))
+            if self.__surrender_type == SURRENDER_NONE:
+                sur_mask[:] = False
+            elif self.__surrender_type == SURRENDER_TWO_CARDS:
+                sur_mask &= n == 2
+            if cells is not None:
+                cells[round_idx[active[sur_mask]], cell_index('surrender', 0) + value[sur_mask]] = True
+            sur_mask[sur_mask] = self.__surrender[value[sur_mask], up[sur_mask]]
+            decision[sur_mask] = SUR
+
+            # pair splitting
+            undecided = ~sur_mask
+            pair_mask = undecided & (n == 2) & (first[active] == second[active])
+            pair_value = card_values_arr[first[active][pair_mask]]
+            if cells is not None:
+                cells[round_idx[active[pair_mask]], cell_index('pair_splitting', 0) + pair_value] = True
+            pair_cell = self.__pair_splitting[pair_value, up[pair_mask]]
+            if (pair_cell < 0).any():
+                raise KeyError("missing cell in pair_splitting")
+            split_mask = np.zeros(len(active), dtype=bool)
+            split_mask[pair_mask] = pair_cell == 1
+            decision[split_mask] = SPLIT
+
+            # soft totals, else hard totals
+            undecided &= ~split_mask
+            except_one_a = h - 1
+            soft_mask = undecided & a & (except_one_a < 10)
+            hard_mask = undecided & ~soft_mask
+            if cells is not None:
+                cells[round_idx[active[soft_mask]], cell_index('soft_totals', 0) + except_one_a[soft_mask]] = True
+                cells[round_idx[active[hard_mask]], cell_index('hard_totals', 0) + value[hard_mask]] = True
+            decision[soft_mask] = self.__soft_totals[is_two_cards[soft_mask], except_one_a[soft_mask], up[soft_mask]]
+            decision[hard_mask] = self.__hard_totals[is_two_cards[hard_mask], value[hard_mask], up[hard_mask]]
+            if (decision < 0).any():
+                raise KeyError("missing cell in soft_totals or hard_totals")
+
+            is_sur[active[decision == SUR]] = True
+
+            # split: keep the first card, the second card starts a new hand
+            splitting = active[decision == SPLIT]
+            split_round.append(round_idx[splitting])
+            split_card.append(second[splitting])
+            hard[splitting] = card_values_arr[first[splitting]]
+            has_ace[splitting] = first[splitting] == ACE_IDX
+            num_cards[splitting] = 1
+
+            # every hand that hits, doubles or splits takes one card
+            taking = active[(decision == HIT) | (decision == DOUBLE) | (decision == SPLIT)]
+            card = player_rows.draw(round_idx[taking])
+            hard[taking] += card_values_arr[card]
+            has_ace[taking] |= card == ACE_IDX
+            num_cards[taking] += 1
+            second[splitting] = card[np.isin(taking, splitting, assume_unique=True)]
+
+            doubling = active[decision == DOUBLE]
+            bet[doubling] = 2
+            value = np.where(has_ace[taking] & (hard[taking] + 10 <= 21), hard[taking] + 10, hard[taking])
+            is_break[taking] = value > 21
+
+            # hands that hit or split without break decide again
+            continuing = (decision == HIT) | (decision == SPLIT)
+            active = active[continuing]
+            active = active[~is_break[active]]
+
+        value = np.where(has_ace & (hard + 10 <= 21), hard + 10, hard)
+        result_tpl = (round_idx, value, is_break, bet, is_sur)
+        return (np.concatenate(split_round), np.concatenate(split_card), result_tpl)
+
+    def play_dealer(self, hole, up, dealer_rows):
+        ''' play dealer hands of a batch with the rule of Dealer.play(),
+        hit under 17, and hit 17 when the hand holds an ace if the rules are H17.
+        cards are taken from the CardRows dealer_rows. return (value, is_break) '''
+        hit_soft_17 = self.__hit_soft_17
+        hard = card_values_arr[hole] + card_values_arr[up]
+        has_ace = (hole == ACE_IDX) | (up == ACE_IDX)
+        value = np.where(has_ace & (hard + 10 <= 21), hard + 10, hard)
+        hitting = np.nonzero((value < 17) | ((value == 17) & has_ace & hit_soft_17))[0]
+        while len(hitting) > 0:
+            card = dealer_rows.draw(hitting)
+            hard[hitting] += card_values_arr[card]
+            has_ace[hitting] |= card == ACE_IDX
+            h, a = hard[hitting], has_ace[hitting]
+            value[hitting] = np.where(a & (h + 10 <= 21), h + 10, h)
+            v = value[hitting]
+            hitting = hitting[(v < 17) | ((v == 17) & a & hit_soft_17)]
+        return value, value > 21
+
+
+def compare_with_object_engine(name, rounds=100000, seed=0, rules=None, k=3.0, vector_rounds=1000000, batches=20):
+    ''' play rounds of the strategy folder name with simulate() of black_jack.py (finite shoe) and
+    vector_rounds with VectorEngine.simulate() (infinite shoe), both with seed and rules, and compare
+    win, tie, lose and net win per round. a standard error per round is estimated from batches
+    batches of the vector engine, and the net win is also compared with InfiniteDeckEV.
+    return dict of 'win', 'tie', 'lose', 'net_win' -> {'object', 'vector', 'se', 'agrees'},
+    'net_win' also has 'expected_value' and 'agrees_expected_value', and 'agrees' is true
+    if every difference is within k standard errors '''
+    from black_jack import simulate
+    from expected_value import InfiniteDeckEV
+    if rules is None:
+        rules = Rules()
+    object_dic = simulate([name], rounds, rules=rules, seed=seed)[name]
+    object_dic['net_win'] = object_dic['win'] - object_dic['lose']
+
+    player = Player(None, name)
+    player.load_strategy()
+    engine = VectorEngine(player.get_compiled_strategy(), seed, rules)
+    batch_rounds = vector_rounds // batches
+    batch_lst = [engine.simulate(batch_rounds) for i in range(batches)]
+    expected_value = InfiniteDeckEV(player.get_compiled_strategy(), rules).expected_value()
+
+    comparison_dic = {'agrees': True}
+    for key in ('win', 'tie', 'lose', 'net_win'):
+        rates = np.array([batch_dic[key] / batch_dic['rounds'] for batch_dic in batch_lst])
+        sd = rates.std(ddof=1) * batch_rounds ** 0.5      # per round
+        vector_se = sd / (batch_rounds * batches) ** 0.5
+        object_rate = object_dic[key] / object_dic['rounds']
+        se = (sd * sd / object_dic['rounds'] + vector_se * vector_se) ** 0.5
+        result_dic = {'object': object_rate, 'vector': float(rates.mean()), 'se': float(se), \
+                      'agrees': bool(abs(object_rate - rates.mean()) <= k * se)}
+        if key == 'net_win':
+            result_dic['expected_value'] = expected_value
+            result_dic['agrees_expected_value'] = bool(abs(rates.mean() - expected_value) <= k * vector_se)
+            comparison_dic['agrees'] &= result_dic['agrees_expected_value']
+        comparison_dic['agrees'] &= result_dic['agrees']
+        comparison_dic[key] = result_dic
+    return comparison_dic
+
+
+def main():
+    players = ["Steve", "Bill_14", "Bill_15", "Bill_16", "Bill_17"]
+    rounds = 1000000
+    for name in players:
+        statistics_dic = VectorEngine.from_player_name(name, seed=0).simulate(rounds)
+        print(f"player {name} won: {statistics_dic['win']} tie: {statistics_dic['tie']} lose: {statistics_dic['lose']}")
+        print(f"\t\tNET WIN per round {statistics_dic['net_win'] / statistics_dic['rounds']:.4%}")
+
+
+if __name__ == '__main__':
+    main()